@@ -138,6 +138,7 @@ TEMPLATE_LOADERS = [
 MIDDLEWARE_CLASSES = [
     "taiga.base.middleware.cors.CoorsMiddleware",
     "taiga.events.middleware.SessionIDMiddleware",
+    "taiga.events.middleware.EventsBatchMiddleware",
 
     # Common middlewares
     "django.middleware.common.CommonMiddleware",
@@ -19,16 +19,23 @@ from django.apps import AppConfig
 from django.db.models import signals
 
 from . import signal_handlers as handlers
+from . import events
 
 
 def connect_events_signals():
-    signals.post_save.connect(handlers.on_save_any_model, dispatch_uid="events_change")
-    signals.post_delete.connect(handlers.on_delete_any_model, dispatch_uid="events_delete")
+    # Only watched models are connected, so saves and
+    # deletes of any other model do not pay the handlers.
+    for model in events.get_watched_models():
+        signals.post_save.connect(handlers.on_save_any_model, sender=model,
+                                  dispatch_uid="events_change")
+        signals.post_delete.connect(handlers.on_delete_any_model, sender=model,
+                                    dispatch_uid="events_delete")
 
 
 def disconnect_events_signals():
-    signals.post_save.disconnect(dispatch_uid="events_change")
-    signals.post_delete.disconnect(dispatch_uid="events_delete")
+    for model in events.get_watched_models():
+        signals.post_save.disconnect(sender=model, dispatch_uid="events_change")
+        signals.post_delete.disconnect(sender=model, dispatch_uid="events_delete")
 
 
 class EventsAppConfig(AppConfig):
@@ -36,4 +43,5 @@ class EventsAppConfig(AppConfig):
     verbose_name = "Events App Config"
 
     def ready(self):
+        events.load_watched_models()
         connect_events_signals()
@@ -14,6 +14,9 @@
 
 import json
 import logging
+import os
+import threading
+import time
 
 from amqp import Connection as AmqpConnection
 from amqp.basic_message import Message as AmqpMessage
@@ -43,23 +46,123 @@ def _make_rabbitmq_connection(url):
                           password=password, virtual_host=vhost)
 
 
-class EventsPushBackend(base.BaseEventsPushBackend):
-    def __init__(self, url):
+class ConnectionPool(object):
+    """
+    Per process pool of open AMQP connections with
+    their channel and the already declared exchanges.
+
+    Connections are not shared between threads: each
+    emit takes one idle connection from the pool (or
+    opens a new one) and returns it when it finishes.
+
+    The exchanges are auto_delete ones, so the broker can
+    remove them while the connection is open. They are
+    declared again after `declare_ttl` seconds.
+    """
+
+    def __init__(self, url:str, *, max_idle:int=4, declare_ttl:int=60):
         self.url = url
+        self.max_idle = max_idle
+        self.declare_ttl = declare_ttl
+        self._lock = threading.Lock()
+        self._idle = []
+        self._pid = os.getpid()
+
+    def _reset_after_fork(self):
+        # Connections opened by the parent process can not
+        # be used by forked workers.
+        if self._pid != os.getpid():
+            self._idle = []
+            self._pid = os.getpid()
+
+    def acquire(self) -> dict:
+        with self._lock:
+            self._reset_after_fork()
+            if self._idle:
+                return self._idle.pop()
 
-    def emit_event(self, message:str, *, routing_key:str, channel:str="events"):
         connection = _make_rabbitmq_connection(self.url)
-
         try:
-            rchannel = connection.channel()
-            message = AmqpMessage(message)
+            channel = connection.channel()
+        except Exception:
+            self.discard({"connection": connection})
+            raise
+
+        return {"connection": connection,
+                "channel": channel,
+                "exchanges": {}}
 
-            rchannel.exchange_declare(exchange=channel, type="topic", auto_delete=True)
-            rchannel.basic_publish(message, routing_key=routing_key, exchange=channel)
-            rchannel.close()
+    def release(self, entry:dict):
+        with self._lock:
+            self._reset_after_fork()
+            if len(self._idle) < self.max_idle:
+                self._idle.append(entry)
+                return
 
+        self.discard(entry)
+
+    def discard(self, entry:dict):
+        try:
+            entry["connection"].close()
         except Exception:
-            log.error("Unhandled exception", exc_info=True)
+            log.debug("Error closing broken connection", exc_info=True)
+
+    def clear(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+
+        for entry in idle:
+            self.discard(entry)
+
 
-        finally:
-            connection.close()
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_connection_pool(url:str) -> ConnectionPool:
+    with _pools_lock:
+        if url not in _pools:
+            _pools[url] = ConnectionPool(url)
+        return _pools[url]
+
+
+def _publish(entry:dict, message:str, *, routing_key:str, channel:str, declare_ttl:int):
+    rchannel = entry["channel"]
+
+    # Map of exchange names to the time they were declared
+    declared_at = entry["exchanges"].get(channel, None)
+    if declared_at is None or time.monotonic() - declared_at >= declare_ttl:
+        rchannel.exchange_declare(exchange=channel, type="topic", auto_delete=True)
+        entry["exchanges"][channel] = time.monotonic()
+
+    rchannel.basic_publish(AmqpMessage(message), routing_key=routing_key, exchange=channel)
+
+
+class EventsPushBackend(base.BaseEventsPushBackend):
+    def __init__(self, url):
+        self.url = url
+
+    def emit_event(self, message:str, *, routing_key:str, channel:str="events"):
+        pool = get_connection_pool(self.url)
+
+        # Try it twice: a pooled connection can be closed by
+        # the broker, so on failure it is discarded and the
+        # message is published with a new connection.
+        for attempt in range(2):
+            entry = None
+            try:
+                entry = pool.acquire()
+                _publish(entry, message, routing_key=routing_key, channel=channel,
+                         declare_ttl=pool.declare_ttl)
+            except Exception:
+                if entry is not None:
+                    pool.discard(entry)
+
+                if attempt == 0:
+                    log.warning("Error publishing event, reconnecting", exc_info=True)
+                    continue
+
+                log.error("Unhandled exception", exc_info=True)
+            else:
+                pool.release(entry)
+                return
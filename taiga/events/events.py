@@ -14,10 +14,15 @@
 
 import json
 import collections
+import threading
 
+from contextlib import contextmanager
+
+from django.apps import apps
 from django.contrib.contenttypes.models import ContentType
 
 from taiga.base.utils import json
+from taiga.base.utils.db import get_typename_for_model_class
 from . import middleware as mw
 from . import backends
 
@@ -32,14 +37,163 @@ watched_types = set([
 ])
 
 
+# Map of watched model classes to their content
+# type names. It is built when the app is ready.
+_watched_models = {}
+
+
+def load_watched_models() -> dict:
+    """
+    Build the map of watched model classes to their
+    content type names, without database queries.
+    """
+    _watched_models.clear()
+    for model in apps.get_models():
+        typename = get_typename_for_model_class(model)
+        if typename in watched_types:
+            _watched_models[model] = typename
+
+    return _watched_models
+
+
+def get_watched_models() -> dict:
+    return _watched_models
+
+
 def _get_type_for_model(model_instance):
     """
     Get content type tuple from model instance.
     """
+    typename = _watched_models.get(model_instance._meta.concrete_model, None)
+    if typename is not None:
+        return typename
+
     ct = ContentType.objects.get_for_model(model_instance)
     return ".".join([ct.app_label, ct.model])
 
 
+class EventsBatch(object):
+    """
+    Buffer of model change events. Events are deduplicated
+    by (content_type, pk, type) and grouped by routing key
+    until the batch is flushed.
+    """
+
+    def __init__(self):
+        self.level = 0
+        self.groups = collections.OrderedDict()
+        # Groups with events sent by emit_event_for_ids,
+        # their pk is always sent as a list
+        self.list_groups = set()
+
+    def add(self, pks, *, content_type:str, projectid:int, type:str,
+            channel:str, sessionid:str, as_list:bool=False):
+        key = (projectid, content_type, type, channel, sessionid)
+        group = self.groups.setdefault(key, collections.OrderedDict())
+        for pk in pks:
+            group[pk] = None
+
+        if as_list:
+            self.list_groups.add(key)
+
+    def flush(self):
+        groups, self.groups = self.groups, collections.OrderedDict()
+        list_groups, self.list_groups = self.list_groups, set()
+
+        for key, pks in groups.items():
+            projectid, content_type, type, channel, sessionid = key
+            pks = list(pks.keys())
+            if len(pks) == 1 and key not in list_groups:
+                pks = pks[0]
+
+            _emit_event_for_pks(pks, content_type=content_type, projectid=projectid,
+                                type=type, channel=channel, sessionid=sessionid)
+
+    def discard(self):
+        self.groups = collections.OrderedDict()
+        self.list_groups = set()
+
+
+_local = threading.local()
+
+
+def _get_current_batch():
+    return getattr(_local, "batch", None)
+
+
+def begin_events_batch():
+    """
+    Start buffering the events emitted by the current thread
+    until the outermost batch is commited or rolled back.
+    """
+    batch = _get_current_batch()
+    if batch is None or batch.level == 0:
+        batch = _local.batch = EventsBatch()
+
+    batch.level += 1
+
+
+def reset_events_batch():
+    """
+    Discard the batch of the current thread, with its buffered
+    events, even if it was not closed.
+    """
+    batch = _get_current_batch()
+    if batch is not None:
+        batch.discard()
+    _local.batch = None
+
+
+def end_events_batch(*, commit:bool=True):
+    """
+    Close the batch of the current thread whatever its nesting
+    level is, sending its events if `commit` is True.
+    """
+    batch = _get_current_batch()
+    try:
+        if batch is not None and batch.level > 0 and commit:
+            batch.flush()
+    finally:
+        reset_events_batch()
+
+
+def commit_events_batch():
+    batch = _get_current_batch()
+    if batch is None or batch.level == 0:
+        return
+
+    batch.level -= 1
+    if batch.level == 0:
+        batch.flush()
+
+
+def rollback_events_batch():
+    batch = _get_current_batch()
+    if batch is None or batch.level == 0:
+        return
+
+    batch.level -= 1
+    if batch.level == 0:
+        batch.discard()
+
+
+@contextmanager
+def events_batch():
+    """
+    Context manager that buffers the events emitted inside
+    it and sends them grouped when it exits. Events are
+    discarded if an exception is raised.
+    """
+    begin_events_batch()
+    try:
+        yield
+    except Exception:
+        rollback_events_batch()
+        raise
+    else:
+        commit_events_batch()
+
+
 def emit_event(data:dict, routing_key:str, *,
                sessionid:str=None, channel:str="events"):
     if not sessionid:
@@ -54,6 +208,35 @@ def emit_event(data:dict, routing_key:str, *,
                               channel=channel)
 
 
+def _emit_event_for_pks(pk, *, content_type:str, projectid:int, type:str,
+                        channel:str, sessionid:str):
+    app_name, model_name = content_type.split(".", 1)
+    routing_key = "changes.project.{0}.{1}".format(projectid, app_name)
+
+    data = {"type": type,
+            "matches": content_type,
+            "pk": pk}
+
+    return emit_event(routing_key=routing_key,
+                      channel=channel,
+                      sessionid=sessionid,
+                      data=data)
+
+
+def _emit_or_buffer_event(pk, *, pks:list, content_type:str, projectid:int, type:str,
+                          channel:str, sessionid:str, as_list:bool=False):
+    batch = _get_current_batch()
+    if batch is None or batch.level == 0:
+        return _emit_event_for_pks(pk, content_type=content_type, projectid=projectid,
+                                   type=type, channel=channel, sessionid=sessionid)
+
+    if not sessionid:
+        sessionid = mw.get_current_session_id()
+
+    batch.add(pks, content_type=content_type, projectid=projectid, type=type,
+              channel=channel, sessionid=sessionid, as_list=as_list)
+
+
 def emit_event_for_model(obj, *, type:str="change", channel:str="events",
                          content_type:str=None, sessionid:str=None):
     """
@@ -69,17 +252,9 @@ def emit_event_for_model(obj, *, type:str="change", channel:str="events",
     projectid = getattr(obj, "project_id")
     pk = getattr(obj, "pk", None)
 
-    app_name, model_name = content_type.split(".", 1)
-    routing_key = "changes.project.{0}.{1}".format(projectid, app_name)
-
-    data = {"type": type,
-            "matches": content_type,
-            "pk": pk}
-
-    return emit_event(routing_key=routing_key,
-                      channel=channel,
-                      sessionid=sessionid,
-                      data=data)
+    return _emit_or_buffer_event(pk, pks=[pk], content_type=content_type,
+                                 projectid=projectid, type=type, channel=channel,
+                                 sessionid=sessionid)
 
 
 def emit_event_for_ids(ids, content_type:str, projectid:int, *,
@@ -88,14 +263,6 @@ def emit_event_for_ids(ids, content_type:str, projectid:int, *,
     assert isinstance(ids, collections.Iterable)
     assert content_type, "content_type parameter is mandatory"
 
-    app_name, model_name = content_type.split(".", 1)
-    routing_key = "changes.project.{0}.{1}".format(projectid, app_name)
-
-    data = {"type": type,
-            "matches": content_type,
-            "pk": ids}
-
-    return emit_event(routing_key=routing_key,
-                      channel=channel,
-                      sessionid=sessionid,
-                      data=data)
+    return _emit_or_buffer_event(ids, pks=list(ids), content_type=content_type,
+                                 projectid=projectid, type=type, channel=channel,
+                                 sessionid=sessionid, as_list=True)
@@ -54,3 +54,30 @@ class SessionIDMiddleware(object):
         _local.session_id = None
 
         return response
+
+
+class EventsBatchMiddleware(object):
+    """
+    Middleware that buffers all change events emitted while
+    a request is processed and sends them once the response
+    is ready (after the request transaction is commited).
+    Events of failed requests are discarded.
+    """
+
+    def process_request(self, request):
+        from . import events
+
+        # Never nest inside a batch left open by a previous request
+        # of this thread (if its response was not processed).
+        events.reset_events_batch()
+        events.begin_events_batch()
+
+    def process_exception(self, request, exception):
+        from . import events
+        events.reset_events_batch()
+
+    def process_response(self, request, response):
+        from . import events
+
+        events.end_events_batch(commit=response.status_code < 500)
+        return response
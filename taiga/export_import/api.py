@@ -31,6 +31,7 @@ from taiga.projects.issues.models import Issue
 from . import serializers
 from . import service
 from . import permissions
+from .context import with_import_context
 
 
 class Http400(APIException):
@@ -42,6 +43,7 @@ class ProjectImporterViewSet(CreateModelMixin, GenericViewSet):
     permission_classes = (permissions.ImportPermission, )
 
     @method_decorator(atomic)
+    @method_decorator(with_import_context)
     def create(self, request, *args, **kwargs):
         self.check_permissions(request, 'import_project', None)
 
@@ -114,6 +116,7 @@ class ProjectImporterViewSet(CreateModelMixin, GenericViewSet):
 
     @detail_route(methods=['post'])
     @method_decorator(atomic)
+    @method_decorator(with_import_context)
     def issue(self, request, *args, **kwargs):
         project = self.get_object_or_none()
         self.check_permissions(request, 'import_item', project)
@@ -132,6 +135,7 @@ class ProjectImporterViewSet(CreateModelMixin, GenericViewSet):
 
     @detail_route(methods=['post'])
     @method_decorator(atomic)
+    @method_decorator(with_import_context)
     def task(self, request, *args, **kwargs):
         project = self.get_object_or_none()
         self.check_permissions(request, 'import_item', project)
@@ -147,6 +151,7 @@ class ProjectImporterViewSet(CreateModelMixin, GenericViewSet):
 
     @detail_route(methods=['post'])
     @method_decorator(atomic)
+    @method_decorator(with_import_context)
     def us(self, request, *args, **kwargs):
         project = self.get_object_or_none()
         self.check_permissions(request, 'import_item', project)
@@ -162,6 +167,7 @@ class ProjectImporterViewSet(CreateModelMixin, GenericViewSet):
 
     @detail_route(methods=['post'])
     @method_decorator(atomic)
+    @method_decorator(with_import_context)
     def milestone(self, request, *args, **kwargs):
         project = self.get_object_or_none()
         self.check_permissions(request, 'import_item', project)
@@ -177,6 +183,7 @@ class ProjectImporterViewSet(CreateModelMixin, GenericViewSet):
 
     @detail_route(methods=['post'])
     @method_decorator(atomic)
+    @method_decorator(with_import_context)
     def wiki_page(self, request, *args, **kwargs):
         project = self.get_object_or_none()
         self.check_permissions(request, 'import_item', project)
@@ -192,6 +199,7 @@ class ProjectImporterViewSet(CreateModelMixin, GenericViewSet):
 
     @detail_route(methods=['post'])
     @method_decorator(atomic)
+    @method_decorator(with_import_context)
     def wiki_link(self, request, *args, **kwargs):
         project = self.get_object_or_none()
         self.check_permissions(request, 'import_item', project)
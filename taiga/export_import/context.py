@@ -0,0 +1,115 @@
+# Copyright (C) 2014 Andrey Antukh <niwi@niwi.be>
+# Copyright (C) 2014 Jesús Espino <jespinog@gmail.com>
+# Copyright (C) 2014 David Barragán <bameda@dbarragan.com>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+
+from taiga.projects.attachments.models import Attachment
+from taiga.users.models import User
+
+
+class ImportContext(object):
+    """
+    Memoized lookups of the related objects referenced by the imported
+    data (users by email, statuses, priorities, milestones... by name),
+    so every distinct value costs one query for the whole import.
+
+    The related objects are memoized per looked up value, keeping only
+    the last `IMPORT_RELATED_CACHE_SIZE` ones, so a big dump (like the
+    user stories referenced by ref from the tasks) is never loaded in
+    memory. Missing values are not memoized, the object can be created
+    later in the import.
+
+    Attached files are stored once per content, and the ones exported by
+    reference are read from `attachments_dir`.
+    """
+    def __init__(self, attachments_dir=None):
+        self.attachments_dir = attachments_dir
+        self._users = {}
+        self._related = OrderedDict()
+        self._attachment_files = {}
+
+    def get_user(self, email):
+        if email not in self._users:
+            try:
+                self._users[email] = User.objects.get(email=email)
+            except User.DoesNotExist:
+                self._users[email] = None
+        return self._users[email]
+
+    def get_related(self, queryset, slug_field, value, project):
+        key = (queryset.model, slug_field, project.pk, str(value))
+        obj = self._related.pop(key, None)
+        if obj is None:
+            # Raises ObjectDoesNotExist if it doesn't exist yet
+            obj = queryset.get(**{slug_field: value, "project": project})
+
+        # The last used objects are at the end
+        self._related[key] = obj
+        max_size = getattr(settings, "IMPORT_RELATED_CACHE_SIZE", 1000)
+        while len(self._related) > max_size:
+            self._related.popitem(last=False)
+        return obj
+
+    def get_attachment_file(self, sha1):
+        return self._attachment_files.get(sha1, None)
+
+    def store_attachment_file(self, sha1, content):
+        """
+        Save the content of an attached file in the storage, only the
+        first time its sha1 is seen, and return the stored file name.
+        """
+        if sha1 not in self._attachment_files:
+            field = Attachment._meta.get_field("attached_file")
+            name = field.generate_filename(None, content.name)
+            self._attachment_files[sha1] = field.storage.save(name, content)
+        return self._attachment_files[sha1]
+
+
+_local = threading.local()
+
+
+def get_import_context():
+    return getattr(_local, "context", None)
+
+
+@contextmanager
+def import_context(attachments_dir=None):
+    """
+    Share the same `ImportContext` in all the imports done inside this
+    block. Nested blocks reuse the outer context.
+    """
+    if get_import_context() is not None:
+        yield get_import_context()
+        return
+
+    _local.context = ImportContext(attachments_dir=attachments_dir)
+    try:
+        yield _local.context
+    finally:
+        _local.context = None
+
+
+def with_import_context(func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with import_context():
+            return func(*args, **kwargs)
+    return wrapper
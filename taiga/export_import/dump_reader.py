@@ -0,0 +1,217 @@
+# Copyright (C) 2014 Andrey Antukh <niwi@niwi.be>
+# Copyright (C) 2014 Jesús Espino <jespinog@gmail.com>
+# Copyright (C) 2014 David Barragán <bameda@dbarragan.com>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import json
+import re
+
+_WHITESPACE = b" \t\n\r"
+_STRING_RE = re.compile(b'["\\\\]')
+_STRUCTURE_RE = re.compile(b'["\\[\\]{}]')
+_SCALAR_END_RE = re.compile(b'[,\\]}\\s]')
+
+
+class DumpFormatError(ValueError):
+    pass
+
+
+class DumpReader(object):
+    """
+    Incremental reader of project dumps.
+
+    `read_header` returns all the top level values of the dump except the
+    streamed sections, which are only skipped and indexed. `iter_section`
+    then parses the items of one of those sections one by one, so only the
+    biggest single item is kept in memory at a time.
+
+    The file object must be opened in binary mode and must be seekable.
+    """
+    chunk_size = 64 * 1024
+    streamed_sections = ("milestones", "wiki_pages", "wiki_links",
+                         "user_stories", "issues", "tasks")
+
+    def __init__(self, fileobj, streamed_sections=None):
+        self.fileobj = fileobj
+        if streamed_sections is not None:
+            self.streamed_sections = streamed_sections
+        self._sections = {}
+        self._seek(0)
+
+    def read_header(self):
+        self._seek(0)
+        self._sections = {}
+        data = {}
+
+        self._expect(b"{")
+        if self._next_is(b"}"):
+            return data
+
+        while True:
+            key = self._decode(self._read_value())
+            self._expect(b":")
+            if key in self.streamed_sections:
+                self._skip_whitespace()
+                self._sections[key] = self._offset + self._pos
+                self._read_value(keep=False)
+            else:
+                data[key] = self._decode(self._read_value())
+
+            if self._read_delimiter(b"}"):
+                return data
+
+    def iter_section(self, name):
+        if name not in self._sections:
+            return
+
+        self._seek(self._sections[name])
+        if not self._next_is(b"["):
+            # A null section
+            self._read_value(keep=False)
+            return
+
+        self._expect(b"[")
+        if self._next_is(b"]"):
+            return
+
+        while True:
+            yield self._decode(self._read_value())
+            if self._read_delimiter(b"]"):
+                return
+
+    def sections(self):
+        return dict((name, self.iter_section(name)) for name in self._sections)
+
+    def _decode(self, value):
+        try:
+            return json.loads(value.decode("utf-8"))
+        except ValueError as e:
+            raise DumpFormatError(str(e))
+
+    def _seek(self, offset):
+        self.fileobj.seek(offset)
+        self._offset = offset
+        self._buffer = b""
+        self._pos = 0
+
+    def _fill(self):
+        chunk = self.fileobj.read(self.chunk_size)
+        self._offset += self._pos
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return len(chunk) > 0
+
+    def _current(self):
+        if self._pos >= len(self._buffer) and not self._fill():
+            raise DumpFormatError("Unexpected end of dump")
+        return self._buffer[self._pos:self._pos + 1]
+
+    def _skip_whitespace(self):
+        while True:
+            while self._pos < len(self._buffer):
+                if self._buffer[self._pos:self._pos + 1] not in _WHITESPACE:
+                    return
+                self._pos += 1
+            if not self._fill():
+                return
+
+    def _next_is(self, char):
+        self._skip_whitespace()
+        return self._current() == char
+
+    def _expect(self, char):
+        if not self._next_is(char):
+            raise DumpFormatError("Expected {!r} at position {}".format(char, self._offset + self._pos))
+        self._pos += 1
+
+    def _read_delimiter(self, end):
+        self._skip_whitespace()
+        char = self._current()
+        self._pos += 1
+        if char == end:
+            return True
+        if char != b",":
+            raise DumpFormatError("Unexpected {!r} at position {}".format(char, self._offset + self._pos - 1))
+        return False
+
+    def _read_value(self, keep=True):
+        """
+        Consume the next json value and return its raw bytes (or nothing
+        if `keep` is False, so skipped values are never accumulated).
+        """
+        self._skip_whitespace()
+        scalar = self._current() not in b'"[{'
+        depth = 0
+        in_string = escape = False
+        parts = []
+
+        while True:
+            buf = self._buffer
+            start = i = self._pos
+            end = None
+
+            while end is None:
+                if escape:
+                    if i >= len(buf):
+                        break
+                    i += 1
+                    escape = False
+                    continue
+
+                if scalar:
+                    match = _SCALAR_END_RE.search(buf, i)
+                    if match is None:
+                        i = len(buf)
+                        break
+                    end = match.start()
+                    break
+
+                match = (_STRING_RE if in_string else _STRUCTURE_RE).search(buf, i)
+                if match is None:
+                    i = len(buf)
+                    break
+
+                char = match.group()
+                i = match.end()
+                if in_string:
+                    if char == b"\\":
+                        escape = True
+                    else:
+                        in_string = False
+                        if depth == 0:
+                            end = i
+                elif char == b'"':
+                    in_string = True
+                elif char in b"[{":
+                    depth += 1
+                else:
+                    depth -= 1
+                    if depth == 0:
+                        end = i
+
+            if end is not None:
+                if keep:
+                    parts.append(buf[start:end])
+                self._pos = end
+                break
+
+            if keep:
+                parts.append(buf[start:])
+            self._pos = len(buf)
+            if not self._fill():
+                if scalar:
+                    break
+                raise DumpFormatError("Unexpected end of dump")
+
+        return b"".join(parts) if keep else None
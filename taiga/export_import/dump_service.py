@@ -14,12 +14,17 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+from itertools import islice
+
+from django.conf import settings
 from django.db.models import signals
 
 from taiga.projects.models import Membership
 
 from . import serializers
 from . import service
+from .context import import_context
+from .dump_reader import DumpReader, DumpFormatError
 
 
 class TaigaImportError(Exception):
@@ -27,52 +32,80 @@ class TaigaImportError(Exception):
         self.message = message
 
 
+def read_dump(dump_file):
+    """
+    Return the dump data of a binary file object with the big sections
+    (user stories, issues, tasks...) as lazy iterators parsed and stored
+    one item at a time by `dict_to_project`.
+    """
+    reader = DumpReader(dump_file)
+    try:
+        data = reader.read_header()
+    except DumpFormatError as e:
+        raise TaigaImportError("error parsing dump: {}".format(e))
+
+    for name, items in reader.sections().items():
+        data[name] = _iter_dump_section(name, items)
+    return data
+
+
+def _iter_dump_section(name, items):
+    try:
+        for item in items:
+            yield item
+    except DumpFormatError as e:
+        raise TaigaImportError("error parsing dump section {}: {}".format(name, e))
+
+
+# The store_* helpers don't keep the stored objects around, the sections
+# may be lazy iterators over a dump too big to be kept in memory.
+
 def store_milestones(project, data):
-    results = []
     for milestone_data in data.get('milestones', []):
-        milestone = service.store_milestone(project, milestone_data)
-        results.append(milestone)
-    return results
+        service.store_milestone(project, milestone_data)
+
+
+def _iter_batches(items):
+    batch_size = getattr(settings, "IMPORT_BULK_BATCH_SIZE", 500)
+    items = iter(items)
+    while True:
+        batch = list(islice(items, batch_size))
+        if not batch:
+            return
+        yield batch
 
 
 def store_tasks(project, data):
-    results = []
-    for task in data.get('tasks', []):
-        task = service.store_task(project, task)
-        results.append(task)
-    return results
+    for batch in _iter_batches(data.get('tasks', [])):
+        service.store_tasks_in_bulk(project, batch)
 
 
 def store_wiki_pages(project, data):
-    results = []
     for wiki_page in data.get('wiki_pages', []):
-        results.append(service.store_wiki_page(project, wiki_page))
-    return results
+        service.store_wiki_page(project, wiki_page)
 
 
 def store_wiki_links(project, data):
-    results = []
     for wiki_link in data.get('wiki_links', []):
-        results.append(service.store_wiki_link(project, wiki_link))
-    return results
+        service.store_wiki_link(project, wiki_link)
 
 
 def store_user_stories(project, data):
-    results = []
-    for userstory in data.get('user_stories', []):
-        us = service.store_user_story(project, userstory)
-        results.append(us)
-    return results
+    for batch in _iter_batches(data.get('user_stories', [])):
+        service.store_user_stories_in_bulk(project, batch)
 
 
 def store_issues(project, data):
-    issues = []
-    for issue in data.get('issues', []):
-        issues.append(service.store_issue(project, issue))
-    return issues
+    for batch in _iter_batches(data.get('issues', [])):
+        service.store_issues_in_bulk(project, batch)
 
 
 def dict_to_project(data, owner=None):
+    with import_context():
+        return _dict_to_project(data, owner)
+
+
+def _dict_to_project(data, owner=None):
     if owner:
         data['owner'] = owner
 
@@ -148,3 +181,5 @@ def dict_to_project(data, owner=None):
 
     if service.get_errors(clear=False):
         raise TaigaImportError('error importing issues')
+
+    service.finish_bulk_import(proj)
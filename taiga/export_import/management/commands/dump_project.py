@@ -15,24 +15,62 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 from django.core.management.base import BaseCommand, CommandError
+from optparse import make_option
+
+import io
+import os
+import sys
 
 from taiga.projects.models import Project
-from taiga.export_import.renderers import ExportRenderer
-from taiga.export_import.service import project_to_dict
+from taiga.export_import.service import render_project, render_project_in_parallel
 
 
 class Command(BaseCommand):
     args = '<project_slug project_slug ...>'
     help = 'Export a project to json'
     renderer_context = {"indent": 4}
-    renderer = ExportRenderer()
+    option_list = BaseCommand.option_list + (
+        make_option('--output',
+            action='store',
+            dest='output',
+            default=None,
+            help='Write the dump into this file instead of the standard output'),
+        make_option('--processes',
+            action='store',
+            dest='processes',
+            type='int',
+            default=None,
+            help='Export the big sections of the project in parallel with this number of processes'),
+        make_option('--attachments-dir',
+            action='store',
+            dest='attachments_dir',
+            default=None,
+            help='Copy the attached files into this directory instead of inlining them in the dump'),
+        )
 
     def handle(self, *args, **options):
-        for project_slug in args:
+        if options["output"]:
+            with io.open(options["output"], "w", encoding="utf-8") as output:
+                self.dump_projects(args, output, options)
+        else:
+            self.dump_projects(args, sys.stdout, options)
+
+    def dump_projects(self, project_slugs, output, options):
+        processes = options["processes"]
+        attachments_dir = options["attachments_dir"]
+        if attachments_dir:
+            os.makedirs(attachments_dir, exist_ok=True)
+
+        for project_slug in project_slugs:
             try:
                 project = Project.objects.get(slug=project_slug)
             except Project.DoesNotExist:
                 raise CommandError('Project "%s" does not exist' % project_slug)
 
-            data = project_to_dict(project)
-            print(self.renderer.render(data, renderer_context=self.renderer_context).decode('utf-8'))
+            if processes:
+                render_project_in_parallel(project, output, renderer_context=self.renderer_context,
+                                           processes=processes, attachments_dir=attachments_dir)
+            else:
+                render_project(project, output, renderer_context=self.renderer_context,
+                               attachments_dir=attachments_dir)
+            output.write("\n")
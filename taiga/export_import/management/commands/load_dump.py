@@ -8,8 +8,9 @@ import pprint
 
 from taiga.projects.models import Project
 from taiga.export_import.renderers import ExportRenderer
-from taiga.export_import.dump_service import dict_to_project, TaigaImportError
+from taiga.export_import.dump_service import dict_to_project, read_dump, TaigaImportError
 from taiga.export_import.service import get_errors
+from taiga.export_import.context import import_context
 
 class Command(BaseCommand):
     args = '<dump_file> <owner-email>'
@@ -22,11 +23,20 @@ class Command(BaseCommand):
             dest='overwrite',
             default=False,
             help='Delete project if exists'),
+        make_option('--attachments-dir',
+            action='store',
+            dest='attachments_dir',
+            default=None,
+            help='Directory with the attached files of a dump exported with --attachments-dir'),
         )
 
     def handle(self, *args, **options):
-        data = json.loads(open(args[0], 'r').read())
+        with open(args[0], 'rb') as dump_file:
+            self.load_dump(dump_file, args[1], options)
+
+    def load_dump(self, dump_file, owner_email, options):
         try:
+            data = read_dump(dump_file)
             with transaction.atomic():
                 if options["overwrite"]:
                     receivers_back = signals.post_delete.receivers
@@ -42,7 +52,8 @@ class Command(BaseCommand):
                     except Project.DoesNotExist:
                         pass
                     signals.post_delete.receivers = receivers_back
-                dict_to_project(data, args[1])
+                with import_context(attachments_dir=options["attachments_dir"]):
+                    dict_to_project(data, owner_email)
         except TaigaImportError as e:
             print("ERROR:", end=" ")
             print(e.message)
@@ -14,7 +14,132 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import base64
+import io
+import json
+import os
+import shutil
+import types
+
 from rest_framework.renderers import UnicodeJSONRenderer
 
+
 class ExportRenderer(UnicodeJSONRenderer):
-    pass
+    def render_to_stream(self, data, output, renderer_context=None):
+        """
+        Write `data` as json into the `output` file-like object piece by
+        piece instead of building the whole document in memory.
+
+        Dicts and lists are walked recursively, generators are written as
+        json lists consuming one item at a time and `Base64Stream` values
+        are written in chunks. Everything else is encoded with the regular
+        renderer encoder.
+        """
+        renderer_context = renderer_context or {}
+        indent = renderer_context.get("indent", None)
+        self._write_value(data, output, indent, 0)
+
+    def render_list_items_to_stream(self, items, output, renderer_context=None, level=0):
+        """
+        Write the items of a json list, without the brackets, as they are
+        written by `render_to_stream` for a list nested `level` levels
+        deep. The result can be merged with other items into a full list
+        with `RenderedList`.
+
+        Return the number of items written.
+        """
+        renderer_context = renderer_context or {}
+        indent = renderer_context.get("indent", None)
+        return self._write_list_items(((None, item) for item in items), output, indent, level)
+
+    def _encode(self, value):
+        return json.dumps(value, cls=self.encoder_class, ensure_ascii=self.ensure_ascii)
+
+    def _write_separator(self, output, indent, level):
+        if indent is not None:
+            output.write("\n" + " " * indent * level)
+
+    def _write_value(self, value, output, indent, level):
+        if isinstance(value, Base64Stream):
+            value.write_to(output)
+        elif isinstance(value, RenderedList):
+            self._write_rendered_list(value, output, indent, level)
+        elif isinstance(value, dict):
+            self._write_items(((self._encode(str(key)), val) for key, val in value.items()),
+                              output, indent, level, "{", "}")
+        elif isinstance(value, (list, tuple, types.GeneratorType)):
+            self._write_items(((None, val) for val in value),
+                              output, indent, level, "[", "]")
+        else:
+            output.write(self._encode(value))
+
+    def _write_items(self, items, output, indent, level, start, end):
+        output.write(start)
+        if self._write_list_items(items, output, indent, level):
+            self._write_separator(output, indent, level)
+        output.write(end)
+
+    def _write_list_items(self, items, output, indent, level):
+        count = 0
+        for key, value in items:
+            if count:
+                output.write(",")
+            self._write_separator(output, indent, level + 1)
+            if key is not None:
+                output.write(key + ": ")
+            self._write_value(value, output, indent, level + 1)
+            count += 1
+        return count
+
+    def _write_rendered_list(self, value, output, indent, level):
+        output.write("[")
+        empty = True
+        for path in value.paths:
+            if not os.path.getsize(path):
+                continue
+            if not empty:
+                output.write(",")
+            with io.open(path, "r", encoding="utf-8") as items:
+                shutil.copyfileobj(items, output)
+            empty = False
+
+        if not empty:
+            self._write_separator(output, indent, level)
+        output.write("]")
+
+
+class RenderedList(object):
+    """
+    Json list made of files with items already written by
+    `ExportRenderer.render_list_items_to_stream`, in order.
+    """
+    def __init__(self, paths):
+        self.paths = paths
+
+
+class Base64Stream(object):
+    """
+    Lazy base64 representation of a file, written into the export in
+    chunks by `ExportRenderer.render_to_stream`.
+    """
+    # Multiple of 3 so every chunk is encoded without padding
+    chunk_size = 3 * 64 * 1024
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+
+    def write_to(self, output):
+        output.write('"')
+        pending = b""
+        try:
+            for chunk in self.fileobj.chunks(self.chunk_size):
+                pending += chunk
+                size = len(pending) - len(pending) % 3
+                if size:
+                    output.write(base64.b64encode(pending[:size]).decode("utf-8"))
+                    pending = pending[size:]
+            if pending:
+                output.write(base64.b64encode(pending).decode("utf-8"))
+        finally:
+            self.fileobj.close()
+        output.write('"')
@@ -15,11 +15,14 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import base64
+import hashlib
 import os
+import re
+import tempfile
 from collections import OrderedDict
 
 from django.contrib.contenttypes.models import ContentType
-from django.core.files.base import ContentFile
+from django.core.files.base import ContentFile, File
 from django.core.exceptions import ObjectDoesNotExist, ValidationError
 
 from rest_framework import serializers
@@ -38,23 +41,154 @@ from taiga.projects.history import services as history_service
 from taiga.base.serializers import JsonField, PgArrayField
 from taiga import mdrender
 
+from .context import get_import_context
+from .renderers import Base64Stream
+
+SHA1_RE = re.compile(r"^[0-9a-f]{40}$")
+
+
+def _get_user_by_email(email):
+    context = get_import_context()
+    if context is not None:
+        return context.get_user(email)
+
+    try:
+        return users_models.User.objects.get(email=email)
+    except users_models.User.DoesNotExist:
+        return None
+
+
+def _export_attached_file(fileobj, directory, chunk_size=64 * 1024):
+    """
+    Copy the file into `directory` named by the sha1 of its content,
+    once per distinct content. Return the sha1.
+    """
+    sha1 = hashlib.sha1()
+    copy = tempfile.NamedTemporaryFile(dir=directory, delete=False)
+    try:
+        with copy:
+            for chunk in fileobj.chunks(chunk_size):
+                sha1.update(chunk)
+                copy.write(chunk)
+        fileobj.close()
+
+        target = os.path.join(directory, sha1.hexdigest())
+        if os.path.exists(target):
+            os.unlink(copy.name)
+        else:
+            os.rename(copy.name, target)
+    except Exception:
+        if os.path.exists(copy.name):
+            os.unlink(copy.name)
+        raise
+
+    return sha1.hexdigest()
+
+
+_BASE64_IGNORED_CHARS_RE = re.compile("[^A-Za-z0-9+/=]")
+
+
+def _iter_base64_decoded(content, chunk_size):
+    """
+    Decode the base64 `content` by chunks of about `chunk_size` chars.
+
+    The chars out of the base64 alphabet (like the newlines of wrapped
+    data) are ignored, like `base64.b64decode` does, and the chars left
+    over a multiple of 4 are decoded with the next chunk, so they never
+    break the alignment of the base64 blocks.
+    """
+    pending = ""
+    for start in range(0, len(content), chunk_size):
+        chunk = pending + _BASE64_IGNORED_CHARS_RE.sub("", content[start:start + chunk_size])
+        aligned_size = len(chunk) - len(chunk) % 4
+        pending = chunk[aligned_size:]
+        if aligned_size:
+            yield base64.b64decode(chunk[:aligned_size])
+
+    if pending:
+        # Invalid padding, raise the same error as `base64.b64decode`
+        yield base64.b64decode(pending)
+
 
 class AttachedFileField(serializers.WritableField):
+    """
+    Attached files are exported inline, as base64 `data`, or, if the
+    serializer context has an `attachments_dir`, by reference: the file
+    is copied into that directory and only its `sha1` goes to the dump.
+
+    Both forms are accepted on import. While an import context is active
+    the files with the same content are stored only once.
+    """
     read_only = False
+    decode_chunk_size = 4 * 256 * 1024
 
     def to_native(self, obj):
         if not obj:
             return None
 
+        attachments_dir = self.context.get("attachments_dir", None)
+        if attachments_dir:
+            return OrderedDict([
+                ("sha1", _export_attached_file(obj, attachments_dir)),
+                ("name", os.path.basename(obj.name)),
+            ])
+
+        if self.context.get("stream_attachments", False):
+            data = Base64Stream(obj)
+        else:
+            data = base64.b64encode(obj.read()).decode('utf-8')
+
         return OrderedDict([
-            ("data", base64.b64encode(obj.read()).decode('utf-8')),
+            ("data", data),
             ("name", os.path.basename(obj.name)),
         ])
 
     def from_native(self, data):
         if not data:
             return None
-        return ContentFile(base64.b64decode(data['data']), name=data['name'])
+
+        if "data" not in data and "sha1" in data:
+            return self._from_reference(data)
+
+        import_context = get_import_context()
+        sha1 = hashlib.sha1()
+        content = data['data']
+        if len(content) <= self.decode_chunk_size:
+            decoded_content = base64.b64decode(content)
+            sha1.update(decoded_content)
+            attached_file = ContentFile(decoded_content, name=data['name'])
+        else:
+            # Big attachments are decoded by chunks to a temporary file so the
+            # storage can copy them without another full copy in memory.
+            decoded = tempfile.TemporaryFile()
+            for decoded_chunk in _iter_base64_decoded(content, self.decode_chunk_size):
+                sha1.update(decoded_chunk)
+                decoded.write(decoded_chunk)
+            decoded.seek(0)
+            attached_file = File(decoded, name=data['name'])
+
+        if import_context is not None:
+            return import_context.store_attachment_file(sha1.hexdigest(), attached_file)
+        return attached_file
+
+    def _from_reference(self, data):
+        sha1 = data['sha1']
+        if not isinstance(sha1, str) or not SHA1_RE.match(sha1):
+            raise ValidationError("Invalid attached file sha1")
+
+        import_context = get_import_context()
+        if import_context is None or not import_context.attachments_dir:
+            raise ValidationError("The attached files directory of the dump is needed")
+
+        stored_name = import_context.get_attachment_file(sha1)
+        if stored_name is not None:
+            return stored_name
+
+        try:
+            with open(os.path.join(import_context.attachments_dir, sha1), "rb") as fd:
+                return import_context.store_attachment_file(sha1, File(fd, name=data['name']))
+        except FileNotFoundError:
+            raise ValidationError("Attached file {} not found".format(sha1))
 
 
 class UserRelatedField(serializers.RelatedField):
@@ -66,10 +200,7 @@ class UserRelatedField(serializers.RelatedField):
         return None
 
     def from_native(self, data):
-        try:
-            return users_models.User.objects.get(email=data)
-        except users_models.User.DoesNotExist:
-            return None
+        return _get_user_by_email(data)
 
 
 class UserPkField(serializers.RelatedField):
@@ -83,11 +214,10 @@ class UserPkField(serializers.RelatedField):
             return None
 
     def from_native(self, data):
-        try:
-            user = users_models.User.objects.get(email=data)
+        user = _get_user_by_email(data)
+        if user:
             return user.pk
-        except users_models.User.DoesNotExist:
-            return None
+        return None
 
 
 class CommentField(serializers.WritableField):
@@ -112,6 +242,10 @@ class ProjectRelatedField(serializers.RelatedField):
 
     def from_native(self, data):
         try:
+            context = get_import_context()
+            if context is not None:
+                return context.get_related(self.queryset, self.slug_field, data, self.context['project'])
+
             kwargs = {self.slug_field: data, "project": self.context['project']}
             return self.queryset.get(**kwargs)
         except ObjectDoesNotExist:
@@ -197,8 +331,12 @@ class HistoryExportSerializerMixin(serializers.ModelSerializer):
     history = serializers.SerializerMethodField("get_history")
 
     def get_history(self, obj):
-        history_qs = history_service.get_history_queryset_by_model_instance(obj)
-        return HistoryExportSerializer(history_qs, many=True).data
+        prefetched = self.context.get("prefetched_history", None)
+        if prefetched is not None:
+            history_qs = prefetched.get(history_service.make_key_from_model_object(obj), [])
+        else:
+            history_qs = history_service.get_history_queryset_by_model_instance(obj)
+        return HistoryExportSerializer(history_qs, many=True, context=self.context).data
 
 
 class AttachmentExportSerializer(serializers.ModelSerializer):
@@ -215,9 +353,13 @@ class AttachmentExportSerializerMixin(serializers.ModelSerializer):
     attachments = serializers.SerializerMethodField("get_attachments")
 
     def get_attachments(self, obj):
-        content_type = ContentType.objects.get_for_model(obj.__class__)
-        attachments_qs = attachments_models.Attachment.objects.filter(object_id=obj.pk, content_type=content_type)
-        return AttachmentExportSerializer(attachments_qs, many=True).data
+        prefetched = self.context.get("prefetched_attachments", None)
+        if prefetched is not None:
+            attachments_qs = prefetched.get(obj.pk, [])
+        else:
+            content_type = ContentType.objects.get_for_model(obj.__class__)
+            attachments_qs = attachments_models.Attachment.objects.filter(object_id=obj.pk, content_type=content_type)
+        return AttachmentExportSerializer(attachments_qs, many=True, context=self.context).data
 
 
 class PointsExportSerializer(serializers.ModelSerializer):
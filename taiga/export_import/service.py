@@ -14,19 +14,49 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import io
+import multiprocessing
+import os
+import shutil
+import tempfile
 import uuid
 import os.path as path
+from collections import OrderedDict
+from contextlib import closing
 from unidecode import unidecode
 
+from django.conf import settings
+from django.db import connection, connections
+from django.db.models import Max
 from django.template.defaultfilters import slugify
 from django.contrib.contenttypes.models import ContentType
+from django.utils import timezone
 
+from rest_framework.serializers import BaseSerializer
+
+from taiga.projects.attachments.models import Attachment
+from taiga.projects.history.models import HistoryEntry
 from taiga.projects.history.services import make_key_from_model_object
+from taiga.projects.history.services import get_history_queryset_by_model_instances
+from taiga.projects.issues.models import Issue
+from taiga.projects.issues.signals import set_finished_date_when_edit_issue
+from taiga.projects.milestones.services import rebuild_milestones_counters
+from taiga.projects.mixins.blocked import blocked_pre_save
+from taiga.projects.models import Project
 from taiga.projects.references import sequences as seq
 from taiga.projects.references import models as refs
 from taiga.projects.services import find_invited_user
+from taiga.projects.services import invalidate_milestones_points
+from taiga.projects.services import invalidate_issues_filters_data
+from taiga.projects.services import update_project_tags_colors
+from taiga.projects.signals import tags_normalization
+from taiga.projects.tasks.models import Task
+from taiga.projects.userstories.models import UserStory, RolePoints
+from taiga.projects.userstories.services import rebuild_userstories_counters
+from taiga.timeline.service import push_to_timeline_in_bulk
 
 from . import serializers
+from . import renderers
 
 _errors_log = {}
 
@@ -48,6 +78,131 @@ def project_to_dict(project):
     return serializers.ProjectExportSerializer(project).data
 
 
+def _iter_related(field, obj, field_name):
+    source = field.source or field_name
+    for item in getattr(obj, source).all().iterator():
+        yield field.to_native(item)
+
+
+def _get_export_context(attachments_dir=None):
+    return {"stream_attachments": True, "attachments_dir": attachments_dir}
+
+
+def project_to_stream(project, attachments_dir=None):
+    """
+    Lazy version of `project_to_dict` to be written with
+    `ExportRenderer.render_to_stream`.
+
+    Nested sections are generators serializing one object at a time and
+    attachments content is read when it is written. With `attachments_dir`
+    the attached files are copied there instead of inlined in the dump.
+    """
+    serializer = serializers.ProjectExportSerializer(project, context=_get_export_context(attachments_dir))
+    data = OrderedDict()
+    for field_name, field in serializer.fields.items():
+        field.initialize(parent=serializer, field_name=field_name)
+        key = serializer.get_field_key(field_name)
+        if isinstance(field, BaseSerializer) and field.many:
+            data[key] = _iter_related(field, project, field_name)
+        else:
+            data[key] = field.field_to_native(project, field_name)
+    return data
+
+
+def render_project(project, output, renderer_context=None, attachments_dir=None):
+    data = project_to_stream(project, attachments_dir=attachments_dir)
+    renderers.ExportRenderer().render_to_stream(data, output, renderer_context=renderer_context)
+
+
+# Sections exported in shards by `render_project_in_parallel`
+SHARDED_SECTIONS = ("wiki_pages", "user_stories", "tasks", "issues")
+
+
+def _group_by(objs, key):
+    result = {}
+    for obj in objs:
+        result.setdefault(key(obj), []).append(obj)
+    return result
+
+
+def export_shard(project_id, section, ids, shard_path, renderer_context=None, attachments_dir=None):
+    """
+    Write the items of one section of the project export with the given
+    ids into `shard_path`. History entries and attachments of all of them are
+    fetched with one query each.
+    """
+    project = Project.objects.get(pk=project_id)
+    serializer = serializers.ProjectExportSerializer(project, context=_get_export_context(attachments_dir))
+    field = serializer.fields[section]
+    field.initialize(parent=serializer, field_name=section)
+
+    objs = list(getattr(project, field.source or section).filter(id__in=ids))
+    history_qs = get_history_queryset_by_model_instances(objs)
+    content_type = ContentType.objects.get_for_model(field.opts.model)
+    attachments_qs = Attachment.objects.filter(content_type=content_type, object_id__in=ids)
+    serializer.context["prefetched_history"] = _group_by(history_qs, lambda entry: entry.key)
+    serializer.context["prefetched_attachments"] = _group_by(attachments_qs, lambda attachment: attachment.object_id)
+
+    with io.open(shard_path, "w", encoding="utf-8") as output:
+        renderers.ExportRenderer().render_list_items_to_stream((field.to_native(obj) for obj in objs), output,
+                                                               renderer_context=renderer_context, level=1)
+
+
+def _export_shard_job(args):
+    export_shard(*args)
+
+
+def _run_export_jobs(jobs, processes=None):
+    if processes == 1:
+        for job in jobs:
+            _export_shard_job(job)
+        return
+
+    # Every worker has to open its own database connection
+    for conn in connections.all():
+        conn.close()
+
+    pool = multiprocessing.Pool(processes)
+    try:
+        pool.map(_export_shard_job, jobs, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def render_project_in_parallel(project, output, renderer_context=None, processes=None, shard_size=None,
+                               attachments_dir=None):
+    """
+    Same as `render_project` but the big sections are split in shards of
+    `shard_size` items exported by a pool of `processes` workers (by
+    default, one per cpu) and then merged into the output.
+
+    The database connections are closed before starting the workers, so
+    it can't be called inside a transaction.
+    """
+    if shard_size is None:
+        shard_size = getattr(settings, "EXPORT_SHARD_SIZE", 200)
+
+    data = project_to_stream(project, attachments_dir=attachments_dir)
+    tmpdir = tempfile.mkdtemp()
+    try:
+        jobs = []
+        for section in SHARDED_SECTIONS:
+            ids = list(getattr(project, section).values_list("id", flat=True))
+            shard_paths = []
+            for start in range(0, len(ids), shard_size):
+                shard_path = os.path.join(tmpdir, "{}-{}.json".format(section, start))
+                jobs.append((project.id, section, ids[start:start + shard_size], shard_path,
+                             renderer_context, attachments_dir))
+                shard_paths.append(shard_path)
+            data[section] = renderers.RenderedList(shard_paths)
+
+        _run_export_jobs(jobs, processes)
+        renderers.ExportRenderer().render_to_stream(data, output, renderer_context=renderer_context)
+    finally:
+        shutil.rmtree(tmpdir)
+
+
 def store_project(data):
     project_data = {}
     for key, value in data.items():
@@ -149,10 +304,14 @@ def store_memberships(project, data):
     return results
 
 
-def store_task(project, task):
+def _set_task_defaults(project, task):
     if 'status' not in task and project.default_task_status:
         task['status'] = project.default_task_status.name
 
+
+def store_task(project, task):
+    _set_task_defaults(project, task)
+
     serialized = serializers.TaskExportSerializer(data=task, context={"project": project})
     if serialized.is_valid():
         serialized.object.project = project
@@ -200,7 +359,7 @@ def store_milestone(project, milestone):
     return None
 
 
-def store_attachment(project, obj, attachment):
+def _prepare_attachment(project, obj, attachment):
     serialized = serializers.AttachmentExportSerializer(data=attachment)
     if serialized.is_valid():
         serialized.object.content_type = ContentType.objects.get_for_model(obj.__class__)
@@ -210,23 +369,40 @@ def store_attachment(project, obj, attachment):
             serialized.object.owner = serialized.object.project.owner
         serialized.object._importing = True
         serialized.object.size = serialized.object.attached_file.size
-        serialized.object.name = path.basename(serialized.object.attached_file.name).lower()
+        # Attachments with the same content share the stored file, so the
+        # name comes from the imported data and not from the stored file.
+        file_name = (attachment.get('attached_file') or {}).get('name', None)
+        if not file_name:
+            file_name = serialized.object.attached_file.name
+        serialized.object.name = path.basename(file_name).lower()
+    else:
+        add_errors("attachments", serialized.errors)
+    return serialized
+
+
+def store_attachment(project, obj, attachment):
+    serialized = _prepare_attachment(project, obj, attachment)
+    if not serialized.errors:
         serialized.save()
-        return serialized
-    add_errors("attachments", serialized.errors)
     return serialized
 
 
-def store_history(project, obj, history):
+def _prepare_history(project, obj, history):
     serialized = serializers.HistoryExportSerializer(data=history, context={"project": project})
     if serialized.is_valid():
         serialized.object.key = make_key_from_model_object(obj)
         if serialized.object.diff is None:
             serialized.object.diff = []
         serialized.object._importing = True
+    else:
+        add_errors("history", serialized.errors)
+    return serialized
+
+
+def store_history(project, obj, history):
+    serialized = _prepare_history(project, obj, history)
+    if not serialized.errors:
         serialized.save()
-        return serialized
-    add_errors("history", serialized.errors)
     return serialized
 
 
@@ -275,14 +451,23 @@ def store_role_point(project, us, role_point):
     return None
 
 
-def store_user_story(project, userstory):
+def _set_user_story_defaults(project, userstory):
     if 'status' not in userstory and project.default_us_status:
         userstory['status'] = project.default_us_status.name
 
+
+def _get_user_story_data(userstory):
     userstory_data = {}
     for key, value in userstory.items():
         if key != 'role_points':
             userstory_data[key] = value
+    return userstory_data
+
+
+def store_user_story(project, userstory):
+    _set_user_story_defaults(project, userstory)
+
+    userstory_data = _get_user_story_data(userstory)
     serialized_us = serializers.UserStoryExportSerializer(data=userstory_data, context={"project": project})
     if serialized_us.is_valid():
         serialized_us.object.project = project
@@ -316,9 +501,7 @@ def store_user_story(project, userstory):
     return None
 
 
-def store_issue(project, data):
-    serialized = serializers.IssueExportSerializer(data=data, context={"project": project})
-
+def _set_issue_defaults(project, data):
     if 'type' not in data and project.default_issue_type:
         data['type'] = project.default_issue_type.name
 
@@ -331,6 +514,12 @@ def store_issue(project, data):
     if 'severity' not in data and project.default_severity:
         data['severity'] = project.default_severity.name
 
+
+def store_issue(project, data):
+    serialized = serializers.IssueExportSerializer(data=data, context={"project": project})
+
+    _set_issue_defaults(project, data)
+
     if serialized.is_valid():
         serialized.object.project = project
         if serialized.object.owner is None:
@@ -356,3 +545,191 @@ def store_issue(project, data):
         return serialized
     add_errors("issues", serialized.errors)
     return None
+
+
+#####################################################
+# Bulk import
+#####################################################
+
+def _allocate_ids(model, count):
+    """
+    Reserve `count` primary keys of the model so related objects can be
+    built before the rows are inserted with `bulk_create`.
+    """
+    sql = "SELECT nextval(pg_get_serial_sequence(%s, %s)) FROM generate_series(1, %s)"
+    with closing(connection.cursor()) as cursor:
+        cursor.execute(sql, [model._meta.db_table, model._meta.pk.column, count])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _bulk_create_m2m(model, objs):
+    through_objs = {}
+    for obj in objs:
+        for accessor_name, related_objs in getattr(obj, "_m2m_data", {}).items():
+            field = model._meta.get_field(accessor_name)
+            through = field.rel.through
+            for related_obj in related_objs or []:
+                if related_obj is None:
+                    continue
+                through_objs.setdefault(through, []).append(through(**{
+                    field.m2m_column_name(): obj.pk,
+                    field.m2m_reverse_name(): related_obj.pk,
+                }))
+        obj._m2m_data = {}
+
+    for through, objs in through_objs.items():
+        through.objects.bulk_create(objs)
+
+
+# Fields filled by the model `save` methods with a default of the project
+_PROJECT_DEFAULTS = {
+    UserStory: (("status", "default_us_status"),),
+    Task: (("status", "default_task_status"),),
+    Issue: (("status", "default_issue_status"),
+            ("type", "default_issue_type"),
+            ("severity", "default_severity"),
+            ("priority", "default_priority")),
+}
+
+
+def _bulk_create_items(project, items):
+    """
+    Insert the already validated (obj, data) pairs of one model with their
+    watchers, attachments and history. Neither the model `save` methods nor
+    the pre_save signals run with `bulk_create`, so what they do for an
+    imported object is done here: the modified date, the project defaults,
+    the tags normalization, the blocked note cleaning and the issues
+    finished date. The signals that need the saved objects (references,
+    tags colors, counters, stats...) are replaced by `finish_bulk_import`.
+    """
+    if not items:
+        return []
+
+    objs = [obj for obj, data in items]
+    model = objs[0].__class__
+    for obj, pk in zip(objs, _allocate_ids(model, len(objs))):
+        obj.id = pk
+        obj.project = project
+        if obj.owner is None:
+            obj.owner = project.owner
+        if not obj.modified_date:
+            obj.modified_date = timezone.now()
+        for field_name, default_field_name in _PROJECT_DEFAULTS.get(model, ()):
+            if getattr(obj, field_name + "_id") is None:
+                setattr(obj, field_name, getattr(project, default_field_name))
+
+        tags_normalization(model, obj)
+        blocked_pre_save(model, obj)
+        if model is Issue and obj.status is not None:
+            set_finished_date_when_edit_issue(model, obj)
+
+        obj._importing = True
+        obj._not_notify = True
+
+    model.objects.bulk_create(objs)
+    _bulk_create_m2m(model, objs)
+
+    attachments = []
+    history = []
+    for obj, data in items:
+        for attachment in data.get('attachments', []):
+            serialized = _prepare_attachment(project, obj, attachment)
+            if not serialized.errors:
+                if not serialized.object.modified_date:
+                    serialized.object.modified_date = timezone.now()
+                attachments.append(serialized.object)
+
+        for history_entry in data.get('history', []):
+            serialized = _prepare_history(project, obj, history_entry)
+            if not serialized.errors:
+                history.append(serialized.object)
+
+    Attachment.objects.bulk_create(attachments)
+    HistoryEntry.objects.bulk_create(history)
+    return objs
+
+
+def store_user_stories_in_bulk(project, userstories):
+    items = []
+    for userstory in userstories:
+        _set_user_story_defaults(project, userstory)
+        serialized = serializers.UserStoryExportSerializer(data=_get_user_story_data(userstory),
+                                                           context={"project": project})
+        if serialized.is_valid():
+            items.append((serialized.object, userstory))
+        else:
+            add_errors("user_stories", serialized.errors)
+
+    objs = _bulk_create_items(project, items)
+
+    role_points = []
+    for obj, userstory in items:
+        for role_point in userstory.get('role_points', []):
+            serialized = serializers.RolePointsExportSerializer(data=role_point, context={"project": project})
+            if serialized.is_valid():
+                serialized.object.user_story = obj
+                role_points.append(serialized.object)
+            else:
+                add_errors("role_points", serialized.errors)
+    RolePoints.objects.bulk_create(role_points)
+
+    push_to_timeline_in_bulk(project, objs, "create")
+    return objs
+
+
+def store_issues_in_bulk(project, issues):
+    items = []
+    for issue in issues:
+        _set_issue_defaults(project, issue)
+        serialized = serializers.IssueExportSerializer(data=issue, context={"project": project})
+        if serialized.is_valid():
+            items.append((serialized.object, issue))
+        else:
+            add_errors("issues", serialized.errors)
+
+    objs = _bulk_create_items(project, items)
+    push_to_timeline_in_bulk(project, objs, "create")
+    return objs
+
+
+def store_tasks_in_bulk(project, tasks):
+    items = []
+    for task in tasks:
+        _set_task_defaults(project, task)
+        serialized = serializers.TaskExportSerializer(data=task, context={"project": project})
+        if serialized.is_valid():
+            items.append((serialized.object, task))
+        else:
+            add_errors("tasks", serialized.errors)
+
+    return _bulk_create_items(project, items)
+
+
+def finish_bulk_import(project):
+    """
+    Do once per project the work skipped by the bulk store functions:
+    move the references sequence after the imported refs, give a ref to
+    the imported objects without one, set the tags colors, rebuild the
+    open items counters and invalidate the cached stats.
+    """
+    sequence_name = refs.make_sequence_name(project)
+    if not seq.exists(sequence_name):
+        seq.create(sequence_name)
+
+    referenced_models = (UserStory, Issue, Task)
+    max_refs = [model.objects.filter(project=project).aggregate(max_ref=Max("ref"))["max_ref"]
+                for model in referenced_models]
+    max_ref = max([ref for ref in max_refs if ref is not None] or [0])
+    if max_ref:
+        seq.set_max(sequence_name, max_ref)
+
+    for model in referenced_models:
+        for obj in model.objects.filter(project=project, ref__isnull=True).order_by("id"):
+            ref, _ = refs.make_reference(obj, project)
+            model.objects.filter(pk=obj.pk).update(ref=ref)
+
+    update_project_tags_colors(project)
+    invalidate_milestones_points(project.id)
+    invalidate_issues_filters_data(project.id)
+    rebuild_userstories_counters(project.id)
+    rebuild_milestones_counters(project.id)
@@ -14,4 +14,6 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+default_app_config = "taiga.mdrender.apps.MdRenderAppConfig"
+
 from .service import *
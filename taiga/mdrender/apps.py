@@ -0,0 +1,37 @@
+# Copyright (C) 2014 Andrey Antukh <niwi@niwi.be>
+# Copyright (C) 2014 Jesús Espino <jespinog@gmail.com>
+# Copyright (C) 2014 David Barragán <bameda@dbarragan.com>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from django.apps import AppConfig
+from django.apps import apps
+from django.db.models import signals
+
+from . import signals as handlers
+
+
+class MdRenderAppConfig(AppConfig):
+    name = "taiga.mdrender"
+    verbose_name = "Markdown render"
+
+    def ready(self):
+        for model_name in (("userstories", "UserStory"), ("tasks", "Task"), ("issues", "Issue")):
+            model = apps.get_model(*model_name)
+            signals.post_save.connect(handlers.invalidate_reference_renders, sender=model)
+            signals.post_delete.connect(handlers.invalidate_reference_renders, sender=model)
+
+        signals.post_save.connect(handlers.invalidate_mention_renders,
+                                  sender=apps.get_model("users", "User"))
+        signals.post_delete.connect(handlers.invalidate_mention_renders,
+                                    sender=apps.get_model("users", "User"))
@@ -23,28 +23,67 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 
+import re
+
 from markdown.extensions import Extension
 from markdown.inlinepatterns import Pattern
+from markdown.preprocessors import Preprocessor
 from markdown.util import etree
 
 from taiga.users.models import User
 
 
+MENTION_RE = r'(?<=^|(?<=[^a-zA-Z0-9-_\.]))@([A-Za-z]+[A-Za-z0-9-]+)'
+
+
 class MentionsExtension(Extension):
     def extendMarkdown(self, md, md_globals):
-        MENTION_RE = r'(?<=^|(?<=[^a-zA-Z0-9-_\.]))@([A-Za-z]+[A-Za-z0-9-]+)'
         mentionsPattern = MentionsPattern(MENTION_RE)
         mentionsPattern.md = md
         md.inlinePatterns.add('mentions', mentionsPattern, '_begin')
+        md.preprocessors.add('mentions', MentionsPreprocessor(mentionsPattern), '_end')
+
+
+class MentionsPreprocessor(Preprocessor):
+    """
+    Collect all the mentioned usernames of the document and load the users
+    with a single query before the inline pattern runs.
+    """
+    mention_re = re.compile(MENTION_RE)
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+        super().__init__()
+
+    def run(self, lines):
+        usernames = set()
+        for line in lines:
+            usernames.update(self.mention_re.findall(line))
+
+        self.pattern.usernames = usernames
+        if self.pattern.before_lookup is not None:
+            self.pattern.before_lookup(usernames)
+        if usernames:
+            users = User.objects.filter(username__in=usernames)
+            self.pattern.users = {user.username: user for user in users}
+        else:
+            self.pattern.users = {}
+        return lines
 
 
 class MentionsPattern(Pattern):
+    def __init__(self, pattern):
+        self.usernames = set()
+        self.users = {}
+        # Optional callable(usernames) called before loading them
+        self.before_lookup = None
+        super().__init__(pattern)
+
     def handleMatch(self, m):
         username = m.group(2)
 
-        try:
-            user = User.objects.get(username=username)
-        except User.DoesNotExist:
+        user = self.users.get(username)
+        if user is None:
             return "@{}".format(username)
 
         url = "/profile/{}".format(username)
@@ -23,35 +23,71 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 
+import re
+
 from markdown.extensions import Extension
 from markdown.inlinepatterns import Pattern
+from markdown.preprocessors import Preprocessor
 from markdown.util import etree
 
-from taiga.projects.references.services import get_instance_by_ref
+from taiga.projects.references.services import get_instances_by_refs
 from taiga.front import resolve
 
 
+TAIGA_REFERENCE_RE = r'(?<=^|(?<=[^a-zA-Z0-9-\[]))#(\d+)'
+
+
 class TaigaReferencesExtension(Extension):
     def __init__(self, project, *args, **kwargs):
         self.project = project
         return super().__init__(*args, **kwargs)
 
     def extendMarkdown(self, md, md_globals):
-        TAIGA_REFERENCE_RE = r'(?<=^|(?<=[^a-zA-Z0-9-\[]))#(\d+)'
         referencesPattern = TaigaReferencesPattern(TAIGA_REFERENCE_RE, self.project)
         referencesPattern.md = md
         md.inlinePatterns.add('taiga-references', referencesPattern, '_begin')
+        md.preprocessors.add('taiga-references', TaigaReferencesPreprocessor(referencesPattern), '_end')
+
+
+class TaigaReferencesPreprocessor(Preprocessor):
+    """
+    Collect all the references of the document and load them with a single
+    query before the inline pattern runs.
+    """
+    reference_re = re.compile(TAIGA_REFERENCE_RE)
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+        super().__init__()
+
+    def run(self, lines):
+        refs = set()
+        for line in lines:
+            refs.update(int(ref) for ref in self.reference_re.findall(line))
+
+        self.pattern.refs = refs
+        if self.pattern.before_lookup is not None:
+            self.pattern.before_lookup(self.pattern.project, refs)
+        if refs:
+            self.pattern.instances = get_instances_by_refs(self.pattern.project.id, refs)
+        else:
+            self.pattern.instances = {}
+        return lines
 
 
 class TaigaReferencesPattern(Pattern):
     def __init__(self, pattern, project):
         self.project = project
+        self.refs = set()
+        self.instances = {}
+        # Optional callable(project, refs) called before loading them
+        self.before_lookup = None
         super().__init__(pattern)
 
     def handleMatch(self, m):
         obj_ref = m.group(2)
 
-        instance = get_instance_by_ref(self.project.id, obj_ref)
+        instance = self.instances.get(int(obj_ref))
         if instance is None or instance.content_object is None:
             return "#{}".format(obj_ref)
 
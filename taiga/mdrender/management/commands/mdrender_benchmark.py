@@ -0,0 +1,85 @@
+# Copyright (C) 2014 Andrey Antukh <niwi@niwi.be>
+# Copyright (C) 2014 Jesús Espino <jespinog@gmail.com>
+# Copyright (C) 2014 David Barragán <bameda@dbarragan.com>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import time
+from optparse import make_option
+
+import bleach
+
+from django.core.management.base import BaseCommand, CommandError
+
+from taiga.projects.models import Project
+from taiga.mdrender import service
+
+
+def _render_with_new_markdown(project, text):
+    # How every document was rendered before reusing the Markdown instances
+    md = service._make_markdown()
+    service._set_markdown_project(md, project)
+    md.extracted_data = {"mentions": [], "references": []}
+    return bleach.clean(md.convert(text))
+
+
+def _render_with_thread_markdown(project, text):
+    md = service._get_markdown(project)
+    return bleach.clean(md.convert(text))
+
+
+class Command(BaseCommand):
+    args = '<project_slug>'
+    help = ('Compare the markdown render throughput of the texts rendered by the '
+            'list endpoints of a project building a new renderer per document and '
+            'reusing the renderer of the thread (without the render cache)')
+    option_list = BaseCommand.option_list + (
+        make_option('--iterations',
+            action='store',
+            dest='iterations',
+            type='int',
+            default=3,
+            help='Number of times every text is rendered'),
+        )
+
+    def handle(self, *args, **options):
+        if len(args) != 1:
+            raise CommandError("A project slug is required")
+
+        try:
+            project = Project.objects.get(slug=args[0])
+        except Project.DoesNotExist:
+            raise CommandError('Project "%s" does not exist' % args[0])
+
+        texts = self._get_texts(project)
+        if not texts:
+            raise CommandError('Project "%s" has nothing to render' % args[0])
+
+        texts = texts * options["iterations"]
+        for name, render in (("new renderer per document", _render_with_new_markdown),
+                             ("reused thread renderer", _render_with_thread_markdown)):
+            start = time.time()
+            for text in texts:
+                render(project, text)
+            elapsed = time.time() - start
+            self.stdout.write("{}: {} documents in {:.2f}s ({:.1f} documents/s)".format(
+                name, len(texts), elapsed, len(texts) / elapsed if elapsed else 0))
+
+    def _get_texts(self, project):
+        # The fields rendered by the user stories, tasks and issues serializers
+        texts = []
+        for queryset in (project.user_stories.all(), project.tasks.all(), project.issues.all()):
+            for description, blocked_note in queryset.values_list("description", "blocked_note"):
+                texts.append(description or "")
+                texts.append(blocked_note or "")
+        return texts
@@ -0,0 +1,42 @@
+# Copyright (C) 2014 Andrey Antukh <niwi@niwi.be>
+# Copyright (C) 2014 Jesús Espino <jespinog@gmail.com>
+# Copyright (C) 2014 David Barragán <bameda@dbarragan.com>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from taiga.mdrender.service import get_cache_stats, reset_cache_stats
+
+
+class Command(BaseCommand):
+    help = 'Show the hits and misses of the markdown render cache'
+    option_list = BaseCommand.option_list + (
+        make_option('--reset',
+            action='store_true',
+            dest='reset',
+            default=False,
+            help='Reset the counters after showing them'),
+        )
+
+    def handle(self, *args, **options):
+        stats = get_cache_stats()
+        total = stats["hits"] + stats["misses"]
+        ratio = stats["hits"] * 100.0 / total if total else 0
+        self.stdout.write("hits: {hits}, misses: {misses}".format(**stats) +
+                          " ({:.1f}% hit ratio)".format(ratio))
+
+        if options["reset"]:
+            reset_cache_stats()
@@ -14,8 +14,11 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import collections
 import hashlib
 import functools
+import threading
+import uuid
 import bleach
 
 # BEGIN PATCH
@@ -34,6 +37,7 @@ def _serialize(domtree):
 bleach._serialize = _serialize
 ### END PATCH
 
+from django.conf import settings
 from django.core.cache import cache
 from django.utils.encoding import force_bytes
 from django.template.defaultfilters import slugify
@@ -80,34 +84,202 @@ def _make_extensions_list(wikilinks_config=None, project=None):
 import diff_match_patch
 
 
+_local = threading.local()
+
+
+def _make_project_version_key(project_id:int) -> str:
+    return "mdrender-project-version:{}".format(project_id)
+
+
+def _make_reference_version_key(project_id:int, ref:int) -> str:
+    return "mdrender-reference-version:{}:{}".format(project_id, ref)
+
+
+def _make_mention_version_key(username:str) -> str:
+    return "mdrender-mention-version:{}".format(username)
+
+
+def _get_cache_timeout() -> int:
+    return getattr(settings, "MDRENDER_CACHE_TIMEOUT", 60 * 60 * 24 * 7)
+
+
+def _get_versions(keys:list) -> dict:
+    """
+    Get the current value of the version keys, creating the
+    missing ones. Version keys expire with the cached renders
+    so a lost version only causes a cache miss.
+    """
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            version = uuid.uuid4().hex
+            if not cache.add(key, version, timeout=_get_cache_timeout()):
+                version = cache.get(key, version)
+            versions[key] = version
+    return versions
+
+
+def _bump_version(key:str):
+    cache.set(key, uuid.uuid4().hex, timeout=_get_cache_timeout())
+
+
+def invalidate_project(project_id:int):
+    """
+    Invalidate all the cached renders of the project.
+    """
+    _bump_version(_make_project_version_key(project_id))
+
+
+def invalidate_reference(project_id:int, ref:int):
+    """
+    Invalidate the cached renders of the project that
+    contain the reference `#ref`.
+    """
+    _bump_version(_make_reference_version_key(project_id, ref))
+
+
+def invalidate_mention(username:str):
+    """
+    Invalidate the cached renders that mention `username`.
+    """
+    _bump_version(_make_mention_version_key(username))
+
+
+def _add_dependencies(keys:list):
+    """
+    Read the current versions of the keys, if a render is being
+    cached, before the objects they depend on are loaded, so a
+    change done while rendering invalidates the cached result.
+    """
+    versions = getattr(_local, "versions", None)
+    if versions is None:
+        return
+
+    keys = [key for key in keys if key not in versions]
+    if keys:
+        versions.update(_get_versions(keys))
+
+
+def _add_references_dependencies(project, refs):
+    _add_dependencies([_make_reference_version_key(project.id, ref) for ref in refs])
+
+
+def _add_mentions_dependencies(usernames):
+    _add_dependencies([_make_mention_version_key(username) for username in usernames])
+
+
+def _incr_counter(key:str):
+    # The counters are added to the cache in batches to keep
+    # the cache hits in a single round trip most of the times.
+    counters = getattr(_local, "counters", None)
+    if counters is None:
+        counters = _local.counters = collections.Counter()
+
+    counters[key] += 1
+    if sum(counters.values()) >= getattr(settings, "MDRENDER_CACHE_STATS_BATCH_SIZE", 100):
+        _flush_counters()
+
+
+def _flush_counters():
+    counters = getattr(_local, "counters", None)
+    _local.counters = collections.Counter()
+    if not counters:
+        return
+
+    for key, delta in counters.items():
+        try:
+            cache.incr(key, delta)
+        except ValueError:
+            if not cache.add(key, delta, timeout=None):
+                cache.incr(key, delta)
+
+
+def get_cache_stats() -> dict:
+    """
+    Get the hits and misses of the render cache.
+    """
+    _flush_counters()
+    counters = cache.get_many(["mdrender-cache-hits", "mdrender-cache-misses"])
+    return {"hits": counters.get("mdrender-cache-hits", 0),
+            "misses": counters.get("mdrender-cache-misses", 0)}
+
+
+def reset_cache_stats():
+    _local.counters = collections.Counter()
+    cache.delete_many(["mdrender-cache-hits", "mdrender-cache-misses"])
+
+
 def cache_by_sha(func):
+    """
+    Cache the result of `func(project, text)` by the project and
+    the sha1 of the text.
+
+    Entries expire after MDRENDER_CACHE_TIMEOUT seconds and are
+    invalidated before that when the version of the project or of
+    any reference or mention found while rendering changes. The
+    versions are read before loading the referenced objects.
+    """
     @functools.wraps(func)
     def _decorator(project, text):
         sha1_hash = hashlib.sha1(force_bytes(text)).hexdigest()
-        key = "{}-{}".format(sha1_hash, project.id)
+        key = "mdrender:{}:{}:{}".format(project.id, project.slug, sha1_hash)
 
         # Try to get it from the cache
         cached = cache.get(key)
-        if cached is not None:
-            return cached
+        if cached is not None and cache.get_many(list(cached["versions"])) == cached["versions"]:
+            _incr_counter("mdrender-cache-hits")
+            return cached["value"]
+
+        _incr_counter("mdrender-cache-misses")
+
+        _local.versions = versions = _get_versions([_make_project_version_key(project.id)])
+        try:
+            returned_value = func(project, text)
+        finally:
+            _local.versions = None
 
-        returned_value = func(project, text)
-        cache.set(key, returned_value, timeout=None)
+        cached = {"value": returned_value, "versions": versions}
+        cache.set(key, cached, timeout=_get_cache_timeout())
         return returned_value
 
     return _decorator
 
 
-def _get_markdown(project):
-    def build_url(*args, **kwargs):
-        return args[1] + slugify(args[0])
+def _build_wiki_url(label, base, end):
+    return base + slugify(label)
+
 
-    wikilinks_config = {"base_url": "/project/{}/wiki/".format(project.slug),
+def _make_markdown(project=None):
+    wikilinks_config = {"base_url": "",
                         "end_url": "",
-                        "build_url": build_url}
+                        "build_url": _build_wiki_url}
     extensions = _make_extensions_list(wikilinks_config=wikilinks_config,
                                        project=project)
     md = Markdown(extensions=extensions)
+    md.inlinePatterns["taiga-references"].before_lookup = _add_references_dependencies
+    md.inlinePatterns["mentions"].before_lookup = _add_mentions_dependencies
+    return md
+
+
+def _set_markdown_project(md, project):
+    md.inlinePatterns["wikilink"].config["base_url"] = "/project/{}/wiki/".format(project.slug)
+    md.inlinePatterns["taiga-references"].project = project
+
+
+def _get_markdown(project):
+    """
+    Return the Markdown instance of the current thread ready to convert
+    a document of the project.
+
+    Building a Markdown instance with all the extensions is expensive so
+    it is done once per thread and only reset between documents.
+    """
+    md = getattr(_local, "markdown", None)
+    if md is None:
+        md = _local.markdown = _make_markdown()
+
+    md.reset()
+    _set_markdown_project(md, project)
     md.extracted_data = {"mentions": [], "references": []}
     return md
 
@@ -145,4 +317,4 @@ def get_diff_of_htmls(html1, html2):
     diffutil.diff_cleanupSemantic(diffs)
     return diffutil.diff_pretty_html(diffs)
 
-__all__ = ["render", "get_diff_of_htmls", "render_and_extract"]
+__all__ = ["render", "get_diff_of_htmls", "render_and_extract", "get_cache_stats"]
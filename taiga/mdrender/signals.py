@@ -0,0 +1,32 @@
+# Copyright (C) 2014 Andrey Antukh <niwi@niwi.be>
+# Copyright (C) 2014 Jesús Espino <jespinog@gmail.com>
+# Copyright (C) 2014 David Barragán <bameda@dbarragan.com>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from .service import invalidate_reference
+from .service import invalidate_mention
+
+
+def invalidate_reference_renders(sender, instance, **kwargs):
+    # The cached renders show the subject of the referenced object
+    if instance.ref is not None:
+        invalidate_reference(instance.project_id, instance.ref)
+
+
+def invalidate_mention_renders(sender, instance, update_fields=None, **kwargs):
+    # The cached renders show the full name of the mentioned user,
+    # logins don't change it.
+    if update_fields is not None and set(update_fields) == {"last_login"}:
+        return
+    invalidate_mention(instance.username)
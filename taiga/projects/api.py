@@ -37,6 +37,7 @@ from taiga.base.api.permissions import IsAuthenticatedPermission, AllowAnyPermis
 from taiga.base.utils.slug import slugify_uniquely
 from taiga.users.models import Role
 from taiga.projects.issues.models import Issue
+from taiga.projects.issues.api import IssuesFilter
 from taiga.projects.userstories.models import UserStory
 from taiga.projects.tasks.models import Task
 
@@ -76,7 +77,8 @@ class ProjectViewSet(ModelCrudViewSet):
     def issue_filters_data(self, request, pk=None):
         project = self.get_object()
         self.check_permissions(request, 'issues_filters_data', project)
-        return Response(services.get_issues_filters_data(project))
+        filters = IssuesFilter()._prepare_filters_data(request)
+        return Response(services.get_issues_filters_data(project, filters))
 
     @detail_route(methods=['get'])
     def tags_colors(self, request, pk=None):
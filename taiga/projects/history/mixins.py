@@ -16,6 +16,8 @@
 
 import warnings
 
+from taiga.projects.mixins.loaded_state import LoadedStateMixin
+
 from .services import take_snapshot
 
 
@@ -47,6 +49,30 @@ class HistoryResourceMixin(object):
         """
         return obj
 
+    def get_changed_fields_for_snapshot(self, obj):
+        """
+        Method that returns the fields changed by the current
+        request, or None if they are unknown. Partial updates
+        that only change hidden fields (like the order ones)
+        are stored without freezing the object again.
+
+        The model fields sent with the same stored value are
+        not considered changed if the object knows the fields
+        changed by its last save.
+        """
+        if self.request.method != "PATCH":
+            return None
+
+        changed_fields = frozenset(self.request.DATA.keys()) - frozenset(["version", "comment"])
+
+        saved_changes = obj.get_saved_changes() if isinstance(obj, LoadedStateMixin) else None
+        if saved_changes is not None:
+            model_fields = frozenset(field.name for field in obj._meta.concrete_fields)
+            changed_fields = frozenset(name for name in changed_fields
+                                       if name not in model_fields or name in saved_changes)
+
+        return changed_fields
+
     def persist_history_snapshot(self, obj=None, delete:bool=False):
         """
         Shortcut for resources with special save/persist
@@ -63,7 +89,12 @@ class HistoryResourceMixin(object):
         if sobj != obj and delete:
             delete = False
 
-        self.__last_history = take_snapshot(sobj, comment=comment, user=user, delete=delete)
+        changed_fields = None
+        if sobj == obj:
+            changed_fields = self.get_changed_fields_for_snapshot(obj)
+
+        self.__last_history = take_snapshot(sobj, comment=comment, user=user, delete=delete,
+                                            changed_fields=changed_fields)
         self.__object_saved = True
 
     def post_save(self, obj, created=False):
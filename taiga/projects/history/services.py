@@ -25,18 +25,25 @@ This is possible example:
           # Do something...
           history.persist_history(object, user=request.user)
 """
+import json
 import logging
+import operator
 from collections import namedtuple
+from collections import defaultdict
 from copy import deepcopy
 from functools import partial
 from functools import wraps
 from functools import lru_cache
+from functools import reduce
 
 from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
 from django.contrib.contenttypes.models import ContentType
 from django.core.paginator import Paginator, InvalidPage
 from django.apps import apps
 from django.db import transaction as tx
+from django.db.models import Q
 
 from taiga.mdrender.service import render as mdrender
 from taiga.base.utils.db import get_typename_for_model_class
@@ -52,6 +59,10 @@ FrozenDiff = namedtuple("FrozenDiff", ["key", "diff", "snapshot"])
 # Dict containing registred contentypes with their freeze implementation.
 _freeze_impl_map = {}
 
+# Dict containing registred contentypes with the related objects
+# that their freeze implementation needs (select_related, prefetch_related).
+_freeze_related_map = {}
+
 # Dict containing registred containing with their values implementation.
 _values_impl_map = {}
 
@@ -100,27 +111,56 @@ def register_values_implementation(typename:str, fn=None):
     return _wrapper
 
 
-def register_freeze_implementation(typename:str, fn=None):
+def register_freeze_implementation(typename:str, fn=None, *, select_related:tuple=(),
+                                   prefetch_related:tuple=()):
     """
     Register freeze implementation for specified typename.
     This function can be used as decorator.
+
+    The optional select_related and prefetch_related
+    parameters declares the related objects used by the
+    implementation, and they are loaded together with
+    the instance that will be freezed.
     """
 
     assert isinstance(typename, str), "typename must be specied"
 
     if fn is None:
-        return partial(register_freeze_implementation, typename)
+        return partial(register_freeze_implementation, typename,
+                       select_related=select_related,
+                       prefetch_related=prefetch_related)
 
     @wraps(fn)
     def _wrapper(*args, **kwargs):
         return fn(*args, **kwargs)
 
     _freeze_impl_map[typename] = _wrapper
+    _freeze_related_map[typename] = (tuple(select_related), tuple(prefetch_related))
     return _wrapper
 
 
 # Low level api
 
+def get_freeze_queryset(model_cls:object):
+    """
+    Get a queryset for the model class that loads all
+    related objects needed by its freeze implementation.
+    """
+    typename = get_typename_for_model_class(model_cls)
+    if typename not in _freeze_impl_map:
+        raise RuntimeError("No implementation found for {}".format(typename))
+
+    select_related, prefetch_related = _freeze_related_map[typename]
+
+    qs = model_cls.objects.all()
+    if select_related:
+        qs = qs.select_related(*select_related)
+    if prefetch_related:
+        qs = qs.prefetch_related(*prefetch_related)
+
+    return qs
+
+
 def freeze_model_instance(obj:object) -> FrozenObj:
     """
     Creates a new frozen object from model instance.
@@ -131,18 +171,15 @@ def freeze_model_instance(obj:object) -> FrozenObj:
     """
 
     model_cls = obj.__class__
+    typename = get_typename_for_model_class(model_cls)
 
     # Additional query for test if object is really exists
-    # on the database or it is removed.
-    try:
-        obj = model_cls.objects.get(pk=obj.pk)
-    except model_cls.DoesNotExist:
+    # on the database or it is removed. It also loads in the
+    # same pass all related objects used by the freezer.
+    obj = get_freeze_queryset(model_cls).filter(pk=obj.pk).first()
+    if obj is None:
         return None
 
-    typename = get_typename_for_model_class(model_cls)
-    if typename not in _freeze_impl_map:
-        raise RuntimeError("No implementation found for {}".format(typename))
-
     key = make_key_from_model_object(obj)
     impl_fn = _freeze_impl_map[typename]
     snapshot = impl_fn(obj)
@@ -171,6 +208,33 @@ def is_hidden_snapshot(obj:FrozenDiff) -> bool:
     return False
 
 
+def is_hidden_change(obj:object, changed_fields, *, comment:str="", delete:bool=False) -> bool:
+    """
+    Check if a change that only touches the specified
+    fields will be considered hidden. Such changes can
+    be stored without freezing the object again.
+    """
+    if delete or comment or not changed_fields:
+        return False
+
+    typename = get_typename_for_model_class(obj.__class__)
+    nfields = _not_important_fields.get(typename, frozenset())
+    return frozenset(changed_fields) <= nfields
+
+
+def update_frozen_object(fobj:FrozenObj, obj:object, fields) -> FrozenObj:
+    """
+    Build a new frozen object from other one replacing
+    only the value of the specified fields with the
+    current values of the model instance.
+    """
+    snapshot = dict(fobj.snapshot)
+    for fieldname in fields:
+        snapshot[fieldname] = getattr(obj, fieldname)
+
+    return FrozenObj(fobj.key, snapshot)
+
+
 def make_diff(oldobj:FrozenObj, newobj:FrozenObj) -> FrozenDiff:
     """
     Compute a diff between two frozen objects.
@@ -214,50 +278,133 @@ def _rebuild_snapshot_from_diffs(keysnapshot, partials):
     return result
 
 
-def get_last_snapshot_for_key(key:str) -> FrozenObj:
+def _make_state_cache_key(key:str) -> str:
+    return "history-state:{0}".format(key)
+
+
+def _normalize_snapshot(snapshot:dict) -> dict:
+    """
+    Pass the snapshot through the same json encoding
+    that uses the HistoryEntry storage, so a cached
+    state is equal to the one rebuilt from database.
+    """
+    return json.loads(json.dumps(snapshot, cls=DjangoJSONEncoder))
+
+
+def _set_cached_state(key:str, *, entry_id:str, snapshot:dict, partials:int):
+    state = {"entry_id": entry_id, "snapshot": snapshot, "partials": partials}
+    timeout = getattr(settings, "HISTORY_STATE_CACHE_TIMEOUT", 60 * 60 * 24)
+    cache.set(_make_state_cache_key(key), state, timeout=timeout)
+
+
+def _get_cached_states(keys:tuple) -> dict:
+    """
+    Get the materialized states for the keys that are
+    still valid. A state is only valid if it was built
+    from the last history entry of its key, so it can
+    not be stale after rollbacks or writes done by
+    other processes.
+    """
+    cache_keys = {_make_state_cache_key(key): key for key in keys}
+    states = {cache_keys[ck]: state for ck, state in cache.get_many(cache_keys).items()}
+    if not states:
+        return {}
+
     entry_model = apps.get_model("history", "HistoryEntry")
+    last_entries = dict(entry_model.objects
+                        .filter(key__in=states.keys())
+                        .order_by("key", "-created_at")
+                        .distinct("key")
+                        .values_list("key", "id"))
 
-    # Search last snapshot
-    qs = (entry_model.objects
-          .filter(key=key, is_snapshot=True)
-          .order_by("-created_at"))
+    return {key: state for key, state in states.items()
+            if last_entries.get(key) == state["entry_id"]}
 
-    keysnapshot = qs.first()
-    if keysnapshot is None:
-        return None, True
+
+def _get_last_states_for_keys(keys) -> dict:
+    """
+    Get a dict that maps each key to a tuple with its
+    last frozen object (or None) and the number of partial
+    entries written after its last complete snapshot.
+    """
+    entry_model = apps.get_model("history", "HistoryEntry")
+    keys = tuple(set(keys))
+    result = {}
+
+    # Try to use the materialized states
+    for key, state in _get_cached_states(keys).items():
+        result[key] = (FrozenObj(key, deepcopy(state["snapshot"])), state["partials"])
+
+    missing_keys = tuple(key for key in keys if key not in result)
+    if not missing_keys:
+        return result
+
+    # Search last snapshots
+    keysnapshots = {entry.key: entry for entry in (entry_model.objects
+                                                   .filter(key__in=missing_keys, is_snapshot=True)
+                                                   .order_by("key", "-created_at")
+                                                   .distinct("key"))}
 
     # Get all partial snapshots
-    entries = tuple(entry_model.objects
-                    .filter(key=key, is_snapshot=False)
-                    .filter(created_at__gte=keysnapshot.created_at)
-                    .order_by("created_at"))
+    partials = defaultdict(list)
+    if keysnapshots:
+        query = reduce(operator.or_, (Q(key=key, created_at__gte=entry.created_at)
+                                      for key, entry in keysnapshots.items()))
+        for entry in (entry_model.objects
+                      .filter(query, is_snapshot=False)
+                      .order_by("created_at")):
+            partials[entry.key].append(entry)
+
+    for key in missing_keys:
+        keysnapshot = keysnapshots.get(key, None)
+        if keysnapshot is None:
+            result[key] = (None, 0)
+            continue
+
+        entries = partials[key]
+        snapshot = _rebuild_snapshot_from_diffs(keysnapshot.snapshot, entries)
+        last_entry = entries[-1] if entries else keysnapshot
+        _set_cached_state(key, entry_id=last_entry.id,
+                          snapshot=deepcopy(snapshot),
+                          partials=len(entries))
+
+        result[key] = (FrozenObj(keysnapshot.key, snapshot), len(entries))
 
-    snapshot = _rebuild_snapshot_from_diffs(keysnapshot.snapshot, entries)
-    max_partial_diffs = getattr(settings, "MAX_PARTIAL_DIFFS", 60)
+    return result
 
-    if len(entries) >= max_partial_diffs:
-        return FrozenObj(keysnapshot.key, snapshot), True
 
-    return FrozenObj(keysnapshot.key, snapshot), False
+def _need_real_snapshot(fobj:FrozenObj, partials:int) -> bool:
+    if fobj is None:
+        return True
 
+    max_partial_diffs = getattr(settings, "MAX_PARTIAL_DIFFS", 60)
+    return partials >= max_partial_diffs
 
-# Public api
 
-@tx.atomic
-def take_snapshot(obj:object, *, comment:str="", user=None, delete:bool=False):
+def get_last_snapshots_for_keys(keys) -> dict:
     """
-    Given any model instance with registred content type,
-    create new history entry of "change" type.
-
-    This raises exception in case of object wasn't
-    previously freezed.
+    Get a dict that maps each key to the same tuple
+    returned by get_last_snapshot_for_key, resolving
+    all keys together.
     """
+    return {key: (fobj, _need_real_snapshot(fobj, partials))
+            for key, (fobj, partials) in _get_last_states_for_keys(keys).items()}
 
-    key = make_key_from_model_object(obj)
-    typename = get_typename_for_model_class(obj.__class__)
 
-    new_fobj = freeze_model_instance(obj)
-    old_fobj, need_real_snapshot = get_last_snapshot_for_key(key)
+def get_last_snapshot_for_key(key:str) -> FrozenObj:
+    fobj, partials = _get_last_states_for_keys([key])[key]
+    return fobj, _need_real_snapshot(fobj, partials)
+
+
+def _make_history_entry(obj:object, new_fobj:FrozenObj, old_fobj:FrozenObj,
+                        need_real_snapshot:bool, *, comment:str="", user=None,
+                        delete:bool=False):
+    """
+    Build (without saving) the history entry for the
+    change between two frozen objects. Returns None if
+    there is nothing to store.
+    """
+    typename = get_typename_for_model_class(obj.__class__)
 
     entry_model = apps.get_model("history", "HistoryEntry")
     user_id = None if user is None else user.id
@@ -292,18 +439,128 @@ def take_snapshot(obj:object, *, comment:str="", user=None, delete:bool=False):
 
     kwargs = {
         "user": {"pk": user_id, "name": user_name},
-        "key": key,
+        "key": fdiff.key,
         "type": entry_type,
         "snapshot": fdiff.snapshot if need_real_snapshot else None,
         "diff": fdiff.diff,
         "values": fvals,
         "comment": comment,
-        "comment_html": mdrender(obj.project, comment),
+        "comment_html": mdrender(obj.project, comment) if comment else "",
         "is_hidden": is_hidden,
         "is_snapshot": need_real_snapshot,
     }
 
-    return entry_model.objects.create(**kwargs)
+    return entry_model(**kwargs), fdiff.snapshot
+
+
+# Public api
+
+@tx.atomic
+def take_snapshot(obj:object, *, comment:str="", user=None, delete:bool=False,
+                  changed_fields=None):
+    """
+    Given any model instance with registred content type,
+    create new history entry of "change" type.
+
+    This raises exception in case of object wasn't
+    previously freezed.
+
+    If the caller knows that only hidden fields (like the
+    order ones) are changed, it can pass them with the
+    `changed_fields` parameter and the new entry is built
+    from the last snapshot without freezing the object.
+    """
+
+    key = make_key_from_model_object(obj)
+    old_fobj, partials = _get_last_states_for_keys([key])[key]
+
+    if old_fobj is not None and is_hidden_change(obj, changed_fields,
+                                                 comment=comment, delete=delete):
+        new_fobj = update_frozen_object(old_fobj, obj, changed_fields)
+    else:
+        new_fobj = freeze_model_instance(obj)
+
+    need_real_snapshot = _need_real_snapshot(old_fobj, partials)
+
+    result = _make_history_entry(obj, new_fobj, old_fobj, need_real_snapshot,
+                                 comment=comment, user=user, delete=delete)
+    if result is None:
+        return None
+
+    entry, snapshot = result
+    entry.save(force_insert=True)
+
+    _set_cached_state(key, entry_id=entry.id,
+                      snapshot=_normalize_snapshot(snapshot),
+                      partials=0 if need_real_snapshot else partials + 1)
+    return entry
+
+
+@tx.atomic
+def take_snapshots_in_bulk(objs, *, comment:str="", user=None, changed_fields=None) -> list:
+    """
+    Same as take_snapshot but for a list of model instances.
+
+    All instances are freezed together, their last
+    snapshots are resolved at once and all the new history
+    entries are inserted with one query.
+    """
+
+    objs = list(objs)
+    old_states = _get_last_states_for_keys(make_key_from_model_object(obj) for obj in objs)
+
+    new_fobjs = {}
+    instances = []
+    objs_by_model = defaultdict(list)
+    for obj in objs:
+        key = make_key_from_model_object(obj)
+        old_fobj, _ = old_states[key]
+
+        if old_fobj is not None and is_hidden_change(obj, changed_fields, comment=comment):
+            new_fobjs[key] = update_frozen_object(old_fobj, obj, changed_fields)
+            instances.append(obj)
+        else:
+            objs_by_model[obj._meta.concrete_model].append(obj)
+
+    # Freeze all remaining instances that still exists in the database
+    for model_cls, model_objs in objs_by_model.items():
+        typename = get_typename_for_model_class(model_cls)
+        impl_fn = _freeze_impl_map.get(typename, None)
+        qs = get_freeze_queryset(model_cls).filter(pk__in=[obj.pk for obj in model_objs])
+
+        for instance in qs:
+            snapshot = impl_fn(instance)
+            assert isinstance(snapshot, dict), "freeze handlers should return always a dict"
+
+            key = make_key_from_model_object(instance)
+            new_fobjs[key] = FrozenObj(key, snapshot)
+            instances.append(instance)
+
+    entries = []
+    states = []
+    for instance in instances:
+        key = make_key_from_model_object(instance)
+        old_fobj, partials = old_states[key]
+        need_real_snapshot = _need_real_snapshot(old_fobj, partials)
+
+        result = _make_history_entry(instance, new_fobjs[key], old_fobj, need_real_snapshot,
+                                     comment=comment, user=user)
+        if result is None:
+            continue
+
+        entry, snapshot = result
+        entries.append(entry)
+        states.append((snapshot, 0 if need_real_snapshot else partials + 1))
+
+    entry_model = apps.get_model("history", "HistoryEntry")
+    entry_model.objects.bulk_create(entries)
+
+    for entry, (snapshot, partials) in zip(entries, states):
+        _set_cached_state(entry.key, entry_id=entry.id,
+                          snapshot=_normalize_snapshot(snapshot),
+                          partials=partials)
+
+    return entries
 
 
 # High level query api
@@ -323,6 +580,22 @@ def get_history_queryset_by_model_instance(obj:object, types=(HistoryType.change
     return qs.order_by("created_at")
 
 
+def get_history_queryset_by_model_instances(objs:list, types=(HistoryType.change,),
+                                            include_hidden=False):
+    """
+    Same as `get_history_queryset_by_model_instance` but for the history
+    of many objects at once.
+    """
+    keys = [make_key_from_model_object(obj) for obj in objs]
+    history_entry_model = apps.get_model("history", "HistoryEntry")
+
+    qs = history_entry_model.objects.filter(key__in=keys, type__in=types)
+    if not include_hidden:
+        qs = qs.filter(is_hidden=False)
+
+    return qs.order_by("created_at")
+
+
 # Freeze implementatitions
 from .freeze_impl import project_freezer
 from .freeze_impl import milestone_freezer
@@ -333,10 +606,18 @@ from .freeze_impl import wikipage_freezer
 
 register_freeze_implementation("projects.project", project_freezer)
 register_freeze_implementation("milestones.milestone", milestone_freezer,)
-register_freeze_implementation("userstories.userstory", userstory_freezer)
-register_freeze_implementation("issues.issue", issue_freezer)
-register_freeze_implementation("tasks.task", task_freezer)
-register_freeze_implementation("wiki.wikipage", wikipage_freezer)
+register_freeze_implementation("userstories.userstory", userstory_freezer,
+                               select_related=("project",),
+                               prefetch_related=("role_points", "watchers", "attachments"))
+register_freeze_implementation("issues.issue", issue_freezer,
+                               select_related=("project",),
+                               prefetch_related=("watchers", "attachments"))
+register_freeze_implementation("tasks.task", task_freezer,
+                               select_related=("project",),
+                               prefetch_related=("watchers", "attachments"))
+register_freeze_implementation("wiki.wikipage", wikipage_freezer,
+                               select_related=("project",),
+                               prefetch_related=("watchers", "attachments"))
 
 from .freeze_impl import milestone_values
 from .freeze_impl import userstory_values
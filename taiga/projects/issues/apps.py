@@ -32,9 +32,17 @@ class IssuesAppConfig(AppConfig):
                                  sender=apps.get_model("issues", "Issue"),
                                  dispatch_uid="set_finished_date_when_edit_issue")
 
+        # Filters data
+        signals.post_save.connect(handlers.invalidate_issues_filters_data_when_change_issue,
+                                  sender=apps.get_model("issues", "Issue"))
+        signals.post_delete.connect(handlers.invalidate_issues_filters_data_when_change_issue,
+                                    sender=apps.get_model("issues", "Issue"))
+
         # Tags
         signals.pre_save.connect(generic_handlers.tags_normalization,
                                  sender=apps.get_model("issues", "Issue"))
+        signals.pre_save.connect(generic_handlers.cached_prev_tags,
+                                 sender=apps.get_model("issues", "Issue"))
         signals.post_save.connect(generic_handlers.update_project_tags_when_create_or_edit_taggable_item,
                                   sender=apps.get_model("issues", "Issue"))
         signals.post_delete.connect(generic_handlers.update_project_tags_when_delete_taggable_item,
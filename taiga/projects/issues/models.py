@@ -24,12 +24,13 @@ from django.utils.translation import ugettext_lazy as _
 from taiga.projects.occ import OCCModelMixin
 from taiga.projects.notifications.mixins import WatchedModelMixin
 from taiga.projects.mixins.blocked import BlockedMixin
+from taiga.projects.mixins.loaded_state import LoadedStateMixin
 from taiga.base.tags import TaggedMixin
 
 from taiga.projects.services.tags_colors import update_project_tags_colors_handler, remove_unused_tags
 
 
-class Issue(OCCModelMixin, WatchedModelMixin, BlockedMixin, TaggedMixin, models.Model):
+class Issue(OCCModelMixin, WatchedModelMixin, BlockedMixin, TaggedMixin, LoadedStateMixin, models.Model):
     ref = models.BigIntegerField(db_index=True, null=True, blank=True, default=None,
                                  verbose_name=_("ref"))
     owner = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, default=None,
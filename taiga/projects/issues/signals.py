@@ -16,6 +16,8 @@
 
 from django.utils import timezone
 
+from taiga.projects.services.filters import invalidate_issues_filters_data
+
 
 ####################################
 # Signals for set finished date
@@ -26,3 +28,11 @@ def set_finished_date_when_edit_issue(sender, instance, **kwargs):
         instance.finished_date = timezone.now()
     elif not instance.status.is_closed and instance.finished_date:
         instance.finished_date = None
+
+
+####################################
+# Signals for issues filters data
+####################################
+
+def invalidate_issues_filters_data_when_change_issue(sender, instance, **kwargs):
+    invalidate_issues_filters_data(instance.project_id)
@@ -0,0 +1,48 @@
+# Copyright (C) 2014 Andrey Antukh <niwi@niwi.be>
+# Copyright (C) 2014 Jesús Espino <jespinog@gmail.com>
+# Copyright (C) 2014 David Barragán <bameda@dbarragan.com>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from taiga.projects.models import Project
+from taiga.projects.userstories.services import rebuild_userstories_counters
+from taiga.projects.milestones.services import rebuild_milestones_counters
+
+
+class Command(BaseCommand):
+    args = '[<project_slug> ...]'
+    help = ('Count again the open tasks of the user stories and the open tasks and user '
+            'stories of the milestones used to close them automatically (of all the '
+            'projects if no project is given)')
+
+    def handle(self, *args, **options):
+        if not args:
+            with transaction.atomic():
+                rebuild_userstories_counters()
+                rebuild_milestones_counters()
+            self.stdout.write("Counters of all the projects rebuilt")
+            return
+
+        for slug in args:
+            try:
+                project = Project.objects.get(slug=slug)
+            except Project.DoesNotExist:
+                raise CommandError('Project "%s" does not exist' % slug)
+
+            with transaction.atomic():
+                rebuild_userstories_counters(project.id)
+                rebuild_milestones_counters(project.id)
+            self.stdout.write("Counters of {} rebuilt".format(slug))
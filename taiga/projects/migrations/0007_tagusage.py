@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+def count_tags_usages(apps, schema_editor):
+    schema_editor.execute("""
+        INSERT INTO projects_tagusage (project_id, tag, count)
+             SELECT project_id, tag, count(*)
+               FROM (SELECT DISTINCT id, project_id, unnest(tags) AS tag FROM userstories_userstory
+                     UNION ALL
+                     SELECT DISTINCT id, project_id, unnest(tags) AS tag FROM tasks_task
+                     UNION ALL
+                     SELECT DISTINCT id, project_id, unnest(tags) AS tag FROM issues_issue) AS items
+           GROUP BY project_id, tag
+    """)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0006_auto_20141029_1040'),
+        ('userstories', '0006_auto_20141014_1524'),
+        ('tasks', '0002_tasks_order_fields'),
+        ('issues', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TagUsage',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False, auto_created=True, verbose_name='ID')),
+                ('tag', models.TextField(verbose_name='tag')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='count')),
+                ('project', models.ForeignKey(verbose_name='project', to='projects.Project', related_name='tags_usages')),
+            ],
+            options={
+                'verbose_name': 'tag usage',
+                'verbose_name_plural': 'tags usages',
+            },
+            bases=(models.Model,),
+        ),
+        migrations.AlterUniqueTogether(
+            name='tagusage',
+            unique_together=set([('project', 'tag')]),
+        ),
+        migrations.RunPython(count_tags_usages),
+    ]
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0007_tagusage'),
+        ('userstories', '0006_auto_20141014_1524'),
+        ('tasks', '0002_tasks_order_fields'),
+        ('issues', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            "CREATE INDEX userstories_userstory_tags_idx ON userstories_userstory USING gin(tags)",
+            "DROP INDEX userstories_userstory_tags_idx"
+        ),
+        migrations.RunSQL(
+            "CREATE INDEX tasks_task_tags_idx ON tasks_task USING gin(tags)",
+            "DROP INDEX tasks_task_tags_idx"
+        ),
+        migrations.RunSQL(
+            "CREATE INDEX issues_issue_tags_idx ON issues_issue USING gin(tags)",
+            "DROP INDEX issues_issue_tags_idx"
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Copyright (C) 2014 Andrey Antukh <niwi@niwi.be>
+# Copyright (C) 2014 Jesús Espino <jespinog@gmail.com>
+# Copyright (C) 2014 David Barragán <bameda@dbarragan.com>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from django.apps import AppConfig
+from django.apps import apps
+from django.db.models import signals
+
+from . import signals as handlers
+
+
+class MilestonesAppConfig(AppConfig):
+    name = "taiga.projects.milestones"
+    verbose_name = "Milestones"
+
+    def ready(self):
+        # Project stats
+        signals.post_save.connect(handlers.invalidate_project_stats_when_change_milestone,
+                                  sender=apps.get_model("milestones", "Milestone"))
+        signals.post_delete.connect(handlers.invalidate_project_stats_when_change_milestone,
+                                    sender=apps.get_model("milestones", "Milestone"))
+
+        # Open items counters
+        signals.post_save.connect(handlers.create_counters_when_create_milestone,
+                                  sender=apps.get_model("milestones", "Milestone"))
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+def count_milestones_open_items(apps, schema_editor):
+    schema_editor.execute("""
+        INSERT INTO milestones_milestonecounters (milestone_id, open_tasks, open_user_stories)
+             SELECT milestone.id,
+                    (SELECT count(*) FROM tasks_task AS task
+                       JOIN projects_taskstatus AS status ON status.id = task.status_id
+                      WHERE task.milestone_id = milestone.id AND NOT status.is_closed),
+                    (SELECT count(*) FROM userstories_userstory AS us
+                      WHERE us.milestone_id = milestone.id AND NOT us.is_closed)
+               FROM milestones_milestone AS milestone
+    """)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('milestones', '0001_initial'),
+        ('userstories', '0006_auto_20141014_1524'),
+        ('tasks', '0002_tasks_order_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MilestoneCounters',
+            fields=[
+                ('milestone', models.OneToOneField(primary_key=True, serialize=False, to='milestones.Milestone', related_name='counters', verbose_name='milestone')),
+                ('open_tasks', models.IntegerField(default=0, verbose_name='open tasks')),
+                ('open_user_stories', models.IntegerField(default=0, verbose_name='open user stories')),
+            ],
+            options={
+                'verbose_name': 'milestone counters',
+                'verbose_name_plural': 'milestones counters',
+            },
+            bases=(models.Model,),
+        ),
+        migrations.RunPython(count_milestones_open_items),
+    ]
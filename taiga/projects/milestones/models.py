@@ -138,3 +138,20 @@ class Milestone(WatchedModelMixin, models.Model):
                 finish_date__lt=date + datetime.timedelta(days=1)
             ).prefetch_related('role_points', 'role_points__points') if us.is_closed
         ])
+
+
+class MilestoneCounters(models.Model):
+    """
+    Number of open tasks and user stories of a milestone, used to
+    know if it must be closed without loading them.
+    """
+    milestone = models.OneToOneField("Milestone", null=False, blank=False, primary_key=True,
+                                     related_name="counters", verbose_name=_("milestone"))
+    open_tasks = models.IntegerField(null=False, blank=False, default=0,
+                                     verbose_name=_("open tasks"))
+    open_user_stories = models.IntegerField(null=False, blank=False, default=0,
+                                            verbose_name=_("open user stories"))
+
+    class Meta:
+        verbose_name = "milestone counters"
+        verbose_name_plural = "milestones counters"
@@ -14,15 +14,109 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import datetime
+from contextlib import closing
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
 from django.utils import timezone
 
+from taiga.base.utils.dicts import dict_sum
+from taiga.projects.services.stats import get_points_cache_version
+
 from . import models
 
 
 
+def get_milestone_counters(milestone) -> tuple:
+    """
+    Get the number of open tasks and open user stories of the
+    milestone.
+    """
+    counters = (models.MilestoneCounters.objects.filter(milestone_id=milestone.id)
+                                                .values_list("open_tasks", "open_user_stories")
+                                                .first())
+    if counters is None:
+        # Not counted yet (like the milestones created with the
+        # signals disconnected), count them
+        counters = (milestone.tasks.filter(status__is_closed=False).count(),
+                    milestone.user_stories.filter(is_closed=False).count())
+    return counters
+
+
+def update_milestones_counters(increments:dict):
+    """
+    Add the increments to the counters of the milestones.
+    `increments` should be a dict with the following format:
+
+    {<milestone id>: (<open tasks increment>, <open user stories increment>), ...}
+
+    The rows are updated in id order, like in `update_userstories_counters`.
+    """
+    params = [(open_tasks, open_user_stories, milestone_id)
+              for milestone_id, (open_tasks, open_user_stories) in sorted(increments.items())
+              if milestone_id and (open_tasks or open_user_stories)]
+    if not params:
+        return
+
+    sql = ("UPDATE milestones_milestonecounters "
+           "SET open_tasks = open_tasks + %s, open_user_stories = open_user_stories + %s "
+           "WHERE milestone_id = %s")
+
+    with closing(connection.cursor()) as cursor:
+        cursor.executemany(sql, params)
+
+
+def rebuild_milestones_counters(project_id:int=None):
+    """
+    Count again the open tasks and user stories of the milestones
+    of the project (of all the projects if it is None). The counters
+    rows are locked and updated in place, like in
+    `rebuild_userstories_counters`.
+    """
+    where_clause = "WHERE milestone.project_id = %(project_id)s" if project_id is not None else ""
+    counts_sql = """
+             SELECT milestone.id AS milestone_id,
+                    (SELECT count(*) FROM tasks_task AS task
+                       JOIN projects_taskstatus AS status ON status.id = task.status_id
+                      WHERE task.milestone_id = milestone.id AND NOT status.is_closed) AS open_tasks,
+                    (SELECT count(*) FROM userstories_userstory AS us
+                      WHERE us.milestone_id = milestone.id AND NOT us.is_closed) AS open_user_stories
+               FROM milestones_milestone AS milestone
+                {}
+    """.format(where_clause)
+
+    lock_sql = """
+        SELECT 1 FROM milestones_milestonecounters
+         WHERE milestone_id IN (SELECT id FROM milestones_milestone AS milestone {})
+         ORDER BY milestone_id
+           FOR UPDATE
+    """.format(where_clause)
+    update_sql = """
+        UPDATE milestones_milestonecounters AS counters
+           SET open_tasks = counts.open_tasks, open_user_stories = counts.open_user_stories
+          FROM ({}) AS counts
+         WHERE counters.milestone_id = counts.milestone_id
+    """.format(counts_sql)
+    insert_sql = """
+        INSERT INTO milestones_milestonecounters (milestone_id, open_tasks, open_user_stories)
+             SELECT counts.milestone_id, counts.open_tasks, counts.open_user_stories
+               FROM ({}) AS counts
+              WHERE NOT EXISTS (SELECT 1 FROM milestones_milestonecounters AS counters
+                                 WHERE counters.milestone_id = counts.milestone_id)
+    """.format(counts_sql)
+
+    with closing(connection.cursor()) as cursor:
+        cursor.execute(lock_sql, {"project_id": project_id})
+        cursor.execute(update_sql, {"project_id": project_id})
+        cursor.execute(insert_sql, {"project_id": project_id})
+
+
 def calculate_milestone_is_closed(milestone):
-    return (all([task.status.is_closed for task in milestone.tasks.all()]) and
-            all([user_story.is_closed for user_story in milestone.user_stories.all()]))
+    open_tasks, open_user_stories = get_milestone_counters(milestone)
+    return open_tasks == 0 and open_user_stories == 0
 
 
 def close_milestone(milestone):
@@ -35,3 +129,100 @@ def open_milestone(milestone):
     if milestone.closed:
         milestone.closed = False
         milestone.save(update_fields=["closed",])
+
+
+def _calculate_milestone_points(milestone) -> dict:
+    role_points_model = apps.get_model("userstories", "RolePoints")
+
+    user_stories = {}
+    for us_id, is_closed, finish_date in milestone.user_stories.values_list("id", "is_closed",
+                                                                             "finish_date"):
+        user_stories[us_id] = {"is_closed": is_closed, "finish_date": finish_date, "points": {}}
+
+    rows = (role_points_model.objects
+            .filter(user_story__milestone_id=milestone.id)
+            .values_list("user_story_id", "role_id", "points__value"))
+    for us_id, role_id, value in rows:
+        user_stories[us_id]["points"][role_id] = value if value else 0
+
+    total_points = dict_sum(*[us["points"] for us in user_stories.values()])
+    closed_points = dict_sum(*[us["points"] for us in user_stories.values() if us["is_closed"]])
+
+    # Closed user stories points sorted by finish date, used
+    # for build the burndown with a running sum.
+    closed_user_stories = sorted((us["finish_date"], sum(us["points"].values()))
+                                 for us in user_stories.values()
+                                 if us["is_closed"] and us["finish_date"] is not None)
+
+    return {
+        "total_points": total_points,
+        "closed_points": closed_points,
+        "total_userstories": len(user_stories),
+        "completed_userstories": len([us for us in user_stories.values() if us["is_closed"]]),
+        "closed_user_stories": closed_user_stories,
+    }
+
+
+def get_milestone_points(milestone) -> dict:
+    """
+    Get the points related data of the milestone user stories
+    fetching them only once. Results are cached until the
+    points of the project change (for example when a user
+    story is closed or reopened).
+    """
+    version = get_points_cache_version(milestone.project_id)
+    key = "milestone-points:{}:{}".format(milestone.id, version)
+
+    points = cache.get(key)
+    if points is None:
+        points = _calculate_milestone_points(milestone)
+        timeout = getattr(settings, "PROJECT_STATS_CACHE_TIMEOUT", 60 * 60)
+        cache.set(key, points, timeout=timeout)
+
+    return points
+
+
+def _get_end_of_day(date):
+    end_of_day = datetime.datetime.combine(date + datetime.timedelta(days=1), datetime.time())
+    if settings.USE_TZ:
+        end_of_day = timezone.make_aware(end_of_day, timezone.get_default_timezone())
+    return end_of_day
+
+
+def get_milestone_burndown(milestone, points=None) -> list:
+    """
+    Get the open and optimal points of every day of the
+    milestone, accumulating the closed user stories points
+    in one pass.
+    """
+    if points is None:
+        points = get_milestone_points(milestone)
+
+    days = []
+    current_date = milestone.estimated_start
+    sum_total_points = sum(points["total_points"].values())
+    optimal_points = sum_total_points
+    milestone_days = (milestone.estimated_finish - milestone.estimated_start).days
+    optimal_points_per_day = sum_total_points / milestone_days if milestone_days else 0
+
+    closed_user_stories = points["closed_user_stories"]
+    closed_index = 0
+    sum_closed_points = 0
+
+    while current_date <= milestone.estimated_finish:
+        end_of_day = _get_end_of_day(current_date)
+        while (closed_index < len(closed_user_stories) and
+               closed_user_stories[closed_index][0] < end_of_day):
+            sum_closed_points += closed_user_stories[closed_index][1]
+            closed_index += 1
+
+        days.append({
+            'day': current_date,
+            'name': current_date.day,
+            'open_points': sum_total_points - sum_closed_points,
+            'optimal_points': optimal_points,
+        })
+        current_date = current_date + datetime.timedelta(days=1)
+        optimal_points -= optimal_points_per_day
+
+    return days
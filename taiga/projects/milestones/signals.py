@@ -0,0 +1,36 @@
+# Copyright (C) 2014 Andrey Antukh <niwi@niwi.be>
+# Copyright (C) 2014 Jesús Espino <jespinog@gmail.com>
+# Copyright (C) 2014 David Barragán <bameda@dbarragan.com>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from django.apps import apps
+
+from taiga.projects.services.stats import invalidate_milestones_points
+
+
+####################################
+# Signals for project stats
+####################################
+
+def invalidate_project_stats_when_change_milestone(sender, instance, **kwargs):
+    invalidate_milestones_points(instance.project_id)
+
+
+####################################
+# Signals for the open items counters
+####################################
+
+def create_counters_when_create_milestone(sender, instance, created, **kwargs):
+    if created:
+        apps.get_model("milestones", "MilestoneCounters").objects.create(milestone=instance)
@@ -0,0 +1,242 @@
+# Copyright (C) 2014 Andrey Antukh <niwi@niwi.be>
+# Copyright (C) 2014 Jesús Espino <jespinog@gmail.com>
+# Copyright (C) 2014 David Barragán <bameda@dbarragan.com>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from collections import OrderedDict
+from copy import deepcopy
+import itertools
+import threading
+
+from django.db import models
+from django.db.models.expressions import ExpressionNode
+
+
+# Order of the loads and the writes of the rows done by this process
+_sequence = itertools.count(1)
+
+_local = threading.local()
+
+# Number of rows whose last writes are remembered by each thread
+MAX_WRITTEN_ROWS = 1000
+
+
+def _get_written_rows():
+    if not hasattr(_local, "written_rows"):
+        _local.written_rows = OrderedDict()
+    return _local.written_rows
+
+
+def mark_as_written(model, pks, fields):
+    """
+    Record that some fields of the rows with these primary keys were
+    written by this thread without going through the instances already
+    loaded, like with a queryset `update()`. The saves of the instances
+    record it too. Only the last `MAX_WRITTEN_ROWS` rows are remembered.
+    """
+    concrete_model = model._meta.concrete_model
+    attnames = [concrete_model._meta.get_field(name).attname for name in fields]
+    sequence = next(_sequence)
+
+    written_rows = _get_written_rows()
+    for pk in pks:
+        written = written_rows.pop((concrete_model, pk), {})
+        written.update((attname, sequence) for attname in attnames)
+        written_rows[(concrete_model, pk)] = written
+
+    while len(written_rows) > MAX_WRITTEN_ROWS:
+        written_rows.popitem(last=False)
+
+
+class LoadedStateMixin(models.Model):
+    """
+    Keeps the values of the concrete fields as they were loaded from
+    the database or written by the last save, so the signal handlers,
+    the history and the OCC can know the previous values of an instance
+    without fetching it again.
+
+    The values written with querysets (`update()`, `bulk_create()`...)
+    or through other instances of the same row are not seen by the
+    instances already loaded. The code that needs the stored value of
+    those fields calls `reload_written_values`, that reads them again
+    only if they were written after being loaded (see `mark_as_written`).
+    """
+    class Meta:
+        abstract = True
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._loaded_state = None
+        self._loaded_sequences = {}
+        self._saved_changes = None
+        self._save_depth = 0
+        # Instances built with a primary key come from the database
+        if self.pk is not None:
+            self.mark_as_loaded()
+
+    def _get_current_values(self, attnames):
+        values = {}
+        for attname in attnames:
+            # Deferred fields are not in the instance dict and
+            # reading them with getattr would query the database.
+            if attname not in self.__dict__:
+                continue
+
+            value = self.__dict__[attname]
+            # Values like F("version") + 1 are only known by the database
+            if isinstance(value, ExpressionNode):
+                continue
+
+            values[attname] = deepcopy(value) if isinstance(value, (list, dict)) else value
+        return values
+
+    def mark_as_loaded(self, *fields):
+        """
+        Record the current values of the fields (all of them by default)
+        as the stored ones.
+        """
+        attnames = [field.attname for field in self._get_concrete_fields(fields)]
+        self._set_loaded_values(self._get_current_values(attnames))
+
+    def _set_loaded_values(self, values):
+        if self._loaded_state is None:
+            self._loaded_state = {}
+        self._loaded_state.update(values)
+
+        sequence = next(_sequence)
+        self._loaded_sequences.update((attname, sequence) for attname in values)
+
+    def _get_concrete_fields(self, names=None):
+        # The fields can be given by name or by attname, like in update_fields
+        if not names:
+            return self._meta.concrete_fields
+        names = set(names)
+        return [field for field in self._meta.concrete_fields
+                if field.name in names or field.attname in names]
+
+    def reload_loaded_values(self, *fields):
+        """
+        Read the stored values of the fields from the database, with
+        one query, without changing the current values.
+        """
+        attnames = [field.attname for field in self._get_concrete_fields(fields)]
+        values = type(self)._default_manager.filter(pk=self.pk).values(*attnames).get()
+        self._set_loaded_values(values)
+
+    def reload_written_values(self, *fields):
+        """
+        Reload the loaded fields (all of them by default) written by
+        other code paths after they were loaded. It does not query the
+        database when none of them were written.
+        """
+        written = _get_written_rows().get((self._meta.concrete_model, self.pk), {})
+        attnames = [field.attname for field in self._get_concrete_fields(fields)
+                    if field.attname in self._loaded_sequences and
+                    written.get(field.attname, 0) > self._loaded_sequences[field.attname]]
+        if attnames:
+            self.reload_loaded_values(*attnames)
+
+    def get_loaded_values(self) -> dict:
+        """
+        Get a dict with the stored value of each field attname, or None
+        if the instance was not loaded from the database.
+        """
+        if self._loaded_state is None:
+            return None
+        return dict(self._loaded_state)
+
+    def get_loaded_instance(self):
+        """
+        Get a new instance with the stored values, or None if some of
+        them are unknown (the instance is new or has deferred fields).
+        """
+        if self._loaded_state is None:
+            return None
+
+        model_cls = self._meta.concrete_model
+        if any(field.attname not in self._loaded_state for field in model_cls._meta.concrete_fields):
+            return None
+
+        instance = model_cls(**self._loaded_state)
+        instance._state.adding = False
+        instance._state.db = self._state.db
+        return instance
+
+    def get_changed_fields(self) -> set:
+        """
+        Get the names of the fields whose current value is different
+        from the stored one, or None if the stored values are unknown.
+        """
+        return self._get_changed_fields(self._loaded_state)
+
+    def _get_changed_fields(self, loaded_state):
+        if loaded_state is None:
+            return None
+
+        changed_fields = set()
+        for field in self._meta.concrete_fields:
+            if field.attname not in self.__dict__:
+                continue
+            if (field.attname not in loaded_state or
+                    self.__dict__[field.attname] != loaded_state[field.attname]):
+                changed_fields.add(field.name)
+        return changed_fields
+
+    def get_saved_changes(self) -> set:
+        """
+        Get the names of the fields changed by the last save, including
+        the ones changed by the signal handlers that saved the instance
+        again while it was saved, or None if they are unknown.
+        """
+        return self._saved_changes
+
+    def _save_table(self, raw=False, cls=None, force_insert=False,
+                    force_update=False, using=None, update_fields=None):
+        updated = super()._save_table(raw, cls, force_insert, force_update, using, update_fields)
+        # The signal handlers can load or save other instances of the
+        # row before this one marks the written values as loaded.
+        if updated:
+            fields = [field.name for field in self._get_concrete_fields(update_fields)]
+            mark_as_written(type(self), [self.pk], fields)
+        return updated
+
+    def save(self, *args, **kwargs):
+        # The changes are computed against the values stored before
+        # this save, the signal handlers can save the instance again.
+        loaded_state = self.get_loaded_values()
+
+        self._save_depth += 1
+        try:
+            super().save(*args, **kwargs)
+        finally:
+            self._save_depth -= 1
+
+        update_fields = kwargs.get("update_fields", None) or ()
+        changed_fields = self._get_changed_fields(loaded_state)
+        if changed_fields is not None and update_fields:
+            changed_fields &= {field.name for field in self._get_concrete_fields(update_fields)}
+
+        if self._save_depth > 0:
+            # Saved by a signal handler of an outer save, the changes
+            # are added to the ones of the outer save when it ends.
+            if changed_fields is not None:
+                self._nested_changes = getattr(self, "_nested_changes", set()) | changed_fields
+        else:
+            nested_changes = getattr(self, "_nested_changes", set())
+            self._nested_changes = set()
+            if changed_fields is not None:
+                changed_fields |= nested_changes
+            self._saved_changes = changed_fields
+
+        self.mark_as_loaded(*update_fields)
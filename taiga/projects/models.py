@@ -302,6 +302,26 @@ class Project(ProjectDefaults, TaggedMixin, models.Model):
         return self._get_user_stories_points(self.user_stories.filter(milestone__isnull=False).prefetch_related('role_points', 'role_points__points'))
 
 
+class TagUsage(models.Model):
+    """
+    Number of user stories, tasks and issues of the project tagged
+    with a tag. Only the used tags have a row (and a color).
+    """
+    project = models.ForeignKey("Project", null=False, blank=False,
+                                related_name="tags_usages", verbose_name=_("project"))
+    tag = models.TextField(null=False, blank=False, verbose_name=_("tag"))
+    count = models.PositiveIntegerField(null=False, blank=False, default=0,
+                                        verbose_name=_("count"))
+
+    class Meta:
+        verbose_name = "tag usage"
+        verbose_name_plural = "tags usages"
+        unique_together = ("project", "tag")
+
+    def __str__(self):
+        return self.tag
+
+
 # User Stories common Models
 class UserStoryStatus(models.Model):
     name = models.CharField(max_length=255, null=False, blank=False,
@@ -789,3 +809,33 @@ def project_post_save(sender, instance, created, **kwargs):
     if owner_role:
         Membership.objects.create(user=instance.owner, project=instance, role=owner_role,
                                   is_owner=True, email=instance.owner.email)
+
+
+# On points object is changed, the precomputed stats of the project are invalid.
+@receiver(signals.post_save, sender=Points, dispatch_uid='points_post_save')
+@receiver(signals.post_delete, sender=Points, dispatch_uid='points_post_delete')
+def invalidate_project_stats_on_points_change(sender, instance, **kwargs):
+    from taiga.projects.services.stats import invalidate_milestones_points
+    invalidate_milestones_points(instance.project_id)
+
+
+# The open items counters of the project depend on what task statuses are closed.
+@receiver(signals.pre_save, sender=TaskStatus, dispatch_uid='task_status_pre_save')
+def cached_prev_task_status_is_closed(sender, instance, **kwargs):
+    instance.prev_is_closed = None
+    if instance.id:
+        instance.prev_is_closed = (sender.objects.filter(id=instance.id)
+                                                 .values_list("is_closed", flat=True)
+                                                 .first())
+
+
+@receiver(signals.post_save, sender=TaskStatus, dispatch_uid='task_status_post_save')
+def rebuild_open_items_counters_on_task_status_change(sender, instance, created, **kwargs):
+    prev_is_closed = getattr(instance, "prev_is_closed", None)
+    if created or prev_is_closed is None or prev_is_closed == instance.is_closed:
+        return
+
+    from taiga.projects.userstories.services import rebuild_userstories_counters
+    from taiga.projects.milestones.services import rebuild_milestones_counters
+    rebuild_userstories_counters(instance.project_id)
+    rebuild_milestones_counters(instance.project_id)
@@ -15,10 +15,12 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 from django.db import models
+from django.db.models.expressions import ExpressionNode
 from django.utils.translation import ugettext_lazy as _
 
 from taiga.base import exceptions as exc
 from taiga.base.utils import db
+from taiga.projects.mixins.loaded_state import LoadedStateMixin
 
 
 class OCCResourceMixin(object):
@@ -41,7 +43,22 @@ class OCCResourceMixin(object):
     def post_save(self, obj, created=False):
         super().post_save(obj, created)
         if not created:
-            obj.version = db.reload_attribute(obj, 'version')
+            obj.version = self._get_saved_version(obj)
+
+    def _get_saved_version(self, obj):
+        # The checked version is still the loaded one because the database
+        # increments are not known by the instance, they are counted by the
+        # model on every save that writes them. If other request saves the
+        # object at the same time the next edition will be rejected, as it
+        # should, because the client has not seen that change.
+        if isinstance(obj, LoadedStateMixin) and isinstance(obj, OCCModelMixin):
+            loaded_version = (obj.get_loaded_values() or {}).get("version", None)
+            if loaded_version is not None:
+                obj.version = loaded_version + obj.pop_version_increments()
+                obj.mark_as_loaded("version")
+                return obj.version
+
+        return db.reload_attribute(obj, 'version')
 
 
 class OCCModelMixin(models.Model):
@@ -53,3 +70,24 @@ class OCCModelMixin(models.Model):
 
     class Meta:
         abstract = True
+
+    def save(self, *args, **kwargs):
+        # The version is incremented by the database (with F("version") + 1)
+        # on every save that writes it while the expression is pending.
+        update_fields = kwargs.get("update_fields", None)
+        increments_version = (isinstance(self.version, ExpressionNode) and
+                              (update_fields is None or "version" in update_fields))
+
+        super().save(*args, **kwargs)
+
+        if increments_version:
+            self._version_increments = getattr(self, "_version_increments", 0) + 1
+
+    def pop_version_increments(self) -> int:
+        """
+        Get the number of version increments written by the database
+        since the last call.
+        """
+        increments = getattr(self, "_version_increments", 0)
+        self._version_increments = 0
+        return increments
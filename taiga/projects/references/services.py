@@ -25,3 +25,15 @@ def get_instance_by_ref(project_id, obj_ref):
         instance = None
 
     return instance
+
+
+def get_instances_by_refs(project_id, refs):
+    """
+    Return a dict with the references of the project in `refs` by ref,
+    with their content type and content object already loaded.
+    """
+    model_cls = apps.get_model("references", "Reference")
+    queryset = (model_cls.objects.filter(project_id=project_id, ref__in=refs)
+                                 .select_related("content_type")
+                                 .prefetch_related("content_object"))
+    return {instance.ref: instance for instance in queryset}
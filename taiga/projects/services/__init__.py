@@ -26,10 +26,14 @@ from .bulk_update_order import bulk_update_points_order
 from .bulk_update_order import bulk_update_userstory_status_order
 
 from .filters import get_all_tags
+from .filters import invalidate_all_tags
 from .filters import get_issues_filters_data
+from .filters import invalidate_issues_filters_data
 
 from .stats import get_stats_for_project_issues
 from .stats import get_stats_for_project
+from .stats import get_milestones_points
+from .stats import invalidate_milestones_points
 
 from .members import create_members_in_bulk
 from .members import get_members_from_bulk
@@ -38,3 +42,4 @@ from .invitations import send_invitation
 from .invitations import find_invited_user
 
 from .tags_colors import update_project_tags_colors_handler
+from .tags_colors import update_project_tags_colors
@@ -14,170 +14,264 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+from collections import defaultdict
 from contextlib import closing
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
 from django.db import connection
+from django.utils.translation import ugettext as _
 
+from taiga.base import exceptions as exc
 
-def _get_stories_tags(project):
-    result = set()
-    for tags in project.user_stories.values_list("tags", flat=True):
-        if tags:
-            result.update(tags)
-    return result
 
+def _get_all_tags(project):
+    extra_sql = """
+    select tag from (
+        select unnest(tags) as tag from userstories_userstory where project_id = %(project_id)s
+        union select unnest(tags) as tag from tasks_task where project_id = %(project_id)s
+        union select unnest(tags) as tag from issues_issue where project_id = %(project_id)s
+    ) as project_tags
+    order by tag collate "C" asc;
+    """
 
-def _get_tasks_tags(project):
-    result = set()
-    for tags in project.tasks.values_list("tags", flat=True):
-        if tags:
-            result.update(tags)
-    return result
+    with closing(connection.cursor()) as cursor:
+        cursor.execute(extra_sql, {"project_id": project.id})
+        rows = cursor.fetchall()
 
+    return [row[0] for row in rows]
 
-def _get_issues_tags(project):
-    result = set()
-    for tags in project.issues.values_list("tags", flat=True):
-        if tags:
-            result.update(tags)
-    return result
 
+# Issues filters (facets) and the column filtered by every one of them
+ISSUES_FACETS = (
+    ("types", "type", "type_id"),
+    ("statuses", "status", "status_id"),
+    ("priorities", "priority", "priority_id"),
+    ("severities", "severity", "severity_id"),
+    ("assigned_to", "assigned_to", "assigned_to_id"),
+    ("created_by", "owner", "owner_id"),
+    ("owners", "owner", "owner_id"),
+)
 
-def _get_issues_tags_with_count(project):
-    extra_sql = ("select unnest(tags) as tagname, count(unnest(tags)) "
-                 "from issues_issue where project_id = %s "
-                 "group by unnest(tags) "
-                 "order by tagname asc")
+ISSUES_FACETS_COLUMNS = ("type_id", "status_id", "priority_id", "severity_id",
+                         "assigned_to_id", "owner_id")
 
-    with closing(connection.cursor()) as cursor:
-        cursor.execute(extra_sql, [project.id])
-        rows = cursor.fetchall()
 
-    return rows
+def _clean_issues_filters(filters:dict) -> dict:
+    """
+    Check the filters before using them in raw sql: the tags must
+    be strings and the rest of the filters lists of ids or None.
+    """
+    filternames = set(name for _, name, _ in ISSUES_FACETS)
+    cleaned = {}
+    for name, values in filters.items():
+        if name == "tags":
+            if not all(isinstance(value, str) for value in values):
+                raise exc.WrongArguments(_("Invalid tags filter"))
+        elif name not in filternames:
+            raise exc.WrongArguments(_("Invalid filter {}").format(name))
+        elif not all(value is None or (isinstance(value, int) and not isinstance(value, bool))
+                     for value in values):
+            raise exc.WrongArguments(_("Invalid values for the filter {}").format(name))
+
+        cleaned[name] = list(values)
+    return cleaned
+
+
+def _make_issues_filters_sql(filters:dict, exclude=()) -> tuple:
+    """
+    Build the sql conditions and params equivalent to the
+    IssuesFilter of the issues api for the given filters.
+    """
+    conditions = []
+    params = []
+    for name, values in filters.items():
+        if name in exclude:
+            continue
 
+        if name == "tags":
+            conditions.append("tags @> %s::text[]")
+            params.append(list(values))
+            continue
 
-def _get_issues_statuses(project):
-    extra_sql = ("select status_id, count(status_id) from issues_issue "
-                 "where project_id = %s group by status_id;")
+        column = "{}_id".format(name)
+        not_null_values = [v for v in values if v is not None]
+        if None in values:
+            conditions.append("({0} = ANY(%s) OR {0} IS NULL)".format(column))
+        else:
+            conditions.append("{0} = ANY(%s)".format(column))
+        params.append(not_null_values)
 
-    extra_sql = """
-    select id, (select count(*) from issues_issue
-                    where project_id = m.project_id and status_id = m.id)
-        from projects_issuestatus as m
-        where project_id = %s order by m.order;
-    """
+    return conditions, params
 
-    with closing(connection.cursor()) as cursor:
-        cursor.execute(extra_sql, [project.id])
-        rows = cursor.fetchall()
 
-    return rows
+def _get_issues_filters_cache_version(project_id:int) -> str:
+    key = "project-issues-filters-version:{}".format(project_id)
+    version = cache.get(key)
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
 
+    return version
 
-def _get_issues_priorities(project):
-    extra_sql = """
-    select id, (select count(*) from issues_issue
-                where project_id = m.project_id and priority_id = m.id)
-        from projects_priority as m
-        where project_id = %s order by m.order;
-    """
 
-    with closing(connection.cursor()) as cursor:
-        cursor.execute(extra_sql, [project.id])
-        rows = cursor.fetchall()
+def invalidate_issues_filters_data(project_id:int):
+    key = "project-issues-filters-version:{}".format(project_id)
+    cache.set(key, uuid.uuid4().hex, timeout=None)
 
-    return rows
 
-def _get_issues_types(project):
-    extra_sql = """
-    select id, (select count(*) from issues_issue
-                where project_id = m.project_id and type_id = m.id)
-        from projects_issuetype as m
-        where project_id = %s order by m.order;
+def _cached_issues_filters_rows(name, project, calculate):
+    """
+    Cache the result of `calculate()` for the project if
+    ISSUES_FILTERS_DATA_CACHE_TIMEOUT is set until some issue
+    of the project changes.
     """
+    timeout = getattr(settings, "ISSUES_FILTERS_DATA_CACHE_TIMEOUT", None)
+    if not timeout:
+        return calculate()
 
-    with closing(connection.cursor()) as cursor:
-        cursor.execute(extra_sql, [project.id])
-        rows = cursor.fetchall()
+    version = _get_issues_filters_cache_version(project.id)
+    key = "project-issues-filters-{}:{}:{}".format(name, project.id, version)
+    rows = cache.get(key)
+    if rows is None:
+        rows = calculate()
+        cache.set(key, rows, timeout=timeout)
 
     return rows
 
 
-def _get_issues_severities(project):
-    extra_sql = """
-    select id, (select count(*) from issues_issue
-                where project_id = m.project_id and severity_id = m.id)
-        from projects_severity as m
-        where project_id = %s order by m.order;
+def _get_issues_combinations(project, filters:dict):
+    """
+    Get the number of issues of every combination of type, status,
+    priority, severity, assigned user and owner found in the project
+    (a single pass over the issues). Only the tags filter is applied
+    here, the rest are applied per facet.
     """
+    conditions, params = _make_issues_filters_sql({"tags": filters["tags"]} if "tags" in filters else {})
+    extra_sql = """
+    select {columns}, count(*) from issues_issue
+        where {conditions}
+        group by {columns};
+    """.format(columns=", ".join(ISSUES_FACETS_COLUMNS),
+               conditions=" and ".join(["project_id = %s"] + conditions))
 
-    with closing(connection.cursor()) as cursor:
-        cursor.execute(extra_sql, [project.id])
-        rows = cursor.fetchall()
+    def calculate():
+        with closing(connection.cursor()) as cursor:
+            cursor.execute(extra_sql, [project.id] + params)
+            return cursor.fetchall()
 
-    return rows
+    if conditions:
+        return calculate()
+    return _cached_issues_filters_rows("combinations", project, calculate)
 
 
-def _get_issues_assigned_to(project):
+def _get_issues_tags_with_count(project, filters:dict):
+    conditions, params = _make_issues_filters_sql(filters, exclude=("tags",))
     extra_sql = """
-    select null, (select count(*) from issues_issue
-                        where project_id = %s and assigned_to_id is null)
-    UNION select user_id, (select count(*) from issues_issue
-                        where project_id = pm.project_id and assigned_to_id = pm.user_id)
-        from projects_membership as pm
-        where project_id = %s and pm.user_id is not null;
-    """
+    select tag, count(*) from (
+        select unnest(tags) as tag from issues_issue where {conditions}
+    ) as issues_tags
+    group by tag
+    order by tag asc;
+    """.format(conditions=" and ".join(["project_id = %s"] + conditions))
 
-    with closing(connection.cursor()) as cursor:
-        cursor.execute(extra_sql, [project.id, project.id])
-        rows = cursor.fetchall()
+    def calculate():
+        with closing(connection.cursor()) as cursor:
+            cursor.execute(extra_sql, [project.id] + params)
+            return cursor.fetchall()
 
-    return rows
+    if conditions:
+        return calculate()
+    return _cached_issues_filters_rows("tags", project, calculate)
 
 
-def _get_issues_owners(project):
+def _get_issues_facets_values(project):
+    """
+    Get the ids of the issue types, statuses, priorities and
+    severities of the project in order, and its members.
+    """
     extra_sql = """
-    select user_id, (select count(*) from issues_issue
-                        where project_id = pm.project_id and owner_id = pm.user_id)
-        from projects_membership as pm
-        where project_id = %s and pm.user_id is not null;
+    select 'types', id, "order" from projects_issuetype where project_id = %(project_id)s
+    union all select 'statuses', id, "order" from projects_issuestatus where project_id = %(project_id)s
+    union all select 'priorities', id, "order" from projects_priority where project_id = %(project_id)s
+    union all select 'severities', id, "order" from projects_severity where project_id = %(project_id)s
+    union all select 'members', user_id, 0 from projects_membership
+        where project_id = %(project_id)s and user_id is not null
+    order by 1, 3, 2;
     """
 
     with closing(connection.cursor()) as cursor:
-        cursor.execute(extra_sql, [project.id])
+        cursor.execute(extra_sql, {"project_id": project.id})
         rows = cursor.fetchall()
 
-    return rows
+    values = {"types": [], "statuses": [], "priorities": [], "severities": [], "members": []}
+    for facet, value_id, order in rows:
+        values[facet].append(value_id)
+
+    values["assigned_to"] = [None] + values["members"]
+    values["created_by"] = values["owners"] = values.pop("members")
+    return values
 
 
 # Public api
 
+def _make_all_tags_cache_key(project_id:int) -> str:
+    return "project-tags:{}".format(project_id)
+
+
 def get_all_tags(project):
     """
     Given a project, return sorted list of unique
     tags found on it.
+
+    If PROJECT_TAGS_CACHE_TIMEOUT is set the result is
+    cached until the tags used in the project change
+    (see invalidate_all_tags).
     """
-    result = set()
-    result.update(_get_issues_tags(project))
-    result.update(_get_stories_tags(project))
-    result.update(_get_tasks_tags(project))
-    return sorted(result)
+    timeout = getattr(settings, "PROJECT_TAGS_CACHE_TIMEOUT", None)
+    if not timeout:
+        return _get_all_tags(project)
 
+    key = _make_all_tags_cache_key(project.id)
+    tags = cache.get(key)
+    if tags is None:
+        tags = _get_all_tags(project)
+        cache.set(key, tags, timeout=timeout)
 
-def get_issues_filters_data(project):
+    return tags
+
+
+def invalidate_all_tags(project_id:int):
+    cache.delete(_make_all_tags_cache_key(project_id))
+
+
+def get_issues_filters_data(project, filters=None):
     """
     Given a project, return a simple data structure
     of all possible filters for issues.
-    """
 
-    data = {
-        "types": _get_issues_types(project),
-        "statuses": _get_issues_statuses(project),
-        "priorities": _get_issues_priorities(project),
-        "severities": _get_issues_severities(project),
-        "assigned_to": _get_issues_assigned_to(project),
-        "created_by": _get_issues_owners(project),
-        "owners": _get_issues_owners(project),
-        "tags": _get_issues_tags_with_count(project),
-    }
+    `filters` are the active filters of the issues list (as
+    parsed by IssuesFilter), every filter counts the issues
+    matching the rest of them.
+    """
+    filters = _clean_issues_filters(filters or {})
+    combinations = _get_issues_combinations(project, filters)
+    values = _get_issues_facets_values(project)
+
+    data = {"tags": _get_issues_tags_with_count(project, filters)}
+    for facet, filtername, column in ISSUES_FACETS:
+        index = ISSUES_FACETS_COLUMNS.index(column)
+        other_filters = [(ISSUES_FACETS_COLUMNS.index("{}_id".format(name)), set(value))
+                         for name, value in filters.items()
+                         if name not in ("tags", filtername)]
+
+        counts = defaultdict(int)
+        for row in combinations:
+            if all(row[i] in value for i, value in other_filters):
+                counts[row[index]] += row[-1]
+
+        data[facet] = [(value_id, counts[value_id]) for value_id in values[facet]]
 
     return data
@@ -14,9 +14,139 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-from django.db.models import Q, Count
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Q, Count, Sum
+
+from taiga.base.utils.dicts import dict_sum
+
+from collections import defaultdict
+from contextlib import closing
 import datetime
 import copy
+import uuid
+
+
+def get_points_cache_version(project_id:int) -> str:
+    """
+    Get the current version of the points related caches
+    of the project. All of them are invalidated at once
+    changing this version.
+    """
+    key = "project-points-version:{}".format(project_id)
+    version = cache.get(key)
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+
+    return version
+
+
+def invalidate_milestones_points(project_id:int):
+    key = "project-points-version:{}".format(project_id)
+    cache.set(key, uuid.uuid4().hex, timeout=None)
+
+
+def _make_milestones_points_cache_key(project_id:int) -> str:
+    version = get_points_cache_version(project_id)
+    return "project-milestones-points:{}:{}".format(project_id, version)
+
+
+def _get_points_per_role(role_points) -> dict:
+    """
+    Sum the points values of a RolePoints queryset
+    grouped by role.
+    """
+    rows = (role_points.order_by()
+                       .values_list("role_id")
+                       .annotate(total=Sum("points__value")))
+    return {role_id: total or 0 for role_id, total in rows}
+
+
+def _get_milestone_increments(project, milestone) -> tuple:
+    """
+    Get the team and client increments points per role
+    for the user stories created during the milestone.
+    """
+    team_increment = {}
+    client_increment = {}
+
+    if not milestone.estimated_start or not milestone.estimated_finish:
+        return team_increment, client_increment
+
+    role_points_model = apps.get_model("userstories", "RolePoints")
+    rows = (role_points_model.objects
+            .filter(user_story__project_id=project.id,
+                    user_story__created_date__gte=milestone.estimated_start,
+                    user_story__created_date__lt=milestone.estimated_finish)
+            .order_by()
+            .values_list("user_story__client_requirement",
+                         "user_story__team_requirement",
+                         "role_id")
+            .annotate(total=Sum("points__value")))
+
+    for client_requirement, team_requirement, role_id, total in rows:
+        total = total or 0
+        if client_requirement and team_requirement:
+            team_increment = dict_sum(team_increment, {role_id: total / 2})
+            client_increment = dict_sum(client_increment, {role_id: total / 2})
+        elif team_requirement:
+            team_increment = dict_sum(team_increment, {role_id: total})
+        elif client_requirement:
+            client_increment = dict_sum(client_increment, {role_id: total})
+
+    return team_increment, client_increment
+
+
+def _calculate_milestones_points(project) -> list:
+    role_points_model = apps.get_model("userstories", "RolePoints")
+    closed_points = defaultdict(dict)
+    rows = (role_points_model.objects
+            .filter(user_story__milestone__project_id=project.id,
+                    user_story__is_closed=True)
+            .order_by()
+            .values_list("user_story__milestone_id", "role_id")
+            .annotate(total=Sum("points__value")))
+
+    for milestone_id, role_id, total in rows:
+        closed_points[milestone_id][role_id] = total or 0
+
+    result = []
+    for milestone in project.milestones.order_by("estimated_start"):
+        team_increment, client_increment = _get_milestone_increments(project, milestone)
+        result.append({
+            "id": milestone.id,
+            "name": milestone.name,
+            "closed_points": closed_points[milestone.id],
+            "team_increment_points": team_increment,
+            "client_increment_points": client_increment,
+        })
+
+    return result
+
+
+def get_milestones_points(project) -> list:
+    """
+    Get the precomputed closed and increment points per
+    role of every milestone of the project, ordered by
+    estimated start.
+
+    Results are cached per project until some of the
+    user stories, role points or milestones of the
+    project changes (see invalidate_milestones_points).
+    """
+    key = _make_milestones_points_cache_key(project.id)
+    milestones_points = cache.get(key)
+
+    if milestones_points is None:
+        milestones_points = _calculate_milestones_points(project)
+        timeout = getattr(settings, "PROJECT_STATS_CACHE_TIMEOUT", 60 * 60)
+        cache.set(key, milestones_points, timeout=timeout)
+
+    return milestones_points
 
 
 def _get_milestones_stats_for_backlog(project):
@@ -35,27 +165,27 @@ def _get_milestones_stats_for_backlog(project):
     future_team_increment = sum(project.future_team_increment.values())
     future_client_increment = sum(project.future_client_increment.values())
 
-    milestones = project.milestones.order_by('estimated_start')
+    milestones = get_milestones_points(project)
 
     optimal_points = 0
     team_increment = 0
     client_increment = 0
-    for current_milestone in range(0, max(milestones.count(), project.total_milestones)):
+    for current_milestone in range(0, max(len(milestones), project.total_milestones)):
         optimal_points = (project.total_story_points -
                             (optimal_points_per_sprint * current_milestone))
 
         evolution = (project.total_story_points - current_evolution
                         if current_evolution is not None else None)
 
-        if current_milestone < milestones.count():
+        if current_milestone < len(milestones):
             ml = milestones[current_milestone]
-            milestone_name = ml.name
+            milestone_name = ml["name"]
             team_increment = current_team_increment
             client_increment = current_client_increment
 
-            current_evolution += sum(ml.closed_points.values())
-            current_team_increment += sum(ml.team_increment_points.values())
-            current_client_increment += sum(ml.client_increment_points.values())
+            current_evolution += sum(ml["closed_points"].values())
+            current_team_increment += sum(ml["team_increment_points"].values())
+            current_client_increment += sum(ml["client_increment_points"].values())
         else:
             milestone_name = "Future sprint"
             team_increment = current_team_increment + future_team_increment,
@@ -82,37 +212,87 @@ def _get_milestones_stats_for_backlog(project):
     }
 
 
-def _count_status_object(status_obj, counting_storage):
-    if status_obj.id in counting_storage:
-        counting_storage[status_obj.id]['count'] += 1
-    else:
-        counting_storage[status_obj.id] = {}
-        counting_storage[status_obj.id]['count'] = 1
-        counting_storage[status_obj.id]['name'] = status_obj.name
-        counting_storage[status_obj.id]['id'] = status_obj.id
-        counting_storage[status_obj.id]['color'] = status_obj.color
-
-def _count_owned_object(user_obj, counting_storage):
-    if user_obj:
-        if user_obj.id in counting_storage:
-            counting_storage[user_obj.id]['count'] += 1
-        else:
-            counting_storage[user_obj.id] = {}
-            counting_storage[user_obj.id]['count'] = 1
-            counting_storage[user_obj.id]['username'] = user_obj.username
-            counting_storage[user_obj.id]['name'] = user_obj.get_full_name()
-            counting_storage[user_obj.id]['id'] = user_obj.id
-            counting_storage[user_obj.id]['color'] = user_obj.color
-    else:
-        if 0 in counting_storage:
-            counting_storage[0]['count'] += 1
-        else:
-            counting_storage[0] = {}
-            counting_storage[0]['count'] = 1
-            counting_storage[0]['username'] = 'Unassigned'
-            counting_storage[0]['name'] = 'Unassigned'
-            counting_storage[0]['id'] = 0
-            counting_storage[0]['color'] = 'black'
+def _get_issues_counts(project, fieldname):
+    """
+    Get a dict with the number of issues of the project
+    grouped by the value of the specified field.
+    """
+    return dict(project.issues.order_by()
+                              .values_list(fieldname)
+                              .annotate(count=Count("id")))
+
+
+def _count_status_objects(project, fieldname, model_name):
+    counts = _get_issues_counts(project, fieldname)
+    model = apps.get_model("projects", model_name)
+
+    counting_storage = {}
+    for status_obj in model.objects.filter(pk__in=[x for x in counts if x is not None]):
+        counting_storage[status_obj.id] = {
+            'count': counts[status_obj.id],
+            'name': status_obj.name,
+            'id': status_obj.id,
+            'color': status_obj.color,
+        }
+
+    return counting_storage
+
+
+def _count_owned_objects(project, fieldname):
+    counts = _get_issues_counts(project, fieldname)
+    model = apps.get_model("users", "User")
+
+    counting_storage = {}
+    for user_obj in model.objects.filter(pk__in=[x for x in counts if x is not None]):
+        counting_storage[user_obj.id] = {
+            'count': counts[user_obj.id],
+            'username': user_obj.username,
+            'name': user_obj.get_full_name(),
+            'id': user_obj.id,
+            'color': user_obj.color,
+        }
+
+    if counts.get(None, 0):
+        counting_storage[0] = {
+            'count': counts[None],
+            'username': 'Unassigned',
+            'name': 'Unassigned',
+            'id': 0,
+            'color': 'black',
+        }
+
+    return counting_storage
+
+
+def _get_issues_days_buckets(project, first_day, last_day):
+    """
+    Get the issues of the project that are alive between
+    the specified days, grouped by severity, priority and
+    the days they were created and finished.
+
+    The "open_until" column is the last day an issue is
+    considered opened: the day before its finish if it
+    was finished just at midnight.
+    """
+    sql = """
+    select severity_id, priority_id,
+           date(created_date at time zone 'UTC') as created_day,
+           date(finished_date at time zone 'UTC') as finished_day,
+           date((finished_date at time zone 'UTC') - interval '1 microsecond') as open_until,
+           count(*)
+        from issues_issue
+        where project_id = %s
+          and (created_date at time zone 'UTC') < %s
+          and (finished_date is null or (finished_date at time zone 'UTC') >= %s)
+        group by severity_id, priority_id, created_day, finished_day, open_until;
+    """
+
+    with closing(connection.cursor()) as cursor:
+        cursor.execute(sql, [project.id, last_day, first_day])
+        rows = cursor.fetchall()
+
+    return rows
+
 
 def get_stats_for_project_issues(project):
     project_issues_stats = {
@@ -134,21 +314,19 @@ def get_stats_for_project_issues(project):
 
     }
 
-    issues = project.issues.all().select_related(
-        'status', 'priority', 'type', 'severity', 'owner', 'assigned_to'
-    )
-    for issue in issues:
-        project_issues_stats['total_issues'] += 1
-        if issue.status.is_closed:
-            project_issues_stats['closed_issues'] += 1
+    for is_closed, count in _get_issues_counts(project, 'status__is_closed').items():
+        project_issues_stats['total_issues'] += count
+        if is_closed:
+            project_issues_stats['closed_issues'] += count
         else:
-            project_issues_stats['opened_issues'] += 1
-        _count_status_object(issue.type, project_issues_stats['issues_per_type'])
-        _count_status_object(issue.status, project_issues_stats['issues_per_status'])
-        _count_status_object(issue.priority, project_issues_stats['issues_per_priority'])
-        _count_status_object(issue.severity, project_issues_stats['issues_per_severity'])
-        _count_owned_object(issue.owner, project_issues_stats['issues_per_owner'])
-        _count_owned_object(issue.assigned_to, project_issues_stats['issues_per_assigned_to'])
+            project_issues_stats['opened_issues'] += count
+
+    project_issues_stats['issues_per_type'] = _count_status_objects(project, 'type', 'IssueType')
+    project_issues_stats['issues_per_status'] = _count_status_objects(project, 'status', 'IssueStatus')
+    project_issues_stats['issues_per_priority'] = _count_status_objects(project, 'priority', 'Priority')
+    project_issues_stats['issues_per_severity'] = _count_status_objects(project, 'severity', 'Severity')
+    project_issues_stats['issues_per_owner'] = _count_owned_objects(project, 'owner')
+    project_issues_stats['issues_per_assigned_to'] = _count_owned_objects(project, 'assigned_to')
 
     for severity in project_issues_stats['issues_per_severity'].values():
         project_issues_stats['last_four_weeks_days']['by_severity'][severity['id']] = copy.copy(severity)
@@ -160,33 +338,36 @@ def get_stats_for_project_issues(project):
         del(project_issues_stats['last_four_weeks_days']['by_priority'][priority['id']]['count'])
         project_issues_stats['last_four_weeks_days']['by_priority'][priority['id']]['data'] = []
 
-    for x in range(27, -1, -1):
-        day = datetime.datetime.combine(datetime.date.today(), datetime.time(0, 0)) - datetime.timedelta(days=x)
-        next_day = day + datetime.timedelta(days=1)
+    today = datetime.datetime.combine(datetime.date.today(), datetime.time(0, 0))
+    days = [today - datetime.timedelta(days=x) for x in range(27, -1, -1)]
+    buckets = _get_issues_days_buckets(project, days[0], days[-1] + datetime.timedelta(days=1))
 
-        open_this_day = filter(lambda x: x.created_date.replace(tzinfo=None) >= day, issues)
-        open_this_day = filter(lambda x: x.created_date.replace(tzinfo=None) < next_day, open_this_day)
-        open_this_day = len(list(open_this_day))
-        project_issues_stats['last_four_weeks_days']['by_open_closed']['open'].append(open_this_day)
+    for day in days:
+        day_date = day.date()
+        open_this_day = 0
+        closed_this_day = 0
+        by_severity = defaultdict(int)
+        by_priority = defaultdict(int)
 
-        closed_this_day = filter(lambda x: x.finished_date, issues)
-        closed_this_day = filter(lambda x: x.finished_date.replace(tzinfo=None) >= day, closed_this_day)
-        closed_this_day = filter(lambda x: x.finished_date.replace(tzinfo=None) < next_day, closed_this_day)
-        closed_this_day = len(list(closed_this_day))
-        project_issues_stats['last_four_weeks_days']['by_open_closed']['closed'].append(closed_this_day)
+        for severity_id, priority_id, created_day, finished_day, open_until, count in buckets:
+            if created_day == day_date:
+                open_this_day += count
 
-        opened_this_day = filter(lambda x: x.created_date.replace(tzinfo=None) < next_day, issues)
-        opened_this_day = list(filter(lambda x: x.finished_date is None or x.finished_date.replace(tzinfo=None) > day, opened_this_day))
+            if finished_day == day_date:
+                closed_this_day += count
+
+            if created_day <= day_date and (open_until is None or open_until >= day_date):
+                by_severity[severity_id] += count
+                by_priority[priority_id] += count
+
+        project_issues_stats['last_four_weeks_days']['by_open_closed']['open'].append(open_this_day)
+        project_issues_stats['last_four_weeks_days']['by_open_closed']['closed'].append(closed_this_day)
 
         for severity in project_issues_stats['last_four_weeks_days']['by_severity']:
-            by_severity = filter(lambda x: x.severity_id == severity, opened_this_day)
-            by_severity = len(list(by_severity))
-            project_issues_stats['last_four_weeks_days']['by_severity'][severity]['data'].append(by_severity)
+            project_issues_stats['last_four_weeks_days']['by_severity'][severity]['data'].append(by_severity[severity])
 
         for priority in project_issues_stats['last_four_weeks_days']['by_priority']:
-            by_priority = filter(lambda x: x.priority_id == priority, opened_this_day)
-            by_priority = len(list(by_priority))
-            project_issues_stats['last_four_weeks_days']['by_priority'][priority]['data'].append(by_priority)
+            project_issues_stats['last_four_weeks_days']['by_priority'][priority]['data'].append(by_priority[priority])
 
     return project_issues_stats
 
@@ -14,9 +14,13 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+from contextlib import closing
+
+from django.apps import apps
 from django.conf import settings
+from django.db import connection, transaction, IntegrityError
 
-from taiga.projects.services.filters import get_all_tags
+from taiga.projects.services.filters import get_all_tags, invalidate_all_tags
 
 from hashlib import sha1
 
@@ -38,20 +42,152 @@ def remove_unused_tags(project):
     project.tags_colors = list(filter(lambda x: x[0] in current_tags, project.tags_colors))
 
 
+def _add_tags_colors(project, tags):
+    if not isinstance(project.tags_colors, list):
+        project.tags_colors = []
+
+    for tag in tags:
+        defined_tags = map(lambda x: x[0], project.tags_colors)
+        if tag not in defined_tags:
+            used_colors = map(lambda x: x[1], project.tags_colors)
+            new_color = _get_new_color(tag, settings.TAGS_PREDEFINED_COLORS,
+                                       exclude=used_colors)
+            project.tags_colors.append([tag, new_color])
+
+
+def _increment_tags_usages(project_id, tags) -> list:
+    """
+    Increment the usage count of the tags of the project and return
+    the ones that were not used before.
+    """
+    tag_usage_model = apps.get_model("projects", "TagUsage")
+    sql = ("UPDATE projects_tagusage SET count = count + 1 "
+           "WHERE project_id = %s AND tag = ANY(%s) RETURNING tag")
+
+    with closing(connection.cursor()) as cursor:
+        cursor.execute(sql, [project_id, list(tags)])
+        used_tags = {row[0] for row in cursor.fetchall()}
+
+    new_tags = []
+    for tag in tags:
+        if tag in used_tags:
+            continue
+        try:
+            with transaction.atomic():
+                tag_usage_model.objects.create(project_id=project_id, tag=tag, count=1)
+        except IntegrityError:
+            # Created concurrently by another item
+            with closing(connection.cursor()) as cursor:
+                cursor.execute(sql, [project_id, [tag]])
+        else:
+            new_tags.append(tag)
+
+    return new_tags
+
+
+def _decrement_tags_usages(project_id, tags) -> list:
+    """
+    Decrement the usage count of the tags of the project and return
+    the ones that are not used anymore.
+    """
+    sql = ("UPDATE projects_tagusage SET count = count - 1 "
+           "WHERE project_id = %s AND tag = ANY(%s) AND count > 0 RETURNING tag, count")
+
+    with closing(connection.cursor()) as cursor:
+        cursor.execute(sql, [project_id, list(tags)])
+        unused_tags = [tag for tag, count in cursor.fetchall() if count == 0]
+
+        if unused_tags:
+            cursor.execute("DELETE FROM projects_tagusage "
+                           "WHERE project_id = %s AND tag = ANY(%s) AND count = 0",
+                           [project_id, unused_tags])
+
+    return unused_tags
+
+
+def _update_tags_colors(project, added_tags, removed_tags):
+    """
+    Add and remove colors of the project locking only its tags_colors
+    and saving only them.
+    """
+    project_model = apps.get_model("projects", "Project")
+    with transaction.atomic():
+        tags_colors = (project_model.objects.select_for_update()
+                                            .values_list("tags_colors", flat=True)
+                                            .get(pk=project.pk))
+        project.tags_colors = [[tag, color] for tag, color in tags_colors or []
+                               if tag not in removed_tags]
+        _add_tags_colors(project, added_tags)
+        project_model.objects.filter(pk=project.pk).update(tags_colors=project.tags_colors)
+
+
+def update_project_tags_usages(project, old_tags, new_tags):
+    """
+    Update the tags usage counts of the project with the tags change
+    of one of its items and the tags colors if some tag starts or
+    stops being used. The project is only updated in that case.
+    """
+    old_tags = set(old_tags or [])
+    new_tags = set(new_tags or [])
+
+    added_tags = new_tags - old_tags
+    removed_tags = old_tags - new_tags
+
+    with transaction.atomic():
+        first_used_tags = _increment_tags_usages(project.pk, added_tags) if added_tags else []
+        unused_tags = _decrement_tags_usages(project.pk, removed_tags) if removed_tags else []
+
+        if first_used_tags or unused_tags:
+            _update_tags_colors(project, first_used_tags, unused_tags)
+            invalidate_all_tags(project.pk)
+
+
 def update_project_tags_colors_handler(instance):
     if instance.tags is None:
         instance.tags = []
 
-    if not isinstance(instance.project.tags_colors, list):
-        instance.project.tags_colors = []
+    update_project_tags_usages(instance.project, getattr(instance, "prev_tags", None),
+                               instance.tags)
 
-    for tag in instance.tags:
-        defined_tags = map(lambda x: x[0], instance.project.tags_colors)
-        if tag not in defined_tags:
-            used_colors = map(lambda x: x[1], instance.project.tags_colors)
-            new_color = _get_new_color(tag, settings.TAGS_PREDEFINED_COLORS,
-                                       exclude=used_colors)
-            instance.project.tags_colors.append([tag, new_color])
 
-    remove_unused_tags(instance.project)
-    instance.project.save()
+def _count_project_tags_usages(project):
+    tag_usage_model = apps.get_model("projects", "TagUsage")
+    tag_usage_model.objects.filter(project=project).delete()
+
+    sql = """
+        INSERT INTO projects_tagusage (project_id, tag, count)
+             SELECT project_id, tag, count(*)
+               FROM (SELECT DISTINCT id, project_id, unnest(tags) AS tag FROM userstories_userstory
+                      WHERE project_id = %(project_id)s
+                     UNION ALL
+                     SELECT DISTINCT id, project_id, unnest(tags) AS tag FROM tasks_task
+                      WHERE project_id = %(project_id)s
+                     UNION ALL
+                     SELECT DISTINCT id, project_id, unnest(tags) AS tag FROM issues_issue
+                      WHERE project_id = %(project_id)s) AS items
+           GROUP BY project_id, tag
+          RETURNING tag
+    """
+    with closing(connection.cursor()) as cursor:
+        cursor.execute(sql, {"project_id": project.pk})
+        return {row[0] for row in cursor.fetchall()}
+
+
+def update_project_tags_colors(project):
+    """
+    Recount the tags usages of the project from scratch, set a
+    color for every tag used in the project and remove the colors
+    of the unused ones.
+    """
+    with transaction.atomic():
+        current_tags = _count_project_tags_usages(project)
+    invalidate_all_tags(project.pk)
+
+    old_tags_colors = project.tags_colors
+    if not isinstance(old_tags_colors, list):
+        old_tags_colors = []
+    project.tags_colors = [[tag, color] for tag, color in old_tags_colors if tag in current_tags]
+    _add_tags_colors(project, sorted(current_tags))
+
+    if project.tags_colors != old_tags_colors:
+        project.save()
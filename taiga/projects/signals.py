@@ -14,7 +14,7 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-from taiga.projects.services.tags_colors import update_project_tags_colors_handler, remove_unused_tags
+from taiga.projects.services.tags_colors import update_project_tags_colors_handler, update_project_tags_usages
 
 
 ####################################
@@ -28,10 +28,23 @@ def tags_normalization(sender, instance, **kwargs):
         instance.tags = list(map(str.lower, instance.tags))
 
 
+def cached_prev_tags(sender, instance, **kwargs):
+    # Tags of the stored version, used to update the project tags usages
+    instance.prev_tags = []
+    if instance.id:
+        prev = getattr(instance, "prev", None)
+        loaded_values = instance.get_loaded_values() or {}
+        if prev is not None:
+            instance.prev_tags = prev.tags
+        elif "tags" in loaded_values:
+            instance.prev_tags = loaded_values["tags"]
+        else:
+            instance.prev_tags = sender.objects.filter(id=instance.id).values_list("tags", flat=True).first()
+
+
 def update_project_tags_when_create_or_edit_taggable_item(sender, instance, **kwargs):
     update_project_tags_colors_handler(instance)
 
 
 def update_project_tags_when_delete_taggable_item(sender, instance, **kwargs):
-    remove_unused_tags(instance.project)
-    instance.project.save()
+    update_project_tags_usages(instance.project, instance.tags, [])
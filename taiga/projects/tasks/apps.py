@@ -31,6 +31,12 @@ class TasksAppConfig(AppConfig):
         signals.pre_save.connect(handlers.cached_prev_task,
                                  sender=apps.get_model("tasks", "Task"))
 
+        # Open items counters
+        signals.post_save.connect(handlers.update_counters_when_create_or_edit_task,
+                                  sender=apps.get_model("tasks", "Task"))
+        signals.post_delete.connect(handlers.update_counters_when_delete_task,
+                                    sender=apps.get_model("tasks", "Task"))
+
         # Open/Close US and Milestone
         signals.post_save.connect(handlers.try_to_close_or_open_us_and_milestone_when_create_or_edit_task,
                                  sender=apps.get_model("tasks", "Task"))
@@ -40,6 +46,8 @@ class TasksAppConfig(AppConfig):
         # Tags
         signals.pre_save.connect(generic_handlers.tags_normalization,
                                  sender=apps.get_model("tasks", "Task"))
+        signals.pre_save.connect(generic_handlers.cached_prev_tags,
+                                 sender=apps.get_model("tasks", "Task"))
         signals.post_save.connect(generic_handlers.update_project_tags_when_create_or_edit_taggable_item,
                                   sender=apps.get_model("tasks", "Task"))
         signals.post_delete.connect(generic_handlers.update_project_tags_when_delete_taggable_item,
@@ -14,6 +14,7 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+from collections import defaultdict
 from contextlib import suppress
 from django.core.exceptions import ObjectDoesNotExist
 
@@ -25,7 +26,65 @@ from django.core.exceptions import ObjectDoesNotExist
 def cached_prev_task(sender, instance, **kwargs):
     instance.prev = None
     if instance.id:
-        instance.prev = sender.objects.get(id=instance.id)
+        # The fields written by other code paths (other instances of the
+        # row or querysets) after they were loaded are read again.
+        instance.reload_written_values("user_story", "milestone", "status")
+        # Built from the values loaded with the instance when all of them are known
+        instance.prev = instance.get_loaded_instance() or sender.objects.get(id=instance.id)
+
+
+####################################
+# Signals for the open items counters
+####################################
+
+def _get_task_state(task, status_is_closed):
+    return (task.user_story_id, task.milestone_id, not status_is_closed)
+
+
+def _update_counters(prev_state, state):
+    from taiga.projects.userstories import services as us_service
+    from taiga.projects.milestones import services as milestone_service
+
+    if prev_state == state:
+        return
+
+    user_stories = defaultdict(lambda: [0, 0])
+    milestones = defaultdict(lambda: [0, 0])
+    for task_state, increment in ((prev_state, -1), (state, 1)):
+        if task_state is None:
+            continue
+
+        user_story_id, milestone_id, is_open = task_state
+        if user_story_id:
+            user_stories[user_story_id][0] += increment
+            user_stories[user_story_id][1] += increment * is_open
+        if milestone_id:
+            milestones[milestone_id][0] += increment * is_open
+
+    us_service.update_userstories_counters(user_stories)
+    milestone_service.update_milestones_counters(milestones)
+
+
+def update_counters_when_create_or_edit_task(sender, instance, **kwargs):
+    status_is_closed = instance.status.is_closed
+
+    prev = getattr(instance, "prev", None)
+    prev_state = None
+    if prev is not None:
+        if prev.status_id == instance.status_id:
+            prev_status_is_closed = status_is_closed
+        else:
+            prev_status_is_closed = prev.status.is_closed
+        prev_state = _get_task_state(prev, prev_status_is_closed)
+
+    _update_counters(prev_state, _get_task_state(instance, status_is_closed))
+
+
+def update_counters_when_delete_task(sender, instance, **kwargs):
+    # The status can be already removed when the tasks
+    # are deleted in cascade with the project.
+    with suppress(ObjectDoesNotExist):
+        _update_counters(_get_task_state(instance, instance.status.is_closed), None)
 
 
 ####################################
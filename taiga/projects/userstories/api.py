@@ -84,12 +84,11 @@ class UserStoryViewSet(OCCResourceMixin, HistoryResourceMixin, WatchedResourceMi
         # this is the continuation of it.
 
         Points = apps.get_model("projects", "Points")
-        RolePoints = apps.get_model("userstories", "RolePoints")
 
         if self._role_points:
             with suppress(ObjectDoesNotExist):
                 for role_id, points_id in self._role_points.items():
-                    role_points = RolePoints.objects.get(role__id=role_id, user_story_id=obj.pk)
+                    role_points = obj.role_points.get(role__id=role_id)
                     role_points.points = Points.objects.get(id=points_id, project_id=obj.project_id)
                     role_points.save()
 
@@ -123,7 +122,8 @@ class UserStoryViewSet(OCCResourceMixin, HistoryResourceMixin, WatchedResourceMi
         services.update_userstories_order_in_bulk(data["bulk_stories"],
                                                   project=project,
                                                   field="backlog_order")
-        services.snapshot_userstories_in_bulk(data["bulk_stories"], request.user)
+        services.snapshot_userstories_in_bulk(data["bulk_stories"], request.user,
+                                              field="backlog_order")
 
         return response.NoContent()
 
@@ -140,7 +140,8 @@ class UserStoryViewSet(OCCResourceMixin, HistoryResourceMixin, WatchedResourceMi
         services.update_userstories_order_in_bulk(data["bulk_stories"],
                                                   project=project,
                                                   field="sprint_order")
-        services.snapshot_userstories_in_bulk(data["bulk_stories"], request.user)
+        services.snapshot_userstories_in_bulk(data["bulk_stories"], request.user,
+                                              field="sprint_order")
         return response.NoContent()
 
     @list_route(methods=["POST"])
@@ -156,7 +157,8 @@ class UserStoryViewSet(OCCResourceMixin, HistoryResourceMixin, WatchedResourceMi
         services.update_userstories_order_in_bulk(data["bulk_stories"],
                                                   project=project,
                                                   field="kanban_order")
-        services.snapshot_userstories_in_bulk(data["bulk_stories"], request.user)
+        services.snapshot_userstories_in_bulk(data["bulk_stories"], request.user,
+                                              field="kanban_order")
         return response.NoContent()
 
     @transaction.atomic
@@ -39,15 +39,35 @@ class UserStoriesAppConfig(AppConfig):
         signals.post_save.connect(handlers.update_milestone_of_tasks_when_edit_us,
                                   sender=apps.get_model("userstories", "UserStory"))
 
+        # Open items counters
+        signals.post_save.connect(handlers.create_counters_when_create_us,
+                                  sender=apps.get_model("userstories", "UserStory"))
+        signals.post_save.connect(handlers.update_milestone_counters_when_create_or_edit_us,
+                                  sender=apps.get_model("userstories", "UserStory"))
+        signals.post_delete.connect(handlers.update_milestone_counters_when_delete_us,
+                                    sender=apps.get_model("userstories", "UserStory"))
+
         # Open/Close US and Milestone
         signals.post_save.connect(handlers.try_to_close_or_open_us_and_milestone_when_create_or_edit_us,
                                  sender=apps.get_model("userstories", "UserStory"))
         signals.post_delete.connect(handlers.try_to_close_milestone_when_delete_us,
                                     sender=apps.get_model("userstories", "UserStory"))
 
+        # Project stats
+        signals.post_save.connect(handlers.invalidate_project_stats_when_change_us,
+                                  sender=apps.get_model("userstories", "UserStory"))
+        signals.post_delete.connect(handlers.invalidate_project_stats_when_change_us,
+                                    sender=apps.get_model("userstories", "UserStory"))
+        signals.post_save.connect(handlers.invalidate_project_stats_when_change_role_points,
+                                  sender=apps.get_model("userstories", "RolePoints"))
+        signals.post_delete.connect(handlers.invalidate_project_stats_when_change_role_points,
+                                    sender=apps.get_model("userstories", "RolePoints"))
+
         # Tags
         signals.pre_save.connect(generic_handlers.tags_normalization,
                                  sender=apps.get_model("userstories", "UserStory"))
+        signals.pre_save.connect(generic_handlers.cached_prev_tags,
+                                 sender=apps.get_model("userstories", "UserStory"))
         signals.post_save.connect(generic_handlers.update_project_tags_when_create_or_edit_taggable_item,
                                   sender=apps.get_model("userstories", "UserStory"))
         signals.post_delete.connect(generic_handlers.update_project_tags_when_delete_taggable_item,
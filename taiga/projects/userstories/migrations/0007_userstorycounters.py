@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+def count_user_stories_tasks(apps, schema_editor):
+    schema_editor.execute("""
+        INSERT INTO userstories_userstorycounters (user_story_id, tasks, open_tasks)
+             SELECT us.id,
+                    count(task.id),
+                    coalesce(sum(CASE WHEN task.id IS NOT NULL AND NOT status.is_closed THEN 1 ELSE 0 END), 0)
+               FROM userstories_userstory AS us
+          LEFT JOIN tasks_task AS task ON task.user_story_id = us.id
+          LEFT JOIN projects_taskstatus AS status ON status.id = task.status_id
+           GROUP BY us.id
+    """)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('userstories', '0006_auto_20141014_1524'),
+        ('tasks', '0002_tasks_order_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStoryCounters',
+            fields=[
+                ('user_story', models.OneToOneField(primary_key=True, serialize=False, to='userstories.UserStory', related_name='counters', verbose_name='user story')),
+                ('tasks', models.IntegerField(default=0, verbose_name='tasks')),
+                ('open_tasks', models.IntegerField(default=0, verbose_name='open tasks')),
+            ],
+            options={
+                'verbose_name': 'user story counters',
+                'verbose_name_plural': 'user stories counters',
+            },
+            bases=(models.Model,),
+        ),
+        migrations.RunPython(count_user_stories_tasks),
+    ]
@@ -23,6 +23,7 @@ from django.utils import timezone
 from taiga.projects.occ import OCCModelMixin
 from taiga.projects.notifications.mixins import WatchedModelMixin
 from taiga.projects.mixins.blocked import BlockedMixin
+from taiga.projects.mixins.loaded_state import LoadedStateMixin
 from taiga.base.tags import TaggedMixin
 
 
@@ -47,7 +48,7 @@ class RolePoints(models.Model):
         return "{}: {}".format(self.role.name, self.points.name)
 
 
-class UserStory(OCCModelMixin, WatchedModelMixin, BlockedMixin, TaggedMixin, models.Model):
+class UserStory(OCCModelMixin, WatchedModelMixin, BlockedMixin, TaggedMixin, LoadedStateMixin, models.Model):
     ref = models.BigIntegerField(db_index=True, null=True, blank=True, default=None,
                                  verbose_name=_("ref"))
     milestone = models.ForeignKey("milestones.Milestone", null=True, blank=True,
@@ -129,3 +130,20 @@ class UserStory(OCCModelMixin, WatchedModelMixin, BlockedMixin, TaggedMixin, mod
                 total += rp.points.value
 
         return total
+
+
+class UserStoryCounters(models.Model):
+    """
+    Number of tasks and open tasks of a user story, used to know
+    if it must be closed without loading its tasks.
+    """
+    user_story = models.OneToOneField("UserStory", null=False, blank=False, primary_key=True,
+                                      related_name="counters", verbose_name=_("user story"))
+    tasks = models.IntegerField(null=False, blank=False, default=0,
+                                verbose_name=_("tasks"))
+    open_tasks = models.IntegerField(null=False, blank=False, default=0,
+                                     verbose_name=_("open tasks"))
+
+    class Meta:
+        verbose_name = "user story counters"
+        verbose_name_plural = "user stories counters"
@@ -14,10 +14,13 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+from contextlib import closing
+
+from django.db import connection
 from django.utils import timezone
 
 from taiga.base.utils import db, text
-from taiga.projects.history.services import take_snapshot
+from taiga.projects.history.services import take_snapshots_in_bulk
 from taiga.events import events
 
 from . import models
@@ -69,27 +72,113 @@ def update_userstories_order_in_bulk(bulk_data:list, field:str, project:object):
     db.update_in_bulk_with_ids(user_story_ids, new_order_values, model=models.UserStory)
 
 
-def snapshot_userstories_in_bulk(bulk_data, user):
-    user_story_ids = []
-    for us_data in bulk_data:
-        try:
-            us = models.UserStory.objects.get(pk=us_data['us_id'])
-            take_snapshot(us, user=user)
-        except models.UserStory.DoesNotExist:
-            pass
+def snapshot_userstories_in_bulk(bulk_data, user, field=None):
+    """
+    Take history snapshots of some user stories. If `field` is
+    specified, it is the only field changed on all of them.
+    """
+    user_story_ids = [us_data["us_id"] for us_data in bulk_data]
+    user_stories = models.UserStory.objects.filter(pk__in=user_story_ids)
+    changed_fields = None if field is None else (field,)
+    take_snapshots_in_bulk(user_stories, user=user, changed_fields=changed_fields)
+
+
+def get_userstory_counters(user_story) -> tuple:
+    """
+    Get the number of tasks and open tasks of the user story.
+    """
+    counters = (models.UserStoryCounters.objects.filter(user_story_id=user_story.id)
+                                                .values_list("tasks", "open_tasks")
+                                                .first())
+    if counters is None:
+        # Not counted yet (like the user stories created with the
+        # signals disconnected), count them
+        counters = (user_story.tasks.count(),
+                    user_story.tasks.filter(status__is_closed=False).count())
+    return counters
+
+
+def update_userstories_counters(increments:dict):
+    """
+    Add the increments to the counters of the user stories.
+    `increments` should be a dict with the following format:
+
+    {<user story id>: (<tasks increment>, <open tasks increment>), ...}
+
+    The rows are updated in id order, the order in which
+    `rebuild_userstories_counters` locks them, so they can not
+    deadlock.
+    """
+    params = [(tasks, open_tasks, user_story_id)
+              for user_story_id, (tasks, open_tasks) in sorted(increments.items())
+              if user_story_id and (tasks or open_tasks)]
+    if not params:
+        return
+
+    sql = ("UPDATE userstories_userstorycounters "
+           "SET tasks = tasks + %s, open_tasks = open_tasks + %s "
+           "WHERE user_story_id = %s")
+
+    with closing(connection.cursor()) as cursor:
+        cursor.executemany(sql, params)
+
+
+def rebuild_userstories_counters(project_id:int=None):
+    """
+    Count again the tasks of the user stories of the project
+    (of all the projects if it is None).
+
+    The counters rows are locked and updated in place, so the
+    increments of the transactions that change tasks at the same
+    time are applied after the rebuild and not lost.
+    """
+    where_clause = "WHERE us.project_id = %(project_id)s" if project_id is not None else ""
+    counts_sql = """
+             SELECT us.id AS user_story_id,
+                    count(task.id) AS tasks,
+                    coalesce(sum(CASE WHEN task.id IS NOT NULL AND NOT status.is_closed THEN 1 ELSE 0 END), 0) AS open_tasks
+               FROM userstories_userstory AS us
+          LEFT JOIN tasks_task AS task ON task.user_story_id = us.id
+          LEFT JOIN projects_taskstatus AS status ON status.id = task.status_id
+                {}
+           GROUP BY us.id
+    """.format(where_clause)
+
+    lock_sql = """
+        SELECT 1 FROM userstories_userstorycounters
+         WHERE user_story_id IN (SELECT id FROM userstories_userstory AS us {})
+         ORDER BY user_story_id
+           FOR UPDATE
+    """.format(where_clause)
+    update_sql = """
+        UPDATE userstories_userstorycounters AS counters
+           SET tasks = counts.tasks, open_tasks = counts.open_tasks
+          FROM ({}) AS counts
+         WHERE counters.user_story_id = counts.user_story_id
+    """.format(counts_sql)
+    insert_sql = """
+        INSERT INTO userstories_userstorycounters (user_story_id, tasks, open_tasks)
+             SELECT counts.user_story_id, counts.tasks, counts.open_tasks
+               FROM ({}) AS counts
+              WHERE NOT EXISTS (SELECT 1 FROM userstories_userstorycounters AS counters
+                                 WHERE counters.user_story_id = counts.user_story_id)
+    """.format(counts_sql)
+
+    with closing(connection.cursor()) as cursor:
+        cursor.execute(lock_sql, {"project_id": project_id})
+        cursor.execute(update_sql, {"project_id": project_id})
+        cursor.execute(insert_sql, {"project_id": project_id})
 
 
 def calculate_userstory_is_closed(user_story):
     if user_story.status is None:
         return False
 
-    if user_story.tasks.count() == 0:
+    tasks, open_tasks = get_userstory_counters(user_story)
+    if tasks == 0:
         return user_story.status.is_closed
 
-    if all([task.status.is_closed for task in user_story.tasks.all()]):
-        return True
-
-    return False
+    return open_tasks == 0
 
 
 def close_userstory(us):
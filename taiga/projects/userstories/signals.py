@@ -14,6 +14,10 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+from collections import defaultdict
+
+from django.apps import apps
+
 
 ####################################
 # Signals for cached prev US
@@ -23,7 +27,11 @@
 def cached_prev_us(sender, instance, **kwargs):
     instance.prev = None
     if instance.id:
-        instance.prev = sender.objects.get(id=instance.id)
+        # The fields written by other code paths (other instances of the
+        # row or querysets) after they were loaded are read again.
+        instance.reload_written_values("milestone", "is_closed", "finish_date")
+        # Built from the values loaded with the instance when all of them are known
+        instance.prev = instance.get_loaded_instance() or sender.objects.get(id=instance.id)
 
 
 ####################################
@@ -36,13 +44,96 @@ def update_role_points_when_create_or_edit_us(sender, instance, **kwargs):
     instance.project.update_role_points(user_stories=[instance])
 
 
+####################################
+# Signals for project stats
+####################################
+
+def invalidate_project_stats_when_change_us(sender, instance, **kwargs):
+    from taiga.projects.services.stats import invalidate_milestones_points
+    invalidate_milestones_points(instance.project_id)
+
+
+def invalidate_project_stats_when_change_role_points(sender, instance, **kwargs):
+    from taiga.projects.services.stats import invalidate_milestones_points
+
+    # Role points loaded through their user story (us.role_points) already
+    # have it cached, so the project is known without another query.
+    cache_name = instance._meta.get_field("user_story").get_cache_name()
+    user_story = getattr(instance, cache_name, None)
+    if user_story is not None:
+        invalidate_milestones_points(user_story.project_id)
+        return
+
+    # The user story can be already removed when role
+    # points are deleted in cascade.
+    project_ids = (apps.get_model("userstories", "UserStory").objects
+                   .filter(id=instance.user_story_id)
+                   .values_list("project_id", flat=True))
+    for project_id in project_ids:
+        invalidate_milestones_points(project_id)
+
+
 ####################################
 # Signals for update milestone of tasks
 ####################################
 
 def update_milestone_of_tasks_when_edit_us(sender, instance, created, **kwargs):
+    from taiga.projects.milestones import services as milestone_service
+    from taiga.projects.mixins.loaded_state import mark_as_written
+
     if not created:
-        instance.tasks.update(milestone=instance.milestone)
+        moved_tasks = instance.tasks.exclude(milestone_id=instance.milestone_id)
+        moved_task_rows = list(moved_tasks.order_by().values_list("id", "milestone_id", "status__is_closed"))
+        if not moved_task_rows:
+            return
+
+        moved_task_ids = [task_id for task_id, _, _ in moved_task_rows]
+        moved_tasks.filter(id__in=moved_task_ids).update(milestone=instance.milestone)
+        mark_as_written(apps.get_model("tasks", "Task"), moved_task_ids, ["milestone"])
+
+        milestones = defaultdict(lambda: [0, 0])
+        for _, prev_milestone_id, status_is_closed in moved_task_rows:
+            if not status_is_closed:
+                milestones[prev_milestone_id][0] -= 1
+                milestones[instance.milestone_id][0] += 1
+        milestone_service.update_milestones_counters(milestones)
+
+
+####################################
+# Signals for the open items counters
+####################################
+
+def create_counters_when_create_us(sender, instance, created, **kwargs):
+    if created:
+        apps.get_model("userstories", "UserStoryCounters").objects.create(user_story=instance)
+
+
+def _update_milestone_counters(prev_state, state):
+    from taiga.projects.milestones import services as milestone_service
+
+    if prev_state == state:
+        return
+
+    milestones = defaultdict(lambda: [0, 0])
+    for us_state, increment in ((prev_state, -1), (state, 1)):
+        if us_state is None:
+            continue
+
+        milestone_id, is_open = us_state
+        if milestone_id:
+            milestones[milestone_id][1] += increment * is_open
+
+    milestone_service.update_milestones_counters(milestones)
+
+
+def update_milestone_counters_when_create_or_edit_us(sender, instance, created, **kwargs):
+    prev = getattr(instance, "prev", None)
+    prev_state = (prev.milestone_id, not prev.is_closed) if prev is not None else None
+    _update_milestone_counters(prev_state, (instance.milestone_id, not instance.is_closed))
+
+
+def update_milestone_counters_when_delete_us(sender, instance, **kwargs):
+    _update_milestone_counters((instance.milestone_id, not instance.is_closed), None)
 
 
 ####################################
@@ -21,9 +21,10 @@ from django.utils.translation import ugettext_lazy as _
 from django.utils import timezone
 from taiga.projects.notifications.mixins import WatchedModelMixin
 from taiga.projects.occ import OCCModelMixin
+from taiga.projects.mixins.loaded_state import LoadedStateMixin
 
 
-class WikiPage(OCCModelMixin, WatchedModelMixin, models.Model):
+class WikiPage(OCCModelMixin, WatchedModelMixin, LoadedStateMixin, models.Model):
     project = models.ForeignKey("projects.Project", null=False, blank=False,
                                 related_name="wiki_pages", verbose_name=_("project"))
     slug = models.SlugField(max_length=500, db_index=True, null=False, blank=False,
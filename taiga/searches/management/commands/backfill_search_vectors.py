@@ -0,0 +1,54 @@
+# Copyright (C) 2014 Andrey Antukh <niwi@niwi.be>
+# Copyright (C) 2014 Jesús Espino <jespinog@gmail.com>
+# Copyright (C) 2014 David Barragán <bameda@dbarragan.com>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+
+from taiga.searches.services import SEARCH_VECTOR_FIELDS, backfill_search_vectors
+
+
+class Command(BaseCommand):
+    args = '[<table> ...]'
+    help = ('Fill the search vectors of the user stories, tasks, issues and wiki pages '
+            'created before they were maintained by the database')
+    option_list = BaseCommand.option_list + (
+        make_option('--batch-size',
+            action='store',
+            dest='batch_size',
+            type='int',
+            default=1000,
+            help='Number of rows updated per transaction'),
+        make_option('--all',
+            action='store_true',
+            dest='force',
+            default=False,
+            help='Rebuild the vectors of every row, not only the missing ones'),
+        )
+
+    def handle(self, *args, **options):
+        tables = args or sorted(SEARCH_VECTOR_FIELDS)
+        for table in tables:
+            if table not in SEARCH_VECTOR_FIELDS:
+                raise CommandError('Table "%s" has no search vector' % table)
+
+        for table in tables:
+            total = 0
+            for count in backfill_search_vectors(table, batch_size=options["batch_size"],
+                                                 force=options["force"]):
+                total += count
+                self.stdout.write("{}: {} rows updated".format(table, total))
+            self.stdout.write("{}: done ({} rows)".format(table, total))
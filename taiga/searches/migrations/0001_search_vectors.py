@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+# Frozen copy of taiga.searches.services.SEARCH_VECTOR_FIELDS, the
+# triggers created here must not change if that one changes later.
+SEARCH_VECTOR_FIELDS = {
+    "userstories_userstory": ("subject", "description"),
+    "tasks_task": ("subject", "description"),
+    "issues_issue": ("subject", "description"),
+    "wiki_wikipage": ("slug", "content"),
+}
+
+
+def _get_vector_sql(fields):
+    return "to_tsvector({})".format(" || ' ' || ".join("coalesce(NEW.{}, '')".format(field)
+                                                       for field in fields))
+
+
+def create_search_vectors(apps, schema_editor):
+    # The statements are executed one by one because the function
+    # bodies contain semicolons.
+    for table, fields in SEARCH_VECTOR_FIELDS.items():
+        changed = " OR ".join("OLD.{0} IS DISTINCT FROM NEW.{0}".format(field) for field in fields)
+        schema_editor.execute("ALTER TABLE {0} ADD COLUMN search_vector tsvector".format(table))
+        schema_editor.execute("""
+            CREATE FUNCTION {0}_search_vector_update() RETURNS trigger AS $$
+            BEGIN
+                NEW.search_vector := {1};
+                RETURN NEW;
+            END
+            $$ LANGUAGE plpgsql""".format(table, _get_vector_sql(fields)))
+        schema_editor.execute("""
+            CREATE TRIGGER {0}_search_vector_insert BEFORE INSERT ON {0}
+            FOR EACH ROW EXECUTE PROCEDURE {0}_search_vector_update()""".format(table))
+        schema_editor.execute("""
+            CREATE TRIGGER {0}_search_vector_update BEFORE UPDATE ON {0}
+            FOR EACH ROW WHEN ({1})
+            EXECUTE PROCEDURE {0}_search_vector_update()""".format(table, changed))
+        schema_editor.execute("CREATE INDEX {0}_search_vector_idx ON {0} "
+                              "USING gin(search_vector)".format(table))
+
+
+def drop_search_vectors(apps, schema_editor):
+    for table in SEARCH_VECTOR_FIELDS:
+        schema_editor.execute("DROP TRIGGER {0}_search_vector_update ON {0}".format(table))
+        schema_editor.execute("DROP TRIGGER {0}_search_vector_insert ON {0}".format(table))
+        schema_editor.execute("DROP FUNCTION {0}_search_vector_update()".format(table))
+        schema_editor.execute("ALTER TABLE {0} DROP COLUMN search_vector".format(table))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('userstories', '0006_auto_20141014_1524'),
+        ('tasks', '0002_tasks_order_fields'),
+        ('issues', '0001_initial'),
+        ('wiki', '0001_initial'),
+    ]
+
+    operations = [
+        # The existing rows are indexed by the backfill_search_vectors
+        # command instead of locking the tables while migrating, until
+        # then the searches compute their vectors.
+        migrations.RunPython(create_search_vectors, drop_search_vectors),
+    ]
@@ -14,56 +14,92 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+from contextlib import closing
+
 from django.apps import apps
 from django.conf import settings
+from django.db import connection, transaction
 
 
 MAX_RESULTS = getattr(settings, "SEARCHES_MAX_RESULTS", 150)
 
+# Columns indexed in the "search_vector" column of every searchable
+# table. The vectors are kept up to date by database triggers (see the
+# searches migrations) so bulk inserts are indexed too. The migrations
+# keep their own frozen copy: changing it needs a new migration.
+SEARCH_VECTOR_FIELDS = {
+    "userstories_userstory": ("subject", "description"),
+    "tasks_task": ("subject", "description"),
+    "issues_issue": ("subject", "description"),
+    "wiki_wikipage": ("slug", "content"),
+}
+
+
+def get_search_vector_sql(table:str, prefix:str="") -> str:
+    fields = ("coalesce({}{}, '')".format(prefix, field) for field in SEARCH_VECTOR_FIELDS[table])
+    return "to_tsvector({})".format(" || ' ' || ".join(fields))
 
-def search_user_stories(project, text):
-    model_cls = apps.get_model("userstories", "UserStory")
-    where_clause = ("to_tsvector(coalesce(userstories_userstory.subject) || ' ' || "
-                    "coalesce(userstories_userstory.description)) @@ plainto_tsquery(%s)")
 
+def _search(model_cls, project, text):
+    queryset = model_cls.objects.filter(project_id=project.pk)
     if text:
-        return (model_cls.objects.extra(where=[where_clause], params=[text])
-                                 .filter(project_id=project.pk)[:MAX_RESULTS])
+        # The rows stored before the search vectors existed have no vector
+        # until backfill_search_vectors is run, it is computed for them.
+        table = model_cls._meta.db_table
+        computed_vector = get_search_vector_sql(table, prefix="{}.".format(table))
+        vector = "coalesce({}.search_vector, {})".format(table, computed_vector)
+        rank = "ts_rank({}, plainto_tsquery(%s))".format(vector)
+        where_clause = ("({0}.search_vector @@ plainto_tsquery(%s) OR "
+                        "({0}.search_vector IS NULL AND {1} @@ plainto_tsquery(%s)))"
+                        .format(table, computed_vector))
+        queryset = queryset.extra(select={"search_rank": rank}, select_params=[text],
+                                  where=[where_clause], params=[text, text],
+                                  order_by=["-search_rank"])
+
+    return queryset[:MAX_RESULTS]
 
-    return model_cls.objects.filter(project_id=project.pk)[:MAX_RESULTS]
+
+def search_user_stories(project, text):
+    model_cls = apps.get_model("userstories", "UserStory")
+    return _search(model_cls, project, text)
 
 
 def search_tasks(project, text):
     model_cls = apps.get_model("tasks", "Task")
-    where_clause = ("to_tsvector(coalesce(tasks_task.subject, '') || ' ' || coalesce(tasks_task.description, '')) "
-                    "@@ plainto_tsquery(%s)")
-
-    if text:
-        return (model_cls.objects.extra(where=[where_clause], params=[text])
-                                 .filter(project_id=project.pk)[:MAX_RESULTS])
-
-    return model_cls.objects.filter(project_id=project.pk)[:MAX_RESULTS]
+    return _search(model_cls, project, text)
 
 
 def search_issues(project, text):
     model_cls = apps.get_model("issues", "Issue")
-    where_clause = ("to_tsvector(coalesce(issues_issue.subject) || ' ' || coalesce(issues_issue.description)) "
-                    "@@ plainto_tsquery(%s)")
-
-    if text:
-        return (model_cls.objects.extra(where=[where_clause], params=[text])
-                                 .filter(project_id=project.pk)[:MAX_RESULTS])
-
-    return model_cls.objects.filter(project_id=project.pk)[:MAX_RESULTS]
+    return _search(model_cls, project, text)
 
 
 def search_wiki_pages(project, text):
     model_cls = apps.get_model("wiki", "WikiPage")
-    where_clause = ("to_tsvector(coalesce(wiki_wikipage.slug) || ' ' || coalesce(wiki_wikipage.content)) "
-                    "@@ plainto_tsquery(%s)")
-
-    if text:
-        return (model_cls.objects.extra(where=[where_clause], params=[text])
-                                 .filter(project_id=project.pk)[:MAX_RESULTS])
-
-    return model_cls.objects.filter(project_id=project.pk)[:MAX_RESULTS]
+    return _search(model_cls, project, text)
+
+
+def backfill_search_vectors(table:str, batch_size:int=1000, force:bool=False):
+    """
+    Fill the search vectors of the rows of `table` without one (all of
+    them if `force` is true) in batches of `batch_size` rows, each one
+    in its own transaction. Yield the number of rows updated by every
+    batch.
+    """
+    condition = "" if force else "search_vector IS NULL AND "
+    sql = ("UPDATE {table} SET search_vector = {vector} "
+           "WHERE id IN (SELECT id FROM {table} WHERE {condition}id > %s ORDER BY id LIMIT %s) "
+           "RETURNING id").format(table=table, vector=get_search_vector_sql(table),
+                                  condition=condition)
+
+    last_id = 0
+    while True:
+        with transaction.atomic(), closing(connection.cursor()) as cursor:
+            cursor.execute(sql, [last_id, batch_size])
+            ids = [row[0] for row in cursor.fetchall()]
+
+        if not ids:
+            return
+
+        last_id = max(ids)
+        yield len(ids)
@@ -45,10 +45,14 @@ def _get_class_implementation(model:Model, event_type:str):
 def _add_to_object_timeline(obj:object, instance:object, event_type:str, namespace:str="default", extra_data:dict={}):
     assert isinstance(obj, Model), "obj must be a instance of Model"
     assert isinstance(instance, Model), "instance must be a instance of Model"
+    _make_timeline_entry(obj, instance, event_type, namespace, extra_data).save()
+
+
+def _make_timeline_entry(obj:object, instance:object, event_type:str, namespace:str="default", extra_data:dict={}):
     from .models import Timeline
 
     impl = _get_class_implementation(instance.__class__, event_type)
-    Timeline.objects.create(
+    return Timeline(
         content_object=obj,
         namespace=namespace,
         event_type=event_type,
@@ -70,6 +74,19 @@ def push_to_timeline(objects, instance:object, event_type:str, namespace:str="de
         raise Exception("Invalid objects parameter")
 
 
+def push_to_timeline_in_bulk(obj:object, instances:list, event_type:str, namespace:str="default", extra_data:dict={}):
+    """
+    Push the same event of many instances to the timeline of `obj`
+    inserting all the entries at once.
+    """
+    assert isinstance(obj, Model), "obj must be a instance of Model"
+    from .models import Timeline
+
+    entries = [_make_timeline_entry(obj, instance, event_type, namespace, extra_data)
+               for instance in instances]
+    Timeline.objects.bulk_create(entries)
+
+
 def get_timeline(obj, namespace="default"):
     assert isinstance(obj, Model), "obj must be a instance of Model"
     from .models import Timeline
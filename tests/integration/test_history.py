@@ -217,3 +217,86 @@ def test_history_with_only_comment_shouldnot_be_hidden(client):
     assert qs_all.count() == 1
     assert qs_hidden.count() == 0
 
+
+def test_last_snapshot_materialized_state():
+    from django.core.cache import cache
+
+    issue = f.IssueFactory.create()
+    key = services.make_key_from_model_object(issue)
+
+    services.take_snapshot(issue, user=issue.owner)
+    issue.description = "foo1"
+    issue.save()
+    services.take_snapshot(issue, user=issue.owner)
+
+    cached_fobj, cached_need_snapshot = services.get_last_snapshot_for_key(key)
+
+    cache.clear()
+    rebuilt_fobj, rebuilt_need_snapshot = services.get_last_snapshot_for_key(key)
+
+    assert cached_fobj.snapshot["description"] == "foo1"
+    assert cached_fobj.snapshot == rebuilt_fobj.snapshot
+    assert cached_need_snapshot == rebuilt_need_snapshot
+
+
+def test_take_snapshots_in_bulk():
+    project = f.create_project()
+    us1 = f.create_userstory(project=project)
+    us2 = f.create_userstory(project=project)
+
+    qs_all = HistoryEntry.objects.all()
+    qs_created = qs_all.filter(type=HistoryType.create)
+    qs_hidden = qs_all.filter(is_hidden=True)
+
+    services.take_snapshot(us1, user=us1.owner)
+    assert qs_all.count() == 1
+
+    us1.backlog_order = 42
+    us1.save()
+
+    services.take_snapshots_in_bulk([us1, us2], user=project.owner)
+    assert qs_all.count() == 3
+    assert qs_created.count() == 2
+    assert qs_hidden.count() == 1
+
+    # Without changes no new entries are created
+    services.take_snapshots_in_bulk([us1, us2], user=project.owner)
+    assert qs_all.count() == 3
+
+
+def test_take_hidden_snapshot_without_freeze():
+    task = f.TaskFactory.create()
+
+    qs_all = HistoryEntry.objects.all()
+    qs_hidden = qs_all.filter(is_hidden=True)
+
+    services.take_snapshot(task, user=task.owner)
+    task.us_order = 3
+    task.save()
+
+    with patch("taiga.projects.history.services.freeze_model_instance") as m:
+        services.take_snapshot(task, user=task.owner, changed_fields=["us_order"])
+        assert m.call_count == 0
+
+    assert qs_all.count() == 2
+    assert qs_hidden.count() == 1
+
+    fobj, _ = services.get_last_snapshot_for_key(services.make_key_from_model_object(task))
+    assert fobj.snapshot["us_order"] == 3
+
+
+def test_patch_with_unchanged_fields_is_hidden(client):
+    project = f.create_project()
+    us = f.create_userstory(project=project)
+    services.take_snapshot(us, user=us.owner)
+
+    url = reverse("userstories-detail", args=[us.pk])
+    data = json.dumps({"subject": us.subject, "backlog_order": 3, "version": us.version})
+
+    client.login(project.owner)
+    with patch("taiga.projects.history.services.freeze_model_instance") as m:
+        response = client.patch(url, data, content_type="application/json")
+        assert m.call_count == 0
+
+    assert response.status_code == 200, response.content
+    assert HistoryEntry.objects.filter(is_hidden=True).count() == 1
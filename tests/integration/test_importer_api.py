@@ -18,6 +18,8 @@ import pytest
 import json
 import base64
 import datetime
+import hashlib
+import os
 
 from django.core.urlresolvers import reverse
 
@@ -28,9 +30,12 @@ from taiga.projects.issues.models import Issue
 from taiga.projects.userstories.models import UserStory
 from taiga.projects.tasks.models import Task
 from taiga.projects.wiki.models import WikiPage
+from taiga.projects.models import UserStoryStatus
+from taiga.projects.attachments.models import Attachment
 
-from taiga.export_import.service import project_to_dict
+from taiga.export_import.service import project_to_dict, store_issue, get_errors
 from taiga.export_import.dump_service import dict_to_project
+from taiga.export_import.context import import_context, get_import_context
 
 pytestmark = pytest.mark.django_db
 
@@ -249,6 +254,34 @@ def test_valid_issue_import_with_extra_data(client):
     assert response_data["ref"] is not None
     assert response_data["finished_date"] == "2014-10-24T00:00:00+0000"
 
+def test_issue_import_keeps_the_attachment_names(client):
+    user = f.UserFactory.create()
+    project = f.ProjectFactory.create(owner=user)
+    project.default_issue_type = f.IssueTypeFactory.create(project=project)
+    project.default_issue_status = f.IssueStatusFactory.create(project=project)
+    project.default_severity = f.SeverityFactory.create(project=project)
+    project.default_priority = f.PriorityFactory.create(project=project)
+    project.save()
+    client.login(user)
+
+    url = reverse("importer-issue", args=[project.pk])
+    data = {
+        "subject": "Imported issue",
+        "attachments": [{
+            "owner": user.email,
+            "attached_file": {
+                "name": "Informe Técnico v1.2.PDF",
+                "data": base64.b64encode(b"TEST").decode("utf-8")
+            }
+        }]
+    }
+
+    response = client.post(url, json.dumps(data), content_type="application/json")
+    assert response.status_code == 201
+    attachment = Attachment.objects.get(project=project)
+    assert attachment.name == "informe técnico v1.2.pdf"
+
+
 def test_invalid_issue_import_with_extra_data(client):
     user = f.UserFactory.create()
     project = f.ProjectFactory.create(owner=user)
@@ -677,3 +710,164 @@ def test_milestone_import_duplicated_milestone(client):
     assert response.status_code == 400
     response_data = json.loads(response.content.decode("utf-8"))
     assert response_data["milestones"][0]["name"][0] == "Name duplicated for the project"
+
+
+def test_dict_to_project_stores_items_in_bulk(client):
+    user = f.UserFactory.create()
+    data = {
+        "name": "Imported project",
+        "slug": "imported-project",
+        "description": "Imported project",
+        "roles": [{"permissions": [], "name": "Test"}],
+        "us_statuses": [{"name": "Test"}],
+        "severities": [{"name": "Test"}],
+        "priorities": [{"name": "Test"}],
+        "points": [{"name": "Test"}],
+        "issue_types": [{"name": "Test"}],
+        "task_statuses": [{"name": "Test"}],
+        "issue_statuses": [{"name": "Test"}],
+        "user_stories": [{
+            "ref": 5,
+            "subject": "Imported us",
+            "tags": ["TaG"],
+            "watchers": [user.email],
+            "role_points": [{"role": "Test", "points": "Test"}],
+            "attachments": [{
+                "owner": user.email,
+                "attached_file": {
+                    "name": "imported attachment",
+                    "data": base64.b64encode(b"TEST").decode("utf-8")
+                }
+            }]
+        }, {
+            "subject": "Imported us without ref",
+        }],
+        "issues": [{"ref": 2, "subject": "Imported issue"}],
+        "tasks": [{"subject": "Imported task", "user_story": 5}],
+    }
+
+    dict_to_project(data, user.email)
+
+    project = Project.objects.get(slug="imported-project")
+    us = UserStory.objects.get(project=project, ref=5)
+    assert us.tags == ["tag"]
+    assert list(us.watchers.all()) == [user]
+    assert us.role_points.count() == 1
+    assert us.attachments.count() == 1
+    assert [tag for tag, color in project.tags_colors] == ["tag"]
+
+    assert Issue.objects.get(project=project).ref == 2
+
+    # Objects without ref are numbered after the imported refs
+    assert UserStory.objects.get(project=project, subject="Imported us without ref").ref == 6
+    task = Task.objects.get(project=project)
+    assert task.ref == 7
+    assert task.user_story == us
+
+
+def test_dict_to_project_applies_the_save_rules_in_bulk(client):
+    user = f.UserFactory.create()
+    data = {
+        "name": "Imported project",
+        "slug": "imported-project",
+        "description": "Imported project",
+        "roles": [{"permissions": [], "name": "Test"}],
+        "us_statuses": [{"name": "Test"}],
+        "severities": [{"name": "Test"}],
+        "priorities": [{"name": "Test"}],
+        "points": [{"name": "Test"}],
+        "issue_types": [{"name": "Test"}],
+        "task_statuses": [{"name": "Test"}],
+        "issue_statuses": [{"name": "Open", "is_closed": False},
+                           {"name": "Closed", "is_closed": True}],
+        "user_stories": [{"ref": 1, "subject": "Imported us", "is_blocked": False,
+                          "blocked_note": "Not blocked anymore"}],
+        "issues": [{"ref": 2, "subject": "Closed issue", "status": "Closed"},
+                   {"ref": 3, "subject": "Open issue", "status": "Open",
+                    "finished_date": "2014-10-10T00:00:00+0000"}],
+    }
+
+    dict_to_project(data, user.email)
+
+    project = Project.objects.get(slug="imported-project")
+    assert UserStory.objects.get(project=project, ref=1).blocked_note == ""
+    assert Issue.objects.get(project=project, ref=2).finished_date is not None
+    assert Issue.objects.get(project=project, ref=3).finished_date is None
+
+
+def test_import_context_memoizes_lookups():
+    user = f.UserFactory.create()
+    project = f.ProjectFactory.create(owner=user)
+    status = f.UserStoryStatusFactory.create(project=project)
+    statuses = UserStoryStatus.objects.all()
+
+    with import_context() as context:
+        assert get_import_context() is context
+        assert context.get_user(user.email) is context.get_user(user.email)
+        assert context.get_user("not-exists@example.com") is None
+
+        assert context.get_related(statuses, "name", status.name, project) == status
+        assert (context.get_related(statuses, "name", status.name, project) is
+                context.get_related(statuses, "name", status.name, project))
+
+        with pytest.raises(UserStoryStatus.DoesNotExist):
+            context.get_related(statuses, "name", "New status", project)
+
+        # Objects created after the first lookup are found too
+        new_status = f.UserStoryStatusFactory.create(project=project, name="New status")
+        assert context.get_related(statuses, "name", "New status", project) == new_status
+
+    assert get_import_context() is None
+
+
+def test_import_context_keeps_a_bounded_number_of_lookups(settings):
+    settings.IMPORT_RELATED_CACHE_SIZE = 2
+    project = f.ProjectFactory.create()
+    status1, status2, status3 = f.UserStoryStatusFactory.create_batch(3, project=project)
+    statuses = UserStoryStatus.objects.all()
+
+    with import_context() as context:
+        for status in (status1, status2, status3):
+            context.get_related(statuses, "name", status.name, project)
+
+        assert len(context._related) == 2
+        assert context.get_related(statuses, "name", status1.name, project) == status1
+
+
+def test_import_attachments_by_reference_and_inline(tmpdir):
+    user = f.UserFactory.create()
+    project = f.ProjectFactory.create(owner=user)
+    project.default_issue_type = f.IssueTypeFactory.create(project=project)
+    project.default_issue_status = f.IssueStatusFactory.create(project=project)
+    project.default_severity = f.SeverityFactory.create(project=project)
+    project.default_priority = f.PriorityFactory.create(project=project)
+    project.save()
+
+    sha1 = hashlib.sha1(b"TEST").hexdigest()
+    with open(os.path.join(str(tmpdir), sha1), "wb") as fd:
+        fd.write(b"TEST")
+
+    with import_context(attachments_dir=str(tmpdir)):
+        for subject in ("Imported issue 1", "Imported issue 2"):
+            store_issue(project, {
+                "subject": subject,
+                "attachments": [{
+                    "owner": user.email,
+                    "attached_file": {"name": "by-reference.txt", "sha1": sha1}
+                }, {
+                    "owner": user.email,
+                    "attached_file": {
+                        "name": "inline.txt",
+                        "data": base64.b64encode(b"TEST").decode("utf-8")
+                    }
+                }]
+            })
+
+    assert get_errors() == {}
+    attachments = Attachment.objects.filter(project=project)
+    assert attachments.count() == 4
+    # All of them share the same stored file
+    assert len(set(attachment.attached_file.name for attachment in attachments)) == 1
+    assert attachments[0].attached_file.read() == b"TEST"
+    assert sorted(attachment.name for attachment in attachments) == ["by-reference.txt", "by-reference.txt",
+                                                                      "inline.txt", "inline.txt"]
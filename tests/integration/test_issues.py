@@ -4,6 +4,7 @@ import json
 from django.core.urlresolvers import reverse
 
 from taiga.projects.issues import services, models
+from taiga.projects import services as project_services
 from taiga.base.utils import json
 
 from .. import factories as f
@@ -147,3 +148,42 @@ def test_api_filter_by_text_6(client):
 
     assert response.status_code == 200
     assert number_of_issues == 1
+
+
+def test_get_issues_filters_data():
+    project = f.ProjectFactory.create()
+    status1 = f.IssueStatusFactory.create(project=project)
+    status2 = f.IssueStatusFactory.create(project=project)
+    type1 = f.IssueTypeFactory.create(project=project)
+    type2 = f.IssueTypeFactory.create(project=project)
+
+    f.IssueFactory.create(project=project, status=status1, type=type1, tags=["a", "b"])
+    f.IssueFactory.create(project=project, status=status2, type=type1, tags=["a"])
+    f.IssueFactory.create(project=project, status=status1, type=type2, tags=[])
+
+    data = project_services.get_issues_filters_data(project)
+    assert dict(data["statuses"])[status1.id] == 2
+    assert dict(data["statuses"])[status2.id] == 1
+    assert dict(data["types"])[type1.id] == 2
+    assert dict(data["types"])[type2.id] == 1
+    assert data["tags"] == [("a", 2), ("b", 1)]
+    assert data["created_by"] == data["owners"]
+
+    # Every filter counts the issues matching the other ones
+    data = project_services.get_issues_filters_data(project, {"status": [status1.id], "tags": ["a"]})
+    assert dict(data["statuses"])[status1.id] == 1
+    assert dict(data["statuses"])[status2.id] == 1
+    assert dict(data["types"])[type1.id] == 1
+    assert dict(data["types"])[type2.id] == 0
+    assert data["tags"] == [("a", 1), ("b", 1)]
+
+
+def test_issues_filters_data_with_invalid_ids(client):
+    user = f.UserFactory.create()
+    project = f.ProjectFactory.create(owner=user)
+    f.MembershipFactory.create(project=project, user=user, is_owner=True)
+    url = reverse("projects-issue-filters-data", kwargs={"pk": project.pk})
+
+    client.login(user)
+    response = client.get(url + "?status=true")
+    assert response.status_code == 400
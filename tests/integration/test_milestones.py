@@ -50,3 +50,30 @@ def test_update_milestone_with_userstories_list(client):
     response = client.json.patch(url, json.dumps(form_data))
     assert response.status_code == 200
 
+
+def test_milestone_burndown():
+    from datetime import date, timedelta
+    from taiga.projects.milestones import services
+    from taiga.projects.services.stats import invalidate_milestones_points
+
+    user = f.UserFactory.create()
+    project = f.ProjectFactory.create(owner=user)
+    role = f.RoleFactory.create(project=project, computable=True)
+    points = f.PointsFactory.create(project=project, value=2)
+    sprint = f.MilestoneFactory.create(project=project, owner=user,
+                                       estimated_start=date.today() - timedelta(days=2),
+                                       estimated_finish=date.today() + timedelta(days=2))
+
+    us1 = f.UserStoryFactory.create(project=project, milestone=sprint)
+    us2 = f.UserStoryFactory.create(project=project, milestone=sprint)
+    us1.role_points.filter(role=role).update(points=points)
+    us2.role_points.filter(role=role).update(points=points)
+
+    us1.status = f.UserStoryStatusFactory.create(project=project, is_closed=True)
+    us1.save()
+
+    invalidate_milestones_points(project.id)
+    days = services.get_milestone_burndown(sprint)
+
+    assert len(days) == 5
+    assert [day["open_points"] for day in days] == [4, 4, 2, 2, 2]
@@ -1,5 +1,11 @@
 import pytest
 
+from django.db import connection
+from django.db.models import signals
+from django.test.utils import CaptureQueriesContext
+
+from taiga.projects.tasks.models import Task
+
 from .. import factories as f
 from ..utils import disconnect_signals, reconnect_signals
 
@@ -31,3 +37,65 @@ def test_project_update_role_points():
     project.update_role_points()
 
     assert user_story.role_points.filter(role=not_related_role, points=null_points).count() == 1
+
+
+def test_loaded_state_of_model_instances():
+    task = f.TaskFactory.create(subject="old subject")
+    task = Task.objects.get(pk=task.pk)
+
+    task.subject = "new subject"
+    assert task.get_changed_fields() == {"subject"}
+    assert task.get_loaded_instance().subject == "old subject"
+
+    task.save()
+    assert "subject" in task.get_saved_changes()
+    assert task.get_changed_fields() == set()
+    assert task.get_loaded_values()["subject"] == "new subject"
+
+
+def test_loaded_state_of_deferred_model_instances():
+    task = f.TaskFactory.create()
+    task = Task.objects.only("id", "subject").get(pk=task.pk)
+
+    loaded_values = task.get_loaded_values()
+    assert "subject" in loaded_values
+    assert "description" not in loaded_values
+    assert task.get_loaded_instance() is None
+
+
+def test_saved_changes_include_the_nested_saves():
+    task = f.TaskFactory.create(subject="old subject", us_order=1)
+    task = Task.objects.get(pk=task.pk)
+
+    def save_again(sender, instance, **kwargs):
+        if instance.pk == task.pk and instance.us_order == 1:
+            instance.us_order = 2
+            instance.save(update_fields=["us_order"])
+
+    signals.post_save.connect(save_again, sender=Task)
+    try:
+        task.subject = "new subject"
+        task.save()
+    finally:
+        signals.post_save.disconnect(save_again, sender=Task)
+
+    assert {"subject", "us_order"} <= task.get_saved_changes()
+
+
+def test_reload_written_values_only_reads_the_written_fields():
+    task = f.TaskFactory.create(subject="old subject")
+    task = Task.objects.get(pk=task.pk)
+
+    with CaptureQueriesContext(connection) as queries:
+        task.reload_written_values()
+    assert len(queries) == 0
+
+    other_task = Task.objects.get(pk=task.pk)
+    other_task.subject = "new subject"
+    other_task.save(update_fields=["subject"])
+
+    with CaptureQueriesContext(connection) as queries:
+        task.reload_written_values()
+    assert len(queries) == 1
+    assert task.get_loaded_values()["subject"] == "new subject"
+    assert task.subject == "old subject"
@@ -18,8 +18,10 @@ import pytest
 from unittest.mock import patch
 
 from django.core.urlresolvers import reverse
+from django.db.models import F
 
 from taiga.base.utils import json
+from taiga.projects.occ import OCCResourceMixin
 from taiga.projects.issues.models import Issue
 from taiga.projects.wiki.models import WikiPage
 from taiga.projects.userstories.models import UserStory
@@ -163,3 +165,15 @@ def test_valid_concurrent_save_for_task(client):
         assert response.status_code == 200
         task = Task.objects.get(id=task.id)
         assert task.version == 11
+
+
+def test_saved_version_counts_every_increment():
+    us = f.UserStoryFactory.create(version=10)
+    us = UserStory.objects.get(pk=us.pk)
+
+    us.version = F("version") + 1
+    us.save()
+    us.save()
+
+    assert OCCResourceMixin()._get_saved_version(us) == 12
+    assert UserStory.objects.get(pk=us.pk).version == 12
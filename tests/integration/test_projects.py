@@ -1,7 +1,10 @@
 from django.core.urlresolvers import reverse
 from taiga.base.utils import json
 
+from taiga.projects.services import get_all_tags
+
 from .. import factories as f
+from ..utils import set_settings
 
 import pytest
 pytestmark = pytest.mark.django_db
@@ -26,3 +29,59 @@ def test_partially_update_project(client):
     client.login(project.owner)
     response = client.json.patch(url, json.dumps(data))
     assert response.status_code == 400
+
+
+def test_project_tags_colors_follow_the_tags_usages():
+    project = f.ProjectFactory.create(tags_colors=[])
+    us = f.UserStoryFactory.create(project=project, tags=["a", "b"])
+    task = f.TaskFactory.create(project=project, tags=["A"])
+
+    project = project.__class__.objects.get(pk=project.pk)
+    assert sorted(tag for tag, color in project.tags_colors) == ["a", "b"]
+    assert dict(project.tags_usages.values_list("tag", "count")) == {"a": 2, "b": 1}
+
+    us.tags = ["a"]
+    us.save()
+    project = project.__class__.objects.get(pk=project.pk)
+    assert [tag for tag, color in project.tags_colors] == ["a"]
+
+    us.delete()
+    project = project.__class__.objects.get(pk=project.pk)
+    assert [tag for tag, color in project.tags_colors] == ["a"]
+
+    task.delete()
+    project = project.__class__.objects.get(pk=project.pk)
+    assert project.tags_colors == []
+    assert project.tags_usages.count() == 0
+
+
+def test_get_all_tags():
+    project = f.ProjectFactory.create()
+    f.UserStoryFactory.create(project=project, tags=["b", "a"])
+    f.TaskFactory.create(project=project, tags=["a", "c"])
+    f.IssueFactory.create(project=project, tags=None)
+    f.IssueFactory.create(project=project, tags=["d"])
+    f.IssueFactory.create(tags=["other-project"])
+
+    assert get_all_tags(project) == ["a", "b", "c", "d"]
+
+
+def test_get_all_tags_in_code_point_order():
+    project = f.ProjectFactory.create()
+    f.UserStoryFactory.create(project=project, tags=["é", "f", "e", "z1", "z-1"])
+
+    assert get_all_tags(project) == sorted(["é", "f", "e", "z1", "z-1"])
+
+
+@set_settings(PROJECT_TAGS_CACHE_TIMEOUT=60)
+def test_get_all_tags_cache_is_invalidated_when_tags_change():
+    project = f.ProjectFactory.create()
+    us = f.UserStoryFactory.create(project=project, tags=["a"])
+    assert get_all_tags(project) == ["a"]
+
+    us.tags = ["a", "b"]
+    us.save()
+    assert get_all_tags(project) == ["a", "b"]
+
+    us.delete()
+    assert get_all_tags(project) == []
@@ -18,10 +18,12 @@
 import pytest
 
 from django.core.urlresolvers import reverse
+from django.db import connection
 
 from .. import factories as f
 
 from taiga.permissions.permissions import MEMBERS_PERMISSIONS
+from taiga.searches import services
 from tests.utils import disconnect_signals, reconnect_signals
 
 
@@ -130,3 +132,22 @@ def test_search_text_query_in_my_project(client, searches_initial_data):
     assert len(response.data["tasks"]) == 1
     assert len(response.data["issues"]) == 0
     assert len(response.data["wikipages"]) == 0
+
+
+def test_search_results_are_ranked(searches_initial_data):
+    data = searches_initial_data
+
+    wiki = f.WikiPageFactory.create(project=data.project1, content="Future, future and more future")
+
+    assert list(services.search_wiki_pages(data.project1, "future")) == [wiki, data.wiki2]
+
+
+def test_backfill_search_vectors(searches_initial_data):
+    data = searches_initial_data
+
+    connection.cursor().execute("UPDATE tasks_task SET search_vector = NULL")
+    # The rows without vector are found too
+    assert list(services.search_tasks(data.project1, "future")) == [data.tsk3]
+
+    assert list(services.backfill_search_vectors("tasks_task", batch_size=2)) == [2, 1]
+    assert list(services.search_tasks(data.project1, "future")) == [data.tsk3]
@@ -1,3 +1,5 @@
+from unittest import mock
+
 import pytest
 
 from django.conf import settings
@@ -107,3 +109,58 @@ def test_project_assigned_points(client, data):
     data.user_story4.milestone = data.milestone
     data.user_story4.save()
     assert data.project.assigned_points == {data.role1.pk: 14, data.role2.pk: 1}
+
+
+def test_project_issues_stats(client, data):
+    from django.utils import timezone
+    from taiga.projects.services.stats import get_stats_for_project_issues
+
+    closed_status = f.IssueStatusFactory(project=data.project, is_closed=True)
+    issue1 = f.IssueFactory(project=data.project, owner=data.user, assigned_to=None)
+    issue2 = f.IssueFactory(project=data.project, owner=data.user, assigned_to=None,
+                            status=closed_status, finished_date=timezone.now())
+
+    stats = get_stats_for_project_issues(data.project)
+
+    assert stats["total_issues"] == 2
+    assert stats["opened_issues"] == 1
+    assert stats["closed_issues"] == 1
+    assert stats["issues_per_status"][closed_status.id]["count"] == 1
+    assert stats["issues_per_owner"][data.user.id]["count"] == 2
+    assert stats["issues_per_assigned_to"][0]["count"] == 2
+
+    last_days = stats["last_four_weeks_days"]
+    assert len(last_days["by_open_closed"]["open"]) == 28
+    assert len(last_days["by_severity"][issue1.severity_id]["data"]) == 28
+
+
+def test_milestones_points(client, data):
+    from taiga.projects.services.stats import get_milestones_points, invalidate_milestones_points
+
+    data.user_story1.milestone = data.milestone
+    data.user_story1.is_closed = True
+    data.user_story1.save()
+    data.user_story2.milestone = data.milestone
+    data.user_story2.save()
+
+    invalidate_milestones_points(data.project.id)
+    milestones_points = get_milestones_points(data.project)
+
+    assert len(milestones_points) == 1
+    assert milestones_points[0]["name"] == data.milestone.name
+    assert milestones_points[0]["closed_points"] == data.milestone.closed_points
+
+
+def test_role_points_invalidate_stats_without_loading_the_user_story(data):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from taiga.projects.userstories.signals import invalidate_project_stats_when_change_role_points
+
+    role_points = data.user_story1.role_points.get(pk=data.role_points1.pk)
+
+    with mock.patch("taiga.projects.services.stats.invalidate_milestones_points") as invalidate, \
+            CaptureQueriesContext(connection) as queries:
+        invalidate_project_stats_when_change_role_points(role_points.__class__, role_points)
+
+    assert len(queries) == 0
+    invalidate.assert_called_once_with(data.project.id)
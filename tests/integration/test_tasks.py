@@ -2,11 +2,14 @@ from unittest import mock
 import json
 
 from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 from taiga.base.utils import json
 from taiga.projects.tasks import services
 
 from .. import factories as f
+from ..utils import count_row_selects_before_update
 
 import pytest
 pytestmark = pytest.mark.django_db
@@ -34,6 +37,20 @@ Task #2
         db.save_in_bulk.assert_called_once_with(tasks, None, None)
 
 
+def test_api_patch_task_does_not_read_the_row_again(client):
+    task = f.create_task()
+    url = reverse("tasks-detail", kwargs={"pk": task.pk})
+    data = {"subject": "New subject", "version": task.version}
+
+    client.login(task.owner)
+    with CaptureQueriesContext(connection) as queries:
+        response = client.json.patch(url, json.dumps(data))
+
+    assert response.status_code == 200, response.data
+    # Only the view loads it, the signal handlers use its loaded state
+    assert count_row_selects_before_update(queries, "tasks_task", task.pk) == 1
+
+
 def test_api_update_task_tags(client):
     task = f.create_task()
     url = reverse("tasks-detail", kwargs={"pk": task.pk})
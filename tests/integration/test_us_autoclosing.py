@@ -18,8 +18,10 @@
 
 import pytest
 
-from taiga.projects.userstories.models import UserStory
+from taiga.projects.userstories.models import UserStory, UserStoryCounters
+from taiga.projects.userstories.services import rebuild_userstories_counters
 from taiga.projects.tasks.models import Task
+from taiga.projects.milestones.models import Milestone, MilestoneCounters
 
 from tests import factories as f
 pytestmark = pytest.mark.django_db
@@ -272,3 +274,88 @@ def test_task_create(data):
     f.TaskFactory(user_story=data.user_story1, status=data.task_open_status)
     data.user_story1 = UserStory.objects.get(pk=data.user_story1.pk)
     assert data.user_story1.is_closed is False
+
+
+def test_us_counters_follow_the_tasks(data):
+    counters = UserStoryCounters.objects.get(user_story=data.user_story1)
+    assert (counters.tasks, counters.open_tasks) == (3, 3)
+
+    data.task1.status = data.task_closed_status
+    data.task1.save()
+    data.task2.delete()
+
+    counters = UserStoryCounters.objects.get(user_story=data.user_story1)
+    assert (counters.tasks, counters.open_tasks) == (2, 1)
+
+    data.task3.user_story = data.user_story2
+    data.task3.save()
+
+    counters = UserStoryCounters.objects.get(user_story=data.user_story1)
+    assert (counters.tasks, counters.open_tasks) == (1, 0)
+    counters = UserStoryCounters.objects.get(user_story=data.user_story2)
+    assert (counters.tasks, counters.open_tasks) == (1, 1)
+
+
+def test_rebuild_us_counters(data):
+    UserStoryCounters.objects.filter(user_story=data.user_story1).update(tasks=0, open_tasks=0)
+
+    rebuild_userstories_counters(data.user_story1.project_id)
+
+    counters = UserStoryCounters.objects.get(user_story=data.user_story1)
+    assert (counters.tasks, counters.open_tasks) == (3, 3)
+
+
+def test_task_status_change_rebuilds_the_counters_only_if_closing_changes(data):
+    status = f.TaskStatusFactory(project=data.user_story1.project, is_closed=False)
+    data.task1.status = status
+    data.task1.save()
+    UserStoryCounters.objects.filter(user_story=data.user_story1).update(tasks=0, open_tasks=0)
+
+    status.name = "Renamed status"
+    status.color = "#000000"
+    status.save()
+
+    counters = UserStoryCounters.objects.get(user_story=data.user_story1)
+    assert (counters.tasks, counters.open_tasks) == (0, 0)
+
+    status.is_closed = True
+    status.save()
+
+    counters = UserStoryCounters.objects.get(user_story=data.user_story1)
+    assert (counters.tasks, counters.open_tasks) == (3, 2)
+
+
+def test_milestone_counters_follow_the_moved_tasks(data):
+    milestone = f.MilestoneFactory(project=data.user_story1.project)
+    data.task1.status = data.task_closed_status
+    data.task1.save()
+
+    data.user_story1.milestone = milestone
+    data.user_story1.save()
+
+    counters = MilestoneCounters.objects.get(milestone=milestone)
+    assert (counters.open_tasks, counters.open_user_stories) == (2, 1)
+
+
+def test_us_saved_after_its_tasks_closed_it(data):
+    milestone = f.MilestoneFactory(project=data.user_story1.project)
+    data.user_story1.milestone = milestone
+    data.user_story1.save()
+
+    # Loaded before its tasks close it through other instance
+    user_story = UserStory.objects.get(pk=data.user_story1.pk)
+
+    for task in (data.task1, data.task2, data.task3):
+        task = Task.objects.get(pk=task.pk)
+        task.status = data.task_closed_status
+        task.save()
+
+    assert UserStory.objects.get(pk=user_story.pk).is_closed is True
+
+    user_story.subject = "New subject"
+    user_story.save()
+
+    assert UserStory.objects.get(pk=user_story.pk).is_closed is True
+    counters = MilestoneCounters.objects.get(milestone=milestone)
+    assert (counters.open_tasks, counters.open_user_stories) == (0, 0)
+    assert Milestone.objects.get(pk=milestone.pk).closed is True
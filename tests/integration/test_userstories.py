@@ -1,11 +1,14 @@
 import copy
 from unittest import mock
 from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 from taiga.base.utils import json
 from taiga.projects.userstories import services, models
 
 from .. import factories as f
+from ..utils import count_row_selects_before_update
 
 import pytest
 pytestmark = pytest.mark.django_db
@@ -42,6 +45,20 @@ def test_update_userstories_order_in_bulk():
                                                            model=models.UserStory)
 
 
+def test_api_patch_userstory_does_not_read_the_row_again(client):
+    us = f.create_userstory()
+    url = reverse("userstories-detail", kwargs={"pk": us.pk})
+    data = {"subject": "New subject", "version": us.version}
+
+    client.login(us.owner)
+    with CaptureQueriesContext(connection) as queries:
+        response = client.json.patch(url, json.dumps(data))
+
+    assert response.status_code == 200, response.data
+    # Only the view loads it, the signal handlers use its loaded state
+    assert count_row_selects_before_update(queries, "userstories_userstory", us.pk) == 1
+
+
 def test_api_delete_userstory(client):
     us = f.create_userstory()
     url = reverse("userstories-detail", kwargs={"pk": us.pk})
@@ -0,0 +1,102 @@
+# Copyright (C) 2014 Andrey Antukh <niwi@niwi.be>
+# Copyright (C) 2014 Jesús Espino <jespinog@gmail.com>
+# Copyright (C) 2014 David Barragán <bameda@dbarragan.com>
+# Copyright (C) 2014 Anler Hernández <hello@anler.me>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from unittest import mock
+
+import pytest
+
+from taiga.events import events
+
+
+def test_events_batch_deduplicates_and_groups_events():
+    with mock.patch("taiga.events.events.emit_event") as emit_event_mock:
+        with events.events_batch():
+            events.emit_event_for_ids([1, 2], "userstories.userstory", 1, sessionid="session")
+            obj = mock.Mock(project_id=1, pk=2)
+            events.emit_event_for_model(obj, content_type="userstories.userstory",
+                                        sessionid="session")
+            events.emit_event_for_model(obj, content_type="userstories.userstory",
+                                        sessionid="session")
+            assert emit_event_mock.call_count == 0
+
+        assert emit_event_mock.call_count == 1
+        kwargs = emit_event_mock.call_args[1]
+        assert kwargs["routing_key"] == "changes.project.1.userstories"
+        assert kwargs["data"] == {"type": "change", "matches": "userstories.userstory", "pk": [1, 2]}
+
+
+def test_events_batch_discards_events_on_error():
+    with mock.patch("taiga.events.events.emit_event") as emit_event_mock:
+        with pytest.raises(RuntimeError):
+            with events.events_batch():
+                obj = mock.Mock(project_id=1, pk=2)
+                events.emit_event_for_model(obj, content_type="issues.issue", sessionid="session")
+                raise RuntimeError()
+
+        assert emit_event_mock.call_count == 0
+
+        obj = mock.Mock(project_id=1, pk=2)
+        events.emit_event_for_model(obj, content_type="issues.issue", sessionid="session")
+        assert emit_event_mock.call_count == 1
+        assert emit_event_mock.call_args[1]["data"]["pk"] == 2
+
+
+def test_watched_models_map():
+    from django.apps import apps
+
+    watched_models = events.get_watched_models()
+    issue_model = apps.get_model("issues", "Issue")
+    assert watched_models[issue_model] == "issues.issue"
+
+    with mock.patch("taiga.events.events.ContentType") as content_type_mock:
+        assert events._get_type_for_model(issue_model()) == "issues.issue"
+        assert content_type_mock.objects.get_for_model.call_count == 0
+
+
+def test_events_batch_keeps_the_list_payload_of_ids():
+    with mock.patch("taiga.events.events.emit_event") as emit_event_mock:
+        with events.events_batch():
+            events.emit_event_for_ids([1], "userstories.userstory", 1, sessionid="session")
+            events.emit_event_for_ids([1], "userstories.userstory", 1, sessionid="session")
+
+        assert emit_event_mock.call_count == 1
+        assert emit_event_mock.call_args[1]["data"]["pk"] == [1]
+
+
+def test_events_batch_middleware_never_nests_in_a_stale_batch():
+    from taiga.events.middleware import EventsBatchMiddleware
+
+    middleware = EventsBatchMiddleware()
+    request = mock.Mock()
+    response = mock.Mock(status_code=200)
+
+    with mock.patch("taiga.events.events.emit_event") as emit_event_mock:
+        # A request whose response was never processed
+        middleware.process_request(request)
+        events.begin_events_batch()
+
+        middleware.process_request(request)
+        obj = mock.Mock(project_id=1, pk=2)
+        events.emit_event_for_model(obj, content_type="issues.issue", sessionid="session")
+        middleware.process_response(request, response)
+
+        assert emit_event_mock.call_count == 1
+
+        middleware.process_request(request)
+        middleware.process_exception(request, RuntimeError())
+        events.emit_event_for_model(obj, content_type="issues.issue", sessionid="session")
+        assert emit_event_mock.call_count == 2
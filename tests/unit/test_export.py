@@ -14,11 +14,22 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import base64
+import hashlib
+import io
+import json
+import os
 import pytest
 
+from django.core.files.base import ContentFile
+
 from .. import factories as f
 
-from taiga.export_import.service import project_to_dict
+from taiga.export_import.dump_reader import DumpReader, DumpFormatError
+from taiga.export_import.renderers import ExportRenderer, Base64Stream
+from taiga.export_import.serializers import AttachedFileField
+from taiga.export_import.service import project_to_dict, render_project, render_project_in_parallel
+from taiga.projects.history import services as history_services
 
 pytestmark = pytest.mark.django_db
 
@@ -33,3 +44,109 @@ def test_export_user_story_finish_date(client):
     user_story = f.UserStoryFactory.create(finish_date="2014-10-22")
     finish_date = project_to_dict(user_story.project)["user_stories"][0]["finish_date"]
     assert finish_date == "2014-10-22T00:00:00+0000"
+
+
+def test_render_project_stream(client):
+    user_story = f.UserStoryFactory.create(finish_date="2014-10-22")
+    f.IssueFactory.create(project=user_story.project)
+    project = user_story.project
+
+    output = io.StringIO()
+    render_project(project, output, renderer_context={"indent": 4})
+    data = json.loads(output.getvalue())
+
+    expected = json.loads(ExportRenderer().render(project_to_dict(project)).decode("utf-8"))
+    assert data == expected
+
+
+def test_base64_stream_chunks():
+    content = b"0123456789" * 1000
+    stream = Base64Stream(ContentFile(content, name="test.txt"))
+    stream.chunk_size = 7
+
+    output = io.StringIO()
+    stream.write_to(output)
+    assert output.getvalue() == '"{}"'.format(base64.b64encode(content).decode("utf-8"))
+
+
+def test_attached_file_field_decodes_wrapped_data_by_chunks():
+    content = os.urandom(1000)
+    encoded = base64.encodebytes(content).decode("utf-8")
+    assert "\n" in encoded
+
+    field = AttachedFileField()
+    field.decode_chunk_size = 64
+    attached_file = field.from_native({"name": "test.bin", "data": encoded})
+    assert attached_file.read() == content
+
+
+def test_dump_reader_sections():
+    dump = {
+        "name": "test",
+        "user_stories": [{"subject": "us {1}", "attachments": [{"data": "\"[]\""}]}, {"subject": "us 2"}],
+        "issues": [],
+        "tasks": None,
+        "roles": [{"name": "role"}],
+    }
+    reader = DumpReader(io.BytesIO(json.dumps(dump, indent=4).encode("utf-8")))
+    reader.chunk_size = 5
+
+    assert reader.read_header() == {"name": "test", "roles": [{"name": "role"}]}
+    assert list(reader.iter_section("issues")) == []
+    assert list(reader.iter_section("user_stories")) == dump["user_stories"]
+    assert list(reader.iter_section("tasks")) == []
+    assert list(reader.iter_section("milestones")) == []
+
+
+def test_dump_reader_invalid_dump():
+    reader = DumpReader(io.BytesIO(b'{"name": "test", "user_stories": [{"subject": '))
+    with pytest.raises(DumpFormatError):
+        reader.read_header()
+
+
+def test_render_project_in_parallel(client):
+    user_story = f.UserStoryFactory.create()
+    project = user_story.project
+    f.UserStoryFactory.create(project=project)
+    f.UserStoryAttachmentFactory.create(project=project, content_object=user_story)
+    f.IssueFactory.create(project=project)
+
+    history_services.take_snapshot(user_story, user=user_story.owner)
+    user_story.subject = "Changed subject"
+    user_story.save()
+    history_services.take_snapshot(user_story, user=user_story.owner, comment="Test comment")
+
+    output = io.StringIO()
+    render_project(project, output, renderer_context={"indent": 4})
+
+    parallel_output = io.StringIO()
+    render_project_in_parallel(project, parallel_output, renderer_context={"indent": 4},
+                               processes=1, shard_size=1)
+
+    assert parallel_output.getvalue() == output.getvalue()
+    data = json.loads(parallel_output.getvalue())
+    assert len(data["user_stories"]) == 2
+    assert len(data["issues"]) == 1
+    assert sum(len(us["history"]) for us in data["user_stories"]) == 1
+    assert sum(len(us["attachments"]) for us in data["user_stories"]) == 1
+
+
+def test_render_project_with_attachments_by_reference(client, tmpdir):
+    user_story = f.UserStoryFactory.create()
+    project = user_story.project
+    f.UserStoryAttachmentFactory.create(project=project, content_object=user_story)
+    f.UserStoryAttachmentFactory.create(project=project, content_object=user_story)
+
+    output = io.StringIO()
+    render_project(project, output, attachments_dir=str(tmpdir))
+    data = json.loads(output.getvalue())
+
+    sha1 = hashlib.sha1(b"File contents").hexdigest()
+    attached_files = [attachment["attached_file"] for attachment in data["user_stories"][0]["attachments"]]
+    assert [attached_file["sha1"] for attached_file in attached_files] == [sha1, sha1]
+    assert all("data" not in attached_file for attached_file in attached_files)
+
+    # Files with the same content are copied once
+    assert os.listdir(str(tmpdir)) == [sha1]
+    with open(os.path.join(str(tmpdir), sha1), "rb") as fd:
+        assert fd.read() == b"File contents"
@@ -18,7 +18,9 @@
 from unittest.mock import patch, MagicMock
 
 from taiga.mdrender.extensions import emojify
-from taiga.mdrender.service import render, cache_by_sha, get_diff_of_htmls, render_and_extract
+from taiga.mdrender.service import render, cache_by_sha, get_diff_of_htmls, render_and_extract, _get_markdown
+from taiga.mdrender.service import invalidate_project, invalidate_reference, invalidate_mention
+from taiga.mdrender.service import get_cache_stats, reset_cache_stats
 
 from datetime import datetime
 
@@ -38,47 +40,51 @@ def test_proccessor_invalid_emoji():
 
 
 def test_proccessor_valid_us_reference():
-    with patch("taiga.mdrender.extensions.references.get_instance_by_ref") as mock:
-        instance = mock.return_value
+    with patch("taiga.mdrender.extensions.references.get_instances_by_refs") as mock:
+        instance = MagicMock()
         instance.content_type.model = "userstory"
         instance.content_object.subject = "test"
+        mock.return_value = {1: instance}
         result = render(dummy_project, "**#1**")
         expected_result = '<p><strong><a alt="test" class="reference user-story" href="http://localhost:9001/project/test/us/1" title="test">#1</a></strong></p>'
         assert result == expected_result
 
 
 def test_proccessor_valid_issue_reference():
-    with patch("taiga.mdrender.extensions.references.get_instance_by_ref") as mock:
-        instance = mock.return_value
+    with patch("taiga.mdrender.extensions.references.get_instances_by_refs") as mock:
+        instance = MagicMock()
         instance.content_type.model = "issue"
         instance.content_object.subject = "test"
+        mock.return_value = {2: instance}
         result = render(dummy_project, "**#2**")
         expected_result = '<p><strong><a alt="test" class="reference issue" href="http://localhost:9001/project/test/issue/2" title="test">#2</a></strong></p>'
         assert result == expected_result
 
 
 def test_proccessor_valid_task_reference():
-    with patch("taiga.mdrender.extensions.references.get_instance_by_ref") as mock:
-        instance = mock.return_value
+    with patch("taiga.mdrender.extensions.references.get_instances_by_refs") as mock:
+        instance = MagicMock()
         instance.content_type.model = "task"
         instance.content_object.subject = "test"
+        mock.return_value = {3: instance}
         result = render(dummy_project, "**#3**")
         expected_result = '<p><strong><a alt="test" class="reference task" href="http://localhost:9001/project/test/task/3" title="test">#3</a></strong></p>'
         assert result == expected_result
 
 
 def test_proccessor_invalid_type_reference():
-    with patch("taiga.mdrender.extensions.references.get_instance_by_ref") as mock:
-        instance = mock.return_value
+    with patch("taiga.mdrender.extensions.references.get_instances_by_refs") as mock:
+        instance = MagicMock()
         instance.content_type.model = "other"
         instance.content_object.subject = "test"
+        mock.return_value = {4: instance}
         result = render(dummy_project, "**#4**")
         assert result == "<p><strong>#4</strong></p>"
 
 
 def test_proccessor_invalid_reference():
-    with patch("taiga.mdrender.extensions.references.get_instance_by_ref") as mock:
-        mock.return_value = None
+    with patch("taiga.mdrender.extensions.references.get_instances_by_refs") as mock:
+        mock.return_value = {}
         result = render(dummy_project, "**#5**")
         assert result == "<p><strong>#5</strong></p>"
 
@@ -185,9 +191,98 @@ def test_get_diff_of_htmls_modifications():
 
 
 def test_render_and_extract_references():
-    with patch("taiga.mdrender.extensions.references.get_instance_by_ref") as mock:
-        instance = mock.return_value
+    with patch("taiga.mdrender.extensions.references.get_instances_by_refs") as mock:
+        instance = MagicMock()
         instance.content_type.model = "issue"
         instance.content_object.subject = "test"
+        mock.return_value = {1: instance}
         (_, extracted) = render_and_extract(dummy_project, "**#1**")
         assert extracted['references'] == [instance.content_object]
+
+
+def test_markdown_is_reused_between_projects():
+    other_project = MagicMock()
+    other_project.id = 2
+    other_project.slug = "other"
+
+    assert _get_markdown(dummy_project) is _get_markdown(other_project)
+
+    result, _ = render_and_extract(other_project, "[[test]]")
+    assert result == "<p><a class=\"wikilink\" href=\"/project/other/wiki/test\">test</a></p>"
+
+    result, _ = render_and_extract(dummy_project, "[[test]]")
+    assert result == "<p><a class=\"wikilink\" href=\"/project/test/wiki/test\">test</a></p>"
+
+
+def test_references_are_loaded_in_one_query():
+    with patch("taiga.mdrender.extensions.references.get_instances_by_refs") as mock:
+        instance = MagicMock()
+        instance.content_type.model = "task"
+        instance.content_object.subject = "test"
+        mock.return_value = {1: instance}
+        (_, extracted) = render_and_extract(dummy_project, "See #1, #2 and #1 again")
+        mock.assert_called_once_with(dummy_project.id, {1, 2})
+        assert extracted['references'] == [instance.content_object, instance.content_object]
+
+
+def test_mentions_are_loaded_in_one_query():
+    with patch("taiga.mdrender.extensions.mentions.User") as mock:
+        user = MagicMock()
+        user.username = "user1"
+        user.get_full_name.return_value = "User 1"
+        mock.objects.filter.return_value = [user]
+        (_, extracted) = render_and_extract(dummy_project, "@user1, @user2 and @user1 again")
+        mock.objects.filter.assert_called_once_with(username__in={"user1", "user2"})
+        assert extracted['mentions'] == [user, user]
+
+
+def test_cache_by_sha_is_invalidated_by_the_project_version():
+    @cache_by_sha
+    def test_cache(project, text):
+        return datetime.now()
+
+    result1 = test_cache(dummy_project, "test")
+    invalidate_project(dummy_project.id)
+    result2 = test_cache(dummy_project, "test")
+    assert result1 != result2
+    assert test_cache(dummy_project, "test") == result2
+
+
+def test_render_is_invalidated_by_its_references_and_mentions():
+    with patch("taiga.mdrender.extensions.references.get_instances_by_refs") as mock:
+        mock.return_value = {}
+        render(dummy_project, "Cached #11 by @cached-user")
+        render(dummy_project, "Cached #11 by @cached-user")
+        assert mock.call_count == 1
+
+        invalidate_reference(dummy_project.id, 12)
+        invalidate_mention("other-user")
+        render(dummy_project, "Cached #11 by @cached-user")
+        assert mock.call_count == 1
+
+        invalidate_reference(dummy_project.id, 11)
+        render(dummy_project, "Cached #11 by @cached-user")
+        assert mock.call_count == 2
+
+        invalidate_mention("cached-user")
+        render(dummy_project, "Cached #11 by @cached-user")
+        assert mock.call_count == 3
+
+
+def test_render_cache_stats():
+    reset_cache_stats()
+    render(dummy_project, "Counted")
+    render(dummy_project, "Counted")
+    assert get_cache_stats() == {"hits": 1, "misses": 1}
+
+
+def test_render_changed_while_rendering_is_not_cached_as_fresh():
+    def save_reference_while_rendering(project_id, refs):
+        invalidate_reference(project_id, 21)
+        return {}
+
+    with patch("taiga.mdrender.extensions.references.get_instances_by_refs") as mock:
+        mock.side_effect = save_reference_while_rendering
+        render(dummy_project, "Changed #21 while rendering")
+        render(dummy_project, "Changed #21 while rendering")
+        assert mock.call_count == 2
@@ -16,6 +16,7 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 import functools
 import json
+import re
 
 from django.conf import settings
 from django.db.models import signals
@@ -39,6 +40,21 @@ def signals_switch():
 disconnect_signals, reconnect_signals = signals_switch()
 
 
+def count_row_selects_before_update(queries, table, pk):
+    """Count the SELECT queries that read the row `pk` of `table` before
+    the first UPDATE of that table, from a `CaptureQueriesContext`.
+    """
+    row_condition = re.compile(r'"{}"\."id" = {}\b'.format(table, pk))
+    count = 0
+    for query in queries:
+        sql = query["sql"]
+        if sql.startswith('UPDATE "{}"'.format(table)):
+            break
+        if sql.startswith("SELECT") and row_condition.search(sql):
+            count += 1
+    return count
+
+
 def set_settings(**new_settings):
     """Decorator for set django settings that will be only available during the
     wrapped-function execution.